@@ -23,6 +23,7 @@ import argparse
 #===============================================================================
 
 from mapmaker import MapMaker, __version__
+from mapmaker.output.tile_encoding import TILE_ENCODINGS
 from mapmaker.utils import log
 
 #===============================================================================
@@ -45,6 +46,8 @@ def arg_parser():
                         help="Generate image tiles of map's layers (may take a while...)")
     generation_options.add_argument('--clean-connectivity', dest='cleanConnectivity', action='store_true',
                         help='Refresh local connectivity knowledge from SciCrunch')
+    generation_options.add_argument('--curve-tolerance', dest='curveTolerance', metavar='PIXELS', type=float,
+                        help="Maximum distance, in pixels at the maximum zoom level, between a curve and the line segments approximating it (defaults to 0.25)")
     generation_options.add_argument('--disconnected-paths', dest='disconnectedPaths', action='store_true',
                         help="Include paths that are disconnected in the map")
     generation_options.add_argument('--force', action='store_true',
@@ -57,6 +60,8 @@ def arg_parser():
                         help="Don't check if functional connectivity neurons are known in SCKAN. Sets `--invalid-neurons` option")
     generation_options.add_argument('--invalid-neurons', dest='invalidNeurons', action='store_true',
                         help="Include functional connectivity neurons that aren't known in SCKAN")
+    generation_options.add_argument('--marker-cache', dest='markerCache', metavar='CACHE_DIR',
+                        help='Directory in which to cache the marker positions of polygons, so that unchanged features reuse them in later builds')
     generation_options.add_argument('--path-arrows', dest='pathArrows', action='store_true',
                         help="Render arrows at the terminal nodes of paths")
     generation_options.add_argument('--path-layout', dest='pathLayout', action='store_true',
@@ -69,6 +74,8 @@ def arg_parser():
                         help="Create a SPARC Dataset containing the map's sources and the generated map")
     generation_options.add_argument('--sckan-version', dest='sckanVersion', choices=['production', 'staging'],
                         help="Overide version of SCKAN specified by map's manifest")
+    generation_options.add_argument('--stream-svg', dest='streamSVG', action='store_true',
+                        help="Stream the layers of anatomical SVG sources when finding features, to reduce memory used by very large sources")
 
     debug_options = parser.add_argument_group('Diagnostics')
     debug_options.add_argument('--authoring', action='store_true',
@@ -92,6 +99,16 @@ def arg_parser():
     zoom_options.add_argument('--max-raster-zoom', dest='maxRasterZoom', metavar='N', type=int,
                         help='Maximum zoom level of rasterised tiles (defaults to maximum zoom level)')
 
+    raster_options = parser.add_argument_group('Image tiles')
+    raster_options.add_argument('--tile-encoding', dest='tileEncoding', choices=list(TILE_ENCODINGS.keys()),
+                        help="Encoding of image tiles, unless given by a source's `tile-encoding` in the manifest (defaults to `png`)")
+    raster_options.add_argument('--tile-quality', dest='tileQuality', metavar='N', type=int,
+                        help='Quality, from 0 to 100, of lossy `webp` and `jpeg` image tiles (defaults to 80)')
+    raster_options.add_argument('--raster-cache', dest='rasterCache', metavar='CACHE_DIR',
+                        help='Directory in which to cache image tiles, so that layers whose sources are unchanged are not re-rendered by later builds')
+    raster_options.add_argument('--raster-shards', dest='rasterShards', action='store_true',
+                        help="Have each image tiling process save tiles in its own database, merged when tiling is finished")
+
     misc_options = parser.add_argument_group('Miscellaneous')
     misc_options.add_argument('--commit', metavar='GIT_COMMIT',
                         help='The branch/tag/commit to use when the source is a Git repository')
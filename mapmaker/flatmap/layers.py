@@ -34,6 +34,7 @@ from mapmaker.exceptions import GroupValueError
 from mapmaker.geometry import bounds_to_extent, connect_dividers, extend_line, make_boundary
 from mapmaker.geometry import bounds_centroid, MapBounds, MapExtent, merge_bounds, translate_extent
 from mapmaker.geometry import save_geometry, Transform
+from mapmaker.output.tile_encoding import DEFAULT_TILE_ENCODING, DEFAULT_TILE_QUALITY, TileEncoding
 from mapmaker.settings import MAP_KIND, settings
 from mapmaker.utils import FilePath, log
 
@@ -513,11 +514,29 @@ class RasterLayer(object):
         self.__min_zoom = min_zoom if min_zoom is not None else self.__map_source.min_zoom
         self.__local_world_to_base = local_world_to_base
         self.__background_layer = raster_source.background_layer
+        self.__tile_encoding = TileEncoding.from_description(self.__map_source.tile_encoding,
+            TileEncoding(settings.get('tileEncoding', DEFAULT_TILE_ENCODING),
+                         settings.get('tileQuality', DEFAULT_TILE_QUALITY)))
 
     @property
     def background_layer(self) -> bool:
         return self.__background_layer
 
+    @property
+    def boundary_geometry(self) -> Optional[BaseGeometry]:
+        """
+        :returns: The boundary, in base map world coordinates, that the layer's
+                  image is masked with, or ``None`` if the image isn't masked.
+        """
+        boundary_geometry = getattr(self.__map_source, 'boundary_geometry', None)
+        if boundary_geometry is None:
+            return None
+        elif self.__local_world_to_base is not None:
+            return self.__local_world_to_base.transform_geometry(boundary_geometry)
+        elif self.source_kind == 'image':
+            return boundary_geometry
+        return None
+
     @property
     def extent(self) -> MapBounds:
         return self.__extent
@@ -566,6 +585,10 @@ class RasterLayer(object):
     def source_range(self) -> Optional[list[int]]:
         return self.__map_source.source_range
 
+    @property
+    def tile_encoding(self) -> TileEncoding:
+        return self.__tile_encoding
+
     @property
     def transform(self) -> Optional[Transform]:
         return self.__raster_source.transform
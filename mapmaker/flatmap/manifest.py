@@ -195,6 +195,7 @@ class SourceManifest:
                                     if (source_range := description.get('slides')) is not None
                                     else None)
         self.__zoom = description['zoom'] if self.__feature is not None else 0
+        self.__tile_encoding = description.get('tile-encoding')
         if (background := description.get('background')) is not None:
             if (href := manifest.check_and_normalise_path(background.get('href'), 'Background source file')) is None:
                 raise ValueError(f'Background for source {self.__id} has no `href`')
@@ -248,6 +249,10 @@ class SourceManifest:
     def source_range(self) -> Optional[list[int]]:
         return self.__source_range
 
+    @property
+    def tile_encoding(self) -> Optional[str|dict]:
+        return self.__tile_encoding
+
     @property
     def zoom(self) -> int:
         return self.__zoom
@@ -19,7 +19,7 @@
 #===============================================================================
 
 from math import acos, cos, sin, sqrt, pi as PI
-from typing import Self
+from typing import Optional, Self
 import warnings
 
 #===============================================================================
@@ -28,7 +28,7 @@ import numpy as np
 
 import pyproj
 
-import shapely.affinity
+import shapely
 import shapely.geometry
 from shapely.geometry.base import BaseGeometry
 import shapely.ops
@@ -68,12 +68,18 @@ mercator_transformer = pyproj.Transformer.from_proj(
 
 warnings.simplefilter(action='default', category=FutureWarning)
 
+# Radius of the sphere used by Web Mercator (EPSG:3857)
+MERCATOR_RADIUS = 6378137.0
+
 # (SW, NE) bounds as decimal coordinates
 MapBounds = tuple[float, float, float, float]
 
 # (SW, NE) bounds as lng/lat coordinates
 MapExtent = tuple[float, float, float, float]
 
+# The first two rows of an affine transform's matrix
+AffineCoefficients = tuple[float, float, float, float, float, float]
+
 #===============================================================================
 
 def bounds_centroid(bounds: MapBounds) -> tuple[float, float]:
@@ -96,6 +102,30 @@ def mercator_transform(geometry: BaseGeometry) -> BaseGeometry:
 #==============================================================
     return shapely.ops.transform(mercator_transformer.transform, geometry)      # type: ignore
 
+def inverse_mercator(coordinates: np.ndarray) -> np.ndarray:
+#===========================================================
+    """
+    Convert Web Mercator coordinates to longitude and latitude, using the
+    closed form of the spherical inverse projection.
+
+    :param coordinates: An array of shape ``(N, 2)`` of ``(x, y)`` coordinates in metres
+    :returns: An array of shape ``(N, 2)`` of ``(longitude, latitude)`` in degrees
+    """
+    longitude = np.degrees(coordinates[:, 0]/MERCATOR_RADIUS)
+    latitude = np.degrees(np.arctan(np.sinh(coordinates[:, 1]/MERCATOR_RADIUS)))
+    return np.column_stack((longitude, latitude))
+
+def mercator_transform_geometries(geometries: list[BaseGeometry]) -> list[BaseGeometry]:
+#=======================================================================================
+    """
+    Convert geometries from Web Mercator to longitude and latitude.
+
+    The coordinates of all the geometries are fetched and set at once, as
+    a single array, so this is much quicker than :func:`mercator_transform`
+    for many geometries.
+    """
+    return shapely.transform(np.array(geometries, dtype=object), inverse_mercator).tolist()
+
 def merge_bounds(bounds_0: MapBounds, bounds_1: MapBounds) -> MapBounds:
 #=======================================================================
     return (min(bounds_0[0], bounds_1[0]), min(bounds_0[1], bounds_1[1]),
@@ -111,24 +141,56 @@ def translate_extent(extent: MapExtent, offset: tuple[float, float]) -> MapBound
 #===============================================================================
 
 class Transform(object):
+    """
+    A 2D transform, given by a 3x3 matrix.
+
+    Affine transforms, with a last row of ``[0, 0, 1]``, are kept as their six
+    coefficients, which are composed and applied without numpy for points and
+    in a single vectorised call for geometries. Other transforms, such as the
+    perspective transforms that place detail layers, are composed using the
+    full matrix, with only its first two rows applied to points and geometries.
+    """
     def __init__(self, matrix):
-        self.__matrix = np.array(matrix)
-        self.__shapely_matrix = np.concatenate((self.__matrix[0, 0:2],
-                                                self.__matrix[1, 0:2],
-                                                self.__matrix[0:2, 2]), axis=None).tolist()
+        self.__coordinate_transform: Optional[tuple[np.ndarray, np.ndarray]] = None
+        if isinstance(matrix, Transform):
+            self.__affine = matrix.__affine
+            self.__matrix = matrix.__matrix
+            return
+        rows = matrix.tolist() if isinstance(matrix, np.ndarray) else matrix
+        if rows[2][0] == 0 and rows[2][1] == 0 and rows[2][2] == 1:
+            self.__affine: Optional[AffineCoefficients] = (
+                float(rows[0][0]), float(rows[0][1]), float(rows[0][2]),
+                float(rows[1][0]), float(rows[1][1]), float(rows[1][2]))
+            self.__matrix: Optional[np.ndarray] = None      # Made when needed
+        else:
+            self.__affine = None
+            self.__matrix = np.array(matrix)
+
+    @staticmethod
+    def __from_affine(affine: AffineCoefficients) -> 'Transform':
+        transform = Transform.__new__(Transform)
+        transform.__affine = affine
+        transform.__matrix = None
+        transform.__coordinate_transform = None
+        return transform
 
     def __matmul__(self, transform) -> 'Transform':
-        if isinstance(transform, Transform):
-            return Transform(self.__matrix@np.array(transform.__matrix))
+        if not isinstance(transform, Transform):
+            transform = Transform(transform)
+        if self.__affine is not None and transform.__affine is not None:
+            (a, b, c, d, e, f) = self.__affine
+            (A, B, C, D, E, F) = transform.__affine
+            return Transform.__from_affine((a*A + b*D, a*B + b*E, a*C + b*F + c,
+                                            d*A + e*D, d*B + e*E, d*C + e*F + f))
         else:
-            return Transform(self.__matrix@np.array(transform))
+            return Transform(self.matrix@transform.matrix)
 
     def __str__(self):
-        return str(self.__matrix)
+        return str(self.matrix)
 
     @classmethod
     def Identity(cls) -> Self:
-        return cls(np.identity(3))
+        return cls([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
 
     @classmethod
     def Scale(cls, scale: float) -> Self:
@@ -140,31 +202,46 @@ class Transform(object):
                     [0, 1, translate[1]],
                     [0, 0,            1]])
 
+    @property
+    def is_affine(self) -> bool:
+        return self.__affine is not None
+
     @property
     def is_identity(self) -> bool:
-        return np.allclose(self.__matrix, np.identity(3))
+        return np.allclose(self.matrix, np.identity(3))
 
     @property
     def matrix(self) -> np.ndarray:
+        if self.__matrix is None:
+            (a, b, c, d, e, f) = self.__affine                  # type: ignore
+            self.__matrix = np.array([[a, b, c], [d, e, f], [0.0, 0.0, 1.0]])
         return self.__matrix
 
     @property
     def svg_matrix(self) -> np.ndarray:
-        return np.array([self.__matrix[0, 0], self.__matrix[1, 0],
-                         self.__matrix[0, 1], self.__matrix[1, 1],
-                         self.__matrix[0, 2], self.__matrix[1, 2]])
+        matrix = self.matrix
+        return np.array([matrix[0, 0], matrix[1, 0],
+                         matrix[0, 1], matrix[1, 1],
+                         matrix[0, 2], matrix[1, 2]])
 
     def flatten(self) -> np.ndarray:
     #===============================
-        return self.__matrix.flatten()
+        return self.matrix.flatten()
 
     def inverse(self) -> 'Transform':
     #================================
-        return Transform(np.linalg.inv(self.__matrix))
+        if self.__affine is None:
+            return Transform(np.linalg.inv(self.__matrix))      # type: ignore
+        (a, b, c, d, e, f) = self.__affine
+        determinant = a*e - b*d
+        if determinant == 0:
+            raise np.linalg.LinAlgError('Singular matrix')
+        return Transform.__from_affine(( e/determinant, -b/determinant, (b*f - c*e)/determinant,
+                                        -d/determinant,  a/determinant, (c*d - a*f)/determinant))
 
     def rotate_angle(self, angle):
     #==============================
-        rotation = transforms3d.affines.decompose(self.__matrix)[1]
+        rotation = transforms3d.affines.decompose(self.matrix)[1]
         theta = acos(rotation[0, 0])
         if rotation[0, 1] >= 0:
             theta = 2*PI - theta
@@ -175,35 +252,58 @@ class Transform(object):
 
     def scale(self, scale: float) -> 'Transform':
     #============================================
-        return Transform([[scale*self.__matrix[0, 0],       self.__matrix[0, 1], self.__matrix[0, 2]],
-                          [      self.__matrix[1, 0], scale*self.__matrix[1, 1], self.__matrix[1, 2]],
-                          [      self.__matrix[2, 0],       self.__matrix[2, 1], self.__matrix[2, 2]]])
+        matrix = self.matrix
+        return Transform([[scale*matrix[0, 0],       matrix[0, 1], matrix[0, 2]],
+                          [      matrix[1, 0], scale*matrix[1, 1], matrix[1, 2]],
+                          [      matrix[2, 0],       matrix[2, 1], matrix[2, 2]]])
 
     def scale_length(self, length):
     #==============================
-        scaling = transforms3d.affines.decompose(self.__matrix)[2]
+        scaling = transforms3d.affines.decompose(self.matrix)[2]
         return (abs(scaling[0]*length[0]), abs(scaling[1]*length[1]))
 
+    def transform_coordinates(self, coordinates: np.ndarray) -> np.ndarray:
+    #======================================================================
+        """
+        Transform an array of coordinates, of shape ``(N, 2)`` or ``(N, 3)``.
+        Z coordinates are left unchanged.
+        """
+        if coordinates.shape[1] == 3:
+            return np.column_stack((self.transform_coordinates(coordinates[:, 0:2]), coordinates[:, 2]))
+        if self.__affine is not None:
+            if self.__coordinate_transform is None:
+                (a, b, c, d, e, f) = self.__affine
+                self.__coordinate_transform = (np.array([[a, d], [b, e]]), np.array([c, f]))
+            (linear, offset) = self.__coordinate_transform
+            return coordinates@linear + offset
+        else:
+            return coordinates@self.__matrix[0:2, 0:2].T + self.__matrix[0:2, 2]   # type: ignore
+
     def transform_extent(self, extent):
     #==================================
         bounds = extent_to_bounds(extent)
-        return bounds_to_extent(
-            shapely.affinity.affine_transform(shapely.geometry.box(*bounds),
-                                              self.__shapely_matrix).bounds)
+        return bounds_to_extent(self.transform_geometry(shapely.geometry.box(*bounds)).bounds)
 
     def transform_geometry(self, geometry: BaseGeometry) -> BaseGeometry:
     #====================================================================
-       return shapely.affinity.affine_transform(geometry, self.__shapely_matrix)
+        # Geometries keep their Z coordinates, as they did with ``shapely.affinity``
+        return shapely.transform(geometry, self.transform_coordinates, include_z=geometry.has_z)
 
     def transform_point(self, point) -> tuple[float, float]:
     #=======================================================
-        return tuple(self.__matrix@[point[0], point[1], 1.0])[:2]
+        if self.__affine is not None:
+            (a, b, c, d, e, f) = self.__affine
+            (x, y) = (point[0], point[1])
+            return (a*x + b*y + c, d*x + e*y + f)
+        else:
+            return tuple(self.__matrix@[point[0], point[1], 1.0])[:2]  # type: ignore
 
     def translate(self, translation: tuple[float, float]) -> 'Transform':
     #====================================================================
-        return Transform([[self.__matrix[0, 0], self.__matrix[0, 1], translation[0] + self.__matrix[0, 2]],
-                          [self.__matrix[1, 0], self.__matrix[1, 1], translation[1] + self.__matrix[1, 2]],
-                          [self.__matrix[2, 0], self.__matrix[2, 1],                  self.__matrix[2, 2]]])
+        matrix = self.matrix
+        return Transform([[matrix[0, 0], matrix[0, 1], translation[0] + matrix[0, 2]],
+                          [matrix[1, 0], matrix[1, 1], translation[1] + matrix[1, 2]],
+                          [matrix[2, 0], matrix[2, 1],                  matrix[2, 2]]])
 
 #===============================================================================
 
@@ -97,22 +97,23 @@ def arc_endpoints_to_centre(r, phi, flagA, flagS, p1, p2):
     return namedtuple('elliptical_arc',
         'centre, radii, theta, delta_theta')(c, r_abs, theta, delta_theta)
 
-def bezier_segments_from_arc_endpoints(r, phi, flagA, flagS, p1, p2, T):
-#=======================================================================
+def cubic_control_points_from_arc_endpoints(r, phi, flagA, flagS, p1, p2) -> list[tuple[tuple2, ...]]:
+#=====================================================================================================
     arc = arc_endpoints_to_centre(r, phi, flagA, flagS, p1, p2)
     end_theta = arc.theta + arc.delta_theta
     t = arc.theta
     dt = math.pi/4
-    segments = []
+    control_points = []
     while (t + dt) < end_theta:
-        control_points = (BezierPoint(*T.transform_point(cp))
-            for cp in cubic_bezier_control_points(arc.centre, arc.radii, phi, t, t + dt))
-        segments.append(CubicBezier(*control_points))
+        control_points.append(cubic_bezier_control_points(arc.centre, arc.radii, phi, t, t + dt))
         t += dt
-    control_points = (BezierPoint(*T.transform_point(cp))
-        for cp in cubic_bezier_control_points(arc.centre, arc.radii, phi, t, end_theta))
-    segments.append(CubicBezier(*(tuple(control_points)[:3]), BezierPoint(*T.transform_point(p2))))
-    return segments
+    control_points.append(cubic_bezier_control_points(arc.centre, arc.radii, phi, t, end_theta)[:3] + (p2,))
+    return control_points
+
+def bezier_segments_from_arc_endpoints(r, phi, flagA, flagS, p1, p2, T):
+#=======================================================================
+    return [CubicBezier(*(BezierPoint(*T.transform_point(cp)) for cp in control_points))
+                for control_points in cubic_control_points_from_arc_endpoints(r, phi, flagA, flagS, p1, p2)]
 
 #===============================================================================
 
@@ -18,6 +18,8 @@
 #
 #===============================================================================
 
+from collections import defaultdict
+import math
 from typing import Optional
 
 #===============================================================================
@@ -36,10 +38,23 @@ import shapely
 
 #===============================================================================
 
+from mapmaker import MAX_ZOOM
+from mapmaker.settings import settings
+
+#===============================================================================
+
 type Coordinate = tuple[float, float]
 
 #===============================================================================
 
+CURVE_TOLERANCE = 0.25              # pixels at maximum zoom
+MAX_CURVE_SUBDIVISIONS = 100        # line segments per Bezier segment
+
+TILE_PIXELS = 512
+WORLD_CIRCUMFERENCE = 2*math.pi*6378137.0   # metres at the equator of Web Mercator
+
+#===============================================================================
+
 def coords_to_point(pt: Coordinate) -> BezierPoint:
     return BezierPoint(*pt)
 
@@ -72,9 +87,95 @@ def bezier_sample(bz, num_points=100) -> list[Coordinate]:
 #=========================================================
     return [(pt.x, pt.y) for pt in bz.sample(num_points)]
 
-def bezier_to_linestring(bz, num_points=100, offset=0) -> LineString|MultiLineString:
-#====================================================================================
-    line = LineString(bezier_sample(bz, num_points))
+#===============================================================================
+
+def flattening_tolerance() -> float:
+#===================================
+    """
+    The maximum distance, in map units, between a curve and the line segments
+    approximating it, so that they are within ``--curve-tolerance`` pixels of
+    each other at the map's maximum zoom level.
+    """
+    pixels = settings.get('curveTolerance') or CURVE_TOLERANCE
+    max_zoom = settings.get('maxZoom') or MAX_ZOOM
+    return pixels*WORLD_CIRCUMFERENCE/(TILE_PIXELS*2**max_zoom)
+
+def __bezier_points(control_points: np.ndarray, t: np.ndarray) -> np.ndarray:
+    # Evaluate each curve at its time using de Casteljau's algorithm
+    points = control_points
+    t = t[:, np.newaxis, np.newaxis]
+    for _ in range(control_points.shape[1] - 1):
+        points = (1 - t)*points[:, :-1] + t*points[:, 1:]
+    return points[:, 0]
+
+def bezier_flatten_array(control_points: np.ndarray, tolerance: float) -> list[np.ndarray]:
+#==========================================================================================
+    """
+    Approximate Bezier segments of the same order by line segments, to within
+    a tolerance.
+
+    Each segment is subdivided at uniform times, with the number of subdivisions
+    given by Wang's formula. This bounds the distance between a curve and its
+    approximation by the curve's second differences, so that flat or short curves
+    need few points and tight or long curves more.
+
+    :param control_points: An array of shape ``(segments, order+1, 2)``
+    :param tolerance: The maximum distance between each segment and its approximation
+    :returns: The vertices of each segment's approximation, excluding the segment's
+              end point
+    """
+    if tolerance <= 0:
+        raise ValueError('Curve tolerance must be positive')
+    (n_segments, n_points) = control_points.shape[0:2]
+    if n_segments == 0:
+        return []
+    order = n_points - 1
+    if order > 1:
+        second_differences = control_points[:, :-2] - 2*control_points[:, 1:-1] + control_points[:, 2:]
+        max_difference = np.max(np.hypot(second_differences[..., 0], second_differences[..., 1]), axis=1)
+        counts = np.ceil(np.sqrt(order*(order - 1)*max_difference/(8*tolerance)))
+        counts = np.clip(np.nan_to_num(counts, nan=1.0), 1, MAX_CURVE_SUBDIVISIONS).astype(int)
+    else:
+        counts = np.ones(n_segments, dtype=int)
+    ends = np.cumsum(counts)
+    starts = np.repeat(ends - counts, counts)
+    t = (np.arange(ends[-1]) - starts)/np.repeat(counts, counts)
+    points = __bezier_points(np.repeat(control_points, counts, axis=0), t)
+    return np.split(points, ends[:-1])
+
+def bezier_flatten(bz: BezierPath|BezierSegment, tolerance: Optional[float]=None) -> list[Coordinate]:
+#=====================================================================================================
+    """
+    Approximate a Bezier path or segment by a line, to within a tolerance.
+
+    :param bz: The path or segment
+    :param tolerance: The maximum distance between the curve and the line, in map
+                      units. Defaults to :func:`flattening_tolerance`.
+    :returns: The vertices of the line
+    """
+    if tolerance is None:
+        tolerance = flattening_tolerance()
+    segments = bz.asSegments() if isinstance(bz, BezierPath) else [bz]
+    segment_points: list[np.ndarray] = [np.empty((0, 2))]*len(segments)
+    segments_by_order: dict[int, list[int]] = defaultdict(list)
+    for n, segment in enumerate(segments):
+        segments_by_order[len(segment.points)].append(n)
+    for indices in segments_by_order.values():
+        control_points = np.array([[(pt.x, pt.y) for pt in segments[n].points] for n in indices])
+        for n, points in zip(indices, bezier_flatten_array(control_points, tolerance)):
+            segment_points[n] = points
+    end_point = segments[-1].points[-1]
+    return [(x, y) for (x, y) in np.concatenate(segment_points).tolist()] + [(end_point.x, end_point.y)]
+
+def bezier_to_linestring(bz, num_points: Optional[int]=None, offset=0) -> LineString|MultiLineString:
+#==================================================================================================
+    """
+    Convert a Bezier path or segment to a line.
+
+    The curve is sampled at ``num_points`` times when this is given, otherwise
+    it is flattened to within the map's :func:`flattening_tolerance`.
+    """
+    line = LineString(bezier_sample(bz, num_points) if num_points is not None else bezier_flatten(bz))
     if offset == 0:
         return line
     else:
@@ -82,8 +183,8 @@ def bezier_to_linestring(bz, num_points=100, offset=0) -> LineString|MultiLineSt
 
 #===============================================================================
 
-def bezier_to_line_coords(bz, num_points=100, offset=0) -> CoordinateSequence:
-#=============================================================================
+def bezier_to_line_coords(bz, num_points: Optional[int]=None, offset=0) -> CoordinateSequence:
+#=============================================================================================
     line = bezier_to_linestring(bz, num_points=num_points, offset=offset)
     if isinstance(line, MultiLineString):
         coords = []
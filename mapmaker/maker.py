@@ -18,6 +18,7 @@
 #
 #===============================================================================
 
+import glob
 import json
 import os
 import pathlib
@@ -41,7 +42,8 @@ from .flatmap import FlatMap, Manifest, SOURCE_DETAIL_KINDS
 from . import knowledgebase
 
 from .output.geojson import GeoJSONOutput
-from .output.mbtiles import MBTiles
+from .output.markers import marker_cache
+from .output.mbtiles import has_progress, MBTiles
 from .output.sparc_dataset import SparcDataset
 from .output.styling import MapStyle
 from .output.tilemaker import RasterTileMaker
@@ -49,6 +51,9 @@ from .output.tilemaker import RasterTileMaker
 from .settings import settings, MAP_KIND
 
 from .sources import FCPowerpointSource, MBFSource, PowerpointSource, SVGSource
+from .sources.svg.cleaner import element_classes
+from .sources.svg.documents import svg_documents
+from .sources.svg.styling import style_matchers
 from .shapes.shapefilter import ShapeFilter
 
 #===============================================================================
@@ -80,6 +85,14 @@ INVALID_PUBLISHING_OPTIONS = [
 
 #===============================================================================
 
+def _interrupted_tiling(map_dir: str) -> bool:
+#=============================================
+    # Does the map's directory have a raster tile database that was being made
+    # when making the map was interrupted?
+    return any(has_progress(database) for database in glob.glob(os.path.join(map_dir, '*.mbtiles')))
+
+#===============================================================================
+
 class MapMaker:
     def __init__(self, options: dict[str, Any], logger_port: Optional[int]=None,
                                                 process_log_queue: Optional[multiprocessing.Queue]=None):
@@ -224,13 +237,20 @@ class MapMaker:
 
         self.__flatmap: FlatMap
         if os.path.exists(self.__map_dir):
-            if os.path.exists(self.__maker_sentinel):
-                self.__clean_up(remove_sentinel=False)
-                log.error('Last making of map failed -- use `--force` to re-make', id=self.__id, uuid=self.uuid, path=self.__map_dir)
+            if (os.path.exists(self.__maker_sentinel)
+            and self.__uuid is not None and settings.get('backgroundTiles', False)
+            and _interrupted_tiling(self.__map_dir)):
+                # The map's sources haven't changed, so raster tiling can carry on
+                # from where it was interrupted. Any other failure needs ``--force``
+                log.info('Resuming making of map', id=self.__id, uuid=self.uuid, path=self.__map_dir)
             else:
-                log.info('Map already exists -- use `--force` to re-make', id=self.__id, uuid=self.uuid, path=self.__map_dir)
-            self.__flatmap = None                   # pyright: ignore[reportAttributeAccessIssue]
-            return
+                if os.path.exists(self.__maker_sentinel):
+                    self.__clean_up(remove_sentinel=False)
+                    log.error('Last making of map failed -- use `--force` to re-make', id=self.__id, uuid=self.uuid, path=self.__map_dir)
+                else:
+                    log.info('Map already exists -- use `--force` to re-make', id=self.__id, uuid=self.uuid, path=self.__map_dir)
+                self.__flatmap = None               # pyright: ignore[reportAttributeAccessIssue]
+                return
         else:
             os.makedirs(self.__map_dir)
 
@@ -352,8 +372,31 @@ class MapMaker:
         self.__geojson_files = []
         self.__tippe_inputs = []
 
+        # Parsed SVG documents and their styles are only shared within a build
+        svg_documents.clear()
+        style_matchers.clear()
+        element_classes.clear()
+        marker_cache.clear()
+
     def __clean_up(self, remove_sentinel=True):
     #==========================================
+        # We are finished with parsed SVG
+        if svg_documents.statistics['parsed']:
+            log.info('Parsed SVG documents', **svg_documents.statistics)
+        svg_documents.clear()
+        if style_matchers.statistics['lookups']:
+            log.info('Resolved SVG styles', **style_matchers.statistics)
+        style_matchers.clear()
+        if element_classes.statistics['classified']:
+            log.info('Classified SVG elements', **element_classes.statistics)
+        element_classes.clear()
+
+        # Keep marker positions for later builds
+        if marker_cache.statistics['lookups']:
+            log.info('Found marker positions', **marker_cache.statistics)
+        marker_cache.save()
+        marker_cache.clear()
+
         # We are finished with the knowledge base
         if settings['KNOWLEDGE_STORE'] is not None:
             settings['KNOWLEDGE_STORE'].close()
@@ -374,9 +417,9 @@ class MapMaker:
             if not os.path.exists(maker_log):
                 log_file = self.__file_log.baseFilename
                 self.__file_log.close()
-                with open(log_file, 'r') as log:
+                with open(log_file, 'r') as log_fp:
                     with open(os.path.join(self.__map_dir, MAKER_LOG), 'w') as fp:
-                        fp.write(log.read())
+                        fp.write(log_fp.read())
 
         # All done, remove our sentinel
         if remove_sentinel and os.path.exists(self.__maker_sentinel):
@@ -22,22 +22,21 @@ from collections import defaultdict
 import json
 import math
 import os
-from typing import cast
+import time
 
 #===============================================================================
 
-import shapely.affinity
 import shapely.geometry
-import shapely.ops
 
 #===============================================================================
 
 from mapmaker.flatmap import FlatMap, MapLayer
-from mapmaker.geometry import mercator_transform
+from mapmaker.geometry import mercator_transform_geometries
 from mapmaker.settings import MAP_KIND, settings
 from mapmaker.utils import log, ProgressBar, set_as_list
 
 from . import ENCODED_FEATURE_PROPERTIES, EXPORTED_FEATURE_PROPERTIES
+from .markers import marker_positions
 
 #===============================================================================
 
@@ -78,6 +77,7 @@ class GeoJSONOutput(object):
             bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt}')
 
         exported_properties = set(EXPORTED_FEATURE_PROPERTIES + self.__flatmap.manifest.exported_properties)
+        output_features = []
         for feature in features:
             if not settings.get('authoring', False):
                 feature.properties.pop('warning', None)
@@ -88,6 +88,18 @@ class GeoJSONOutput(object):
             if feature.get_property('exclude', False):
                 progress_bar.update(1)
                 continue
+            output_features.append(feature)
+
+        # Reproject all of the layer's geometries at once
+        mercator_geometries = mercator_transform_geometries([feature.geometry for feature in output_features])
+
+        start_time = time.perf_counter()
+        (markers, marker_counts) = marker_positions(mercator_geometries)
+        log.info('Found marker positions for layer', layer=self.__layer.id,
+                                                     seconds=round(time.perf_counter() - start_time, 2),
+                                                     **marker_counts)
+
+        for (feature, mercator_geometry, marker) in zip(output_features, mercator_geometries, markers):
             properties = {
                 name: value for name in exported_properties
                     if (value := feature.get_property(name)) is not None
@@ -95,7 +107,6 @@ class GeoJSONOutput(object):
             }
             geometry = feature.geometry
             area = geometry.area
-            mercator_geometry = mercator_transform(geometry)
             tile_layer = properties['tile-layer']
             tippe_layer = f'{self.__layer.id}_{tile_layer}'.replace('/', '_')
             geojson = {
@@ -126,11 +137,7 @@ class GeoJSONOutput(object):
             geojson['properties'].update(properties)
 
             properties['bounds'] = geojson['properties']['bounds']
-            if 'Polygon' in geometry.geom_type:
-                representative_point = shapely.ops.polylabel(cast(shapely.geometry.Polygon, mercator_geometry), tolerance=0.1)
-                properties['markerPosition'] = list(list(representative_point.coords)[0])
-            else:
-                properties['markerPosition'] = list(list(mercator_geometry.centroid.coords)[0])
+            properties['markerPosition'] = marker
             properties['geometry'] = geojson['geometry']['type']
             properties['layer'] = self.__layer.id
             if mercator_geometry.geom_type == 'LineString':
@@ -0,0 +1,235 @@
+#===============================================================================
+#
+#  Flatmap viewer and annotation tools
+#
+#  Copyright (c) 2026  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#===============================================================================
+
+"""
+Find the positions of the markers of a layer's features, which are also
+where their labels are placed.
+"""
+
+#===============================================================================
+
+import hashlib
+import json
+import os
+from typing import cast, Optional
+
+#===============================================================================
+
+import multiprocess as mp
+import numpy as np
+import shapely
+import shapely.ops
+from shapely.geometry.base import BaseGeometry
+
+#===============================================================================
+
+from mapmaker.settings import settings
+from mapmaker.utils import log
+
+#===============================================================================
+
+# The tolerance used when finding the pole of inaccessibility of a polygon
+MARKER_TOLERANCE = 0.1
+
+MAX_MARKER_PROCESSES = 8 if (cpu_count := os.cpu_count()) is None else cpu_count
+
+# A process pool is only used when there is more than one CPU and at least
+# this many polygons need their pole of inaccessibility found, as starting
+# one takes longer than finding a few poles
+MIN_POOLED_POLYGONS = 64
+
+# Maximum number of polygons handed to a marker worker at a time
+MARKER_CHUNK_SIZE = 16
+
+# A polygon is convex if its area is within this fraction of its convex hull's
+CONVEX_AREA_TOLERANCE = 1e-9
+
+# The name of the file in a ``--marker-cache`` directory holding positions
+MARKER_CACHE_FILE = 'markers.json'
+
+#===============================================================================
+
+MarkerPosition = list[float]
+
+#===============================================================================
+
+class MarkerCache(object):
+    """
+    Marker positions of polygons, keyed by a hash of the polygon's WKB.
+
+    Positions found in a build are kept in memory, and, when the ``markerCache``
+    setting names a directory, are also saved there so that later builds of
+    any map reuse the positions of unchanged features.
+    """
+    def __init__(self):
+        self.__positions: Optional[dict[str, MarkerPosition]] = None
+        self.__added = 0
+        self.__lookups = 0
+        self.__hits = 0
+
+    @property
+    def statistics(self) -> dict[str, int]:
+        return {
+            'lookups': self.__lookups,
+            'hits': self.__hits,
+            'added': self.__added
+        }
+
+    @staticmethod
+    def __cache_file() -> Optional[str]:
+        if (cache_dir := settings.get('markerCache')) is None:
+            return None
+        return os.path.join(cache_dir, MARKER_CACHE_FILE)
+
+    @staticmethod
+    def __read_cache(cache_file: Optional[str]) -> dict[str, MarkerPosition]:
+        if cache_file is not None and os.path.exists(cache_file):
+            try:
+                with open(cache_file) as fp:
+                    return json.load(fp)
+            except (OSError, ValueError) as error:
+                log.warning('Cannot read marker cache', cache=cache_file, error=str(error))
+        return {}
+
+    def __load(self) -> dict[str, MarkerPosition]:
+        if self.__positions is None:
+            self.__positions = self.__read_cache(self.__cache_file())
+        return self.__positions
+
+    @staticmethod
+    def keys(geometries: np.ndarray) -> list[str]:
+    #=============================================
+        prefix = repr(MARKER_TOLERANCE).encode() + b'\0'
+        return [hashlib.sha256(prefix + wkb).hexdigest() for wkb in shapely.to_wkb(geometries)]
+
+    def add(self, key: str, position: MarkerPosition):
+    #=================================================
+        self.__load()[key] = position
+        self.__added += 1
+
+    def clear(self):
+    #===============
+        self.__positions = None
+        self.__added = 0
+        self.__lookups = 0
+        self.__hits = 0
+
+    def get(self, key: str) -> Optional[MarkerPosition]:
+    #===================================================
+        self.__lookups += 1
+        if (position := self.__load().get(key)) is not None:
+            self.__hits += 1
+        return position
+
+    def save(self):
+    #==============
+        """
+        Save positions added in this build into the ``markerCache`` directory, along
+        with any saved there by other builds since the cache was read.
+        """
+        if self.__added == 0 or (cache_file := self.__cache_file()) is None:
+            return
+        positions = self.__read_cache(cache_file)
+        positions.update(self.__load())
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        # Write under a temporary name and then rename so that an
+        # incomplete cache is never seen
+        temporary_file = f'{cache_file}.{os.getpid()}.tmp'
+        with open(temporary_file, 'w') as fp:
+            json.dump(positions, fp)
+        os.replace(temporary_file, cache_file)
+
+#===============================================================================
+
+# Marker positions found when making maps
+
+marker_cache = MarkerCache()
+
+#===============================================================================
+
+def _pole_of_inaccessibility(wkb: bytes) -> MarkerPosition:
+#==========================================================
+    polygon = cast(shapely.Polygon, shapely.from_wkb(wkb))
+    return list(list(shapely.ops.polylabel(polygon, tolerance=MARKER_TOLERANCE).coords)[0])
+
+#===============================================================================
+
+def marker_positions(geometries: list[BaseGeometry]) -> tuple[list[MarkerPosition], dict[str, int]]:
+#===================================================================================================
+    """
+    Find the marker positions of a layer's features.
+
+    The marker of a polygon is at its pole of inaccessibility, except for
+    convex polygons, whose centroid is used; other features have their marker
+    at their centroid. Poles of inaccessibility are looked up in the
+    :data:`marker_cache`, with those not found there being found in a process
+    pool when there are enough of them.
+
+    :param geometries: The features' geometries
+    :returns: The position of each geometry's marker, and the number of polygons
+              whose marker was ``cached``, at a ``convex`` polygon's centroid,
+              and ``computed``
+    """
+    geometry_array = np.array(geometries, dtype=object)
+    centroids = shapely.centroid(geometry_array)
+    positions: list[MarkerPosition] = [list(xy) for xy in zip(shapely.get_x(centroids).tolist(),
+                                                                shapely.get_y(centroids).tolist())]
+    counts = {'cached': 0, 'convex': 0, 'computed': 0}
+    polygonal = [n for (n, geometry) in enumerate(geometries) if 'Polygon' in geometry.geom_type]
+    if len(polygonal) == 0:
+        return (positions, counts)
+
+    # Use positions found by earlier builds
+    keys = marker_cache.keys(geometry_array[polygonal])
+    uncached = []
+    for (n, key) in zip(polygonal, keys):
+        if (position := marker_cache.get(key)) is not None:
+            positions[n] = position
+            counts['cached'] += 1
+        else:
+            uncached.append((n, key))
+    if len(uncached) == 0:
+        return (positions, counts)
+
+    # The centroid of a convex polygon is inside it, so is used as the marker
+    polygons = geometry_array[[n for (n, _) in uncached]]
+    hull_areas = shapely.area(shapely.convex_hull(polygons))
+    convex = ((shapely.get_type_id(polygons) == shapely.GeometryType.POLYGON)
+            & (hull_areas - shapely.area(polygons) <= CONVEX_AREA_TOLERANCE*hull_areas)
+            & shapely.contains_properly(polygons, centroids[[n for (n, _) in uncached]]))
+    counts['convex'] = int(np.count_nonzero(convex))
+    uncached = [item for (item, is_convex) in zip(uncached, convex.tolist()) if not is_convex]
+    if len(uncached) == 0:
+        return (positions, counts)
+
+    # Find the remaining polygons' poles of inaccessibility
+    wkbs = shapely.to_wkb(geometry_array[[n for (n, _) in uncached]]).tolist()
+    if MAX_MARKER_PROCESSES < 2 or len(wkbs) < MIN_POOLED_POLYGONS:
+        poles = [_pole_of_inaccessibility(wkb) for wkb in wkbs]
+    else:
+        with mp.Pool(min(MAX_MARKER_PROCESSES, len(wkbs)//MARKER_CHUNK_SIZE)) as pool:  # pyright: ignore[reportAttributeAccessIssue]
+            poles = pool.map(_pole_of_inaccessibility, wkbs, chunksize=MARKER_CHUNK_SIZE)
+    for ((n, key), pole) in zip(uncached, poles):
+        positions[n] = pole
+        marker_cache.add(key, pole)
+    counts['computed'] = len(poles)
+    return (positions, counts)
+
+#===============================================================================
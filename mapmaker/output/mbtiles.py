@@ -18,7 +18,9 @@
 #
 #===============================================================================
 
+import hashlib
 import io
+import json
 import os
 import sqlite3
 
@@ -31,28 +33,204 @@ import mbutil as mb
 
 #===============================================================================
 
+# Tiles are written to the database in batches of this size
+TILE_BATCH_SIZE = 512
+
+#===============================================================================
+
 class ExtractionError(Exception):
     pass
 
 #===============================================================================
 
+def decode_tile(tile_data: bytes) -> np.ndarray:
+#==============================================
+    return cv2.imdecode(np.frombuffer(tile_data, 'B'), cv2.IMREAD_UNCHANGED)
+
+#===============================================================================
+
+def remove_database(filepath):
+#=============================
+    for suffix in ['', '-wal', '-shm']:
+        if os.path.exists(filepath + suffix):
+            os.remove(filepath + suffix)
+
+#===============================================================================
+
+def setup_deduplicated(cursor):
+#==============================
+    # The same split schema as ``mbutil`` uses for compressed tiles, with
+    # identical tiles stored once, keyed by a hash of their content
+    cursor.execute('create table map (zoom_level integer, tile_column integer, tile_row integer, tile_id text);')
+    cursor.execute('create table images (tile_data blob, tile_id text);')
+    cursor.execute("""create view tiles as
+                        select map.zoom_level as zoom_level, map.tile_column as tile_column,
+                               map.tile_row as tile_row, images.tile_data as tile_data
+                            from map join images on images.tile_id = map.tile_id;""")
+    cursor.execute('create unique index map_index on map (zoom_level, tile_column, tile_row);')
+    cursor.execute('create unique index images_id on images (tile_id);')
+    cursor.execute('create table metadata (name text, value text);')
+    cursor.execute('create unique index name on metadata (name);')
+
+def setup_progress(cursor):
+#==========================
+    # Tiles that have been made, including blank ones which aren't saved, so
+    # that an interrupted tiling run can be resumed
+    cursor.execute('create table progress (zoom_level integer, tile_column integer, tile_row integer);')
+    cursor.execute('create unique index progress_index on progress (zoom_level, tile_column, tile_row);')
+
+def tile_id(tile_data: bytes) -> str:
+#====================================
+    return hashlib.md5(tile_data, usedforsecurity=False).hexdigest()
+
+def has_progress(filepath) -> bool:
+#=================================
+    # Is there a database at ``filepath`` that was being made by a run that
+    # didn't finish?
+    if not os.path.exists(filepath):
+        return False
+    connection = sqlite3.connect(filepath)
+    try:
+        return connection.execute("""select count(*) from sqlite_master
+                                        where type='table' and name='progress';""").fetchone()[0] > 0
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        connection.close()
+
+def start_update(filepath, removed_tiles: dict[int, set[tuple[int, int]]],
+                           made_tiles: dict[int, set[tuple[int, int]]]):
+#============================================================================
+    # Make a complete database resumable, as if a run making it had been
+    # interrupted after making all but the ``removed_tiles``, which are deleted
+    connection = sqlite3.connect(filepath)
+    cursor = connection.cursor()
+    deduplicated = cursor.execute("""select count(*) from sqlite_master
+                                        where type='table' and name='map';""").fetchone()[0] > 0
+    table = 'map' if deduplicated else 'tiles'
+    cursor.execute('begin;')
+    setup_progress(cursor)
+    cursor.executemany(f'delete from {table} where zoom_level=? and tile_column=? and tile_row=?;',
+                       [(zoom, x, mb.flip_y(zoom, y)) for zoom, tiles in removed_tiles.items()
+                                                        for (x, y) in tiles])
+    if deduplicated:
+        cursor.execute('delete from images where tile_id not in (select tile_id from map);')
+    cursor.executemany('insert or ignore into progress (zoom_level, tile_column, tile_row) values (?, ?, ?);',
+                       [(zoom, x, mb.flip_y(zoom, y)) for zoom, tiles in made_tiles.items()
+                                                        for (x, y) in tiles])
+    connection.commit()
+    connection.close()
+
+#===============================================================================
+
 class MBTiles(object):
-    def __init__(self, filepath, create=False, force=False, silent=False):
+    def __init__(self, filepath, create=False, force=False, silent=False,
+                 batch_size=TILE_BATCH_SIZE, deduplicate=False, resumable=False):
         self._silent = silent
-        if force and os.path.exists(filepath):
-            os.remove(filepath)
+        # A resumable database is reopened, rather than removed, if a previous
+        # run creating it was interrupted
+        self._resumed = create and resumable and has_progress(filepath)
+        if force and not self._resumed:
+            remove_database(filepath)
         self._connnection = mb.mbtiles_connect(filepath, self._silent)
         self._cursor = self._connnection.cursor()
-        if create:
-            mb.mbtiles_setup(self._cursor)
+        self._batch_size = batch_size
+        self._pending_tiles: list[tuple] = []
+        self._pending_images: list[tuple[sqlite3.Binary, str]] = []
+        self._pending_progress: list[tuple[int, int, int]] = []
+        self._tile_ids: set[str] = set()
+        self._write_ahead = create
+        self._deduplicate = create and deduplicate
+        self._resumable = create and resumable
+        if self._resumed:
+            self._cursor.execute('pragma journal_mode=WAL;')
+            self._cursor.execute('pragma synchronous=NORMAL;')
+            if self._deduplicate:
+                self._tile_ids = set(row[0] for row in self._cursor.execute('select tile_id from images;'))
+        elif create:
+            # Tiles are written in batched transactions
+            self._cursor.execute('pragma journal_mode=WAL;')
+            self._cursor.execute('pragma synchronous=NORMAL;')
+            if self._deduplicate:
+                setup_deduplicated(self._cursor)
+            else:
+                mb.mbtiles_setup(self._cursor)
+            if self._resumable:
+                setup_progress(self._cursor)
+
+    @property
+    def resumed(self) -> bool:
+        return self._resumed
 
     def close(self, compress=False):
-        if compress:
+        self.flush()
+        if self._resumable:
+            # The database is complete
+            self._cursor.execute('drop table progress;')
+            self._connnection.commit()
+        if self._deduplicate:
+            # Tiles are already stored uniquely, so don't compress
+            self.__save_deduplication()
+            self._connnection.commit()
+        elif compress:
             mb.compression_prepare(self._cursor, self._silent)
             mb.compression_do(self._cursor, self._connnection, 256, self._silent)
             mb.compression_finalize(self._cursor)
+        if self._write_ahead:
+            # So that the database is a single, self-contained, file
+            self._connnection.commit()
+            self._cursor.execute('pragma journal_mode=DELETE;').fetchall()
         mb.optimize_database(self._connnection, self._silent)
 
+    def disconnect(self):
+        # Save pending tiles and close the connection, leaving the database as
+        # it is, as when it's a shard that will be merged
+        self.flush()
+        self._connnection.close()
+
+    def flush(self):
+        self._insert_pending_tiles()
+        if self._connnection.in_transaction:
+            self._connnection.commit()
+
+    def _insert_pending_tiles(self):
+        # Tiles are replaced as a resumed run may remake tiles that were
+        # saved before being recorded as made
+        if len(self._pending_tiles) or len(self._pending_progress):
+            if not self._connnection.in_transaction:
+                self._cursor.execute('begin;')
+            if self._deduplicate:
+                self._cursor.executemany('insert or ignore into images (tile_data, tile_id) values (?, ?);',
+                                            self._pending_images)
+                self._cursor.executemany("""insert or replace into map (zoom_level, tile_column, tile_row, tile_id)
+                                                   values (?, ?, ?, ?);""", self._pending_tiles)
+                self._pending_images = []
+            else:
+                self._cursor.executemany("""insert or replace into tiles (zoom_level, tile_column, tile_row, tile_data)
+                                                   values (?, ?, ?, ?);""", self._pending_tiles)
+            self._pending_tiles = []
+            if len(self._pending_progress):
+                self._cursor.executemany("""insert or ignore into progress (zoom_level, tile_column, tile_row)
+                                                   values (?, ?, ?);""", self._pending_progress)
+                self._pending_progress = []
+
+    def merge_shard(self, shard_path):
+        # Copy all tiles from another database, with the same schema, and then remove it
+        self.flush()
+        self._cursor.execute('attach database ? as shard;', (shard_path, ))
+        self._cursor.execute('begin;')
+        if self._deduplicate:
+            self._cursor.execute("""insert or ignore into images (tile_data, tile_id)
+                                        select tile_data, tile_id from shard.images;""")
+            self._cursor.execute("""insert or replace into map (zoom_level, tile_column, tile_row, tile_id)
+                                        select zoom_level, tile_column, tile_row, tile_id from shard.map;""")
+        else:
+            self._cursor.execute("""insert or replace into tiles (zoom_level, tile_column, tile_row, tile_data)
+                                        select zoom_level, tile_column, tile_row, tile_data from shard.tiles;""")
+        self._connnection.commit()
+        self._cursor.execute('detach database shard;')
+        remove_database(shard_path)
+
     def execute(self, sql):
         return self._cursor.execute(sql)
 
@@ -68,18 +246,59 @@ class MBTiles(object):
             return dict(self._connnection.execute('select name, value from metadata;').fetchall())
 
     def get_tile(self, zoom, x, y):
+        return decode_tile(self.get_tile_data(zoom, x, y))
+
+    def get_tile_data(self, zoom, x, y) -> bytes:
+        self._insert_pending_tiles()
         rows = self._cursor.execute("""select tile_data from tiles
                                           where zoom_level=? and tile_column=? and tile_row=?;""",
                                                           (zoom,             x,             mb.flip_y(zoom, y)))
         data = rows.fetchone()
         if not data: raise ExtractionError()
-        return cv2.imdecode(np.frombuffer(data[0], 'B'), cv2.IMREAD_UNCHANGED)
-
-    def save_tile_as_png(self, zoom, x, y, image):
-        output = cv2.imencode('.png', image)[1]
-        self._cursor.execute("""insert into tiles (zoom_level, tile_column, tile_row, tile_data)
-                                           values (?, ?, ?, ?);""",
-                                                  (zoom, x, mb.flip_y(zoom, y), sqlite3.Binary(output))
-                            )
+        return data[0]
+
+    def made_tiles(self, zoom) -> set[tuple[int, int]]:
+        # The ``(x, y)`` coordinates of tiles at a zoom level recorded as made
+        self._insert_pending_tiles()
+        return set((x, mb.flip_y(zoom, y)) for (x, y) in self._cursor.execute(
+                    'select tile_column, tile_row from progress where zoom_level=?;', (zoom, )))
+
+    def saved_tiles(self, zoom) -> set[tuple[int, int]]:
+        # The ``(x, y)`` coordinates of tiles at a zoom level that have been saved
+        self._insert_pending_tiles()
+        table = 'map' if self._deduplicate else 'tiles'
+        return set((x, mb.flip_y(zoom, y)) for (x, y) in self._cursor.execute(
+                    f'select tile_column, tile_row from {table} where zoom_level=?;', (zoom, )))
+
+    def tile_made(self, zoom, x, y):
+        # Record that a tile has been made, after any of its data has been saved
+        if self._resumable:
+            self._pending_progress.append((zoom, x, mb.flip_y(zoom, y)))
+            if len(self._pending_progress) >= self._batch_size:
+                self.flush()
+
+    def save_tile(self, zoom, x, y, tile_data: bytes):
+        if self._deduplicate:
+            id = tile_id(tile_data)
+            if id not in self._tile_ids:
+                self._tile_ids.add(id)
+                self._pending_images.append((sqlite3.Binary(tile_data), id))
+            self._pending_tiles.append((zoom, x, mb.flip_y(zoom, y), id))
+        else:
+            self._pending_tiles.append((zoom, x, mb.flip_y(zoom, y), sqlite3.Binary(tile_data)))
+        if len(self._pending_tiles) >= self._batch_size:
+            self.flush()
+
+    def __save_deduplication(self):
+        (tile_count, tile_bytes) = self._cursor.execute("""select count(*), coalesce(sum(length(images.tile_data)), 0)
+                                                             from map join images on images.tile_id = map.tile_id;""").fetchone()
+        (image_count, image_bytes) = self._cursor.execute("""select count(*), coalesce(sum(length(tile_data)), 0)
+                                                               from images;""").fetchone()
+        self.add_metadata(deduplication=json.dumps({
+            'tiles': tile_count,
+            'unique-tiles': image_count,
+            'ratio': round(tile_count/image_count, 3) if image_count else 1.0,
+            'bytes-saved': tile_bytes - image_bytes
+        }))
 
 #===============================================================================
@@ -44,11 +44,11 @@ class ImageSource(object):
 
 class RasterTileSource(object):
     @staticmethod
-    def style(layer_id, bounds, min_zoom, max_zoom):
+    def style(layer_id, bounds, min_zoom, max_zoom, format='png'):
         return {
             'type': 'raster',
             'tiles': ['/tiles/{}/{{z}}/{{x}}/{{y}}'.format(layer_id)],
-            'format': 'png',
+            'format': format,
             'minzoom': min_zoom,
             'maxzoom': max_zoom,
             'bounds': bounds    # southwest(lng, lat), northeast(lng, lat)
@@ -82,7 +82,8 @@ class TileSources(object):
         if len(vector_layer_dict):
             sources['vector-tiles'] = VectorTileSource.style(vector_layer_dict, bounds, map_zoom)
         for source in raster_sources:
-            sources[source.id] = RasterTileSource.style(source.id, bounds, source.min_zoom, source.max_zoom)
+            sources[source.id] = RasterTileSource.style(source.id, bounds, source.min_zoom, source.max_zoom,
+                                                        source.tile_encoding.format)
         return sources
 
 #===============================================================================
@@ -0,0 +1,152 @@
+#===============================================================================
+#
+#  Flatmap viewer and annotation tools
+#
+#  Copyright (c) 2026  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#===============================================================================
+
+"""
+Encodings of raster tiles, along with the ``format`` of the encoded tiles
+as given in a tileset's metadata.
+"""
+
+#===============================================================================
+
+from dataclasses import dataclass
+import struct
+from typing import Any, Optional
+import zlib
+
+#===============================================================================
+
+import cv2
+import numpy as np
+
+#===============================================================================
+
+# Encoding names and the ``format`` of tiles with the encoding
+TILE_ENCODINGS = {
+    'png':           'png',     # Lossless RGBA PNG
+    'png8':          'png',     # Palette quantised PNG, for flat coloured backgrounds
+    'webp':          'webp',    # Lossy WebP, with alpha
+    'webp-lossless': 'webp',    # Lossless WebP, with alpha
+    'jpeg':          'jpg',     # Lossy JPEG, with transparent areas made white
+}
+
+DEFAULT_TILE_ENCODING = 'png'
+DEFAULT_TILE_QUALITY = 80
+
+#===============================================================================
+
+# Palette entry 0 of a quantised PNG is used for transparent pixels
+PALETTE_COLOURS = 255
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+#=================================================
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+def _encode_as_png8(image: np.ndarray) -> bytes:
+#===============================================
+    # Pack visible pixels as 32-bit RGBA and reduce their precision until
+    # there are few enough distinct colours to fit in a palette
+    visible = image[:, :, 3] != 0
+    pixels = image[visible].astype(np.uint32)
+    shift = 0
+    while True:
+        # Centre reduced values in the range of values they represent,
+        # keeping opaque pixels opaque
+        mask = (0xFF << shift) & 0xFF
+        reduced = (pixels & mask) | ((1 << shift)//2)
+        reduced[:, 3] = np.where(pixels[:, 3] == 255, 255, reduced[:, 3])
+        packed = (reduced[:, 3] << 24) | (reduced[:, 2] << 16) | (reduced[:, 1] << 8) | reduced[:, 0]
+        (colours, inverse) = np.unique(packed, return_inverse=True)
+        if len(colours) <= PALETTE_COLOURS:
+            break
+        shift += 1
+    indices = np.zeros(image.shape[:2], dtype=np.uint8)
+    indices[visible] = inverse.astype(np.uint8) + 1
+    palette = np.zeros((len(colours) + 1, 3), dtype=np.uint8)
+    palette[1:, 0] = (colours >> 16) & 0xFF
+    palette[1:, 1] = (colours >> 8) & 0xFF
+    palette[1:, 2] = colours & 0xFF
+    # Colours are sorted by alpha, so opaque entries are last and can be
+    # left out of the transparency chunk
+    alpha = [0] + ((colours >> 24) & 0xFF).tolist()
+    while len(alpha) > 1 and alpha[-1] == 255:
+        alpha.pop()
+    transparency = bytes(alpha)
+    # Each scanline starts with a zero byte, meaning no filtering
+    scanlines = np.hstack((np.zeros((indices.shape[0], 1), dtype=np.uint8), indices))
+    header = struct.pack('>IIBBBBB', image.shape[1], image.shape[0], 8, 3, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n'
+          + _png_chunk(b'IHDR', header)
+          + _png_chunk(b'PLTE', palette.tobytes())
+          + _png_chunk(b'tRNS', transparency)
+          + _png_chunk(b'IDAT', zlib.compress(scanlines.tobytes()))
+          + _png_chunk(b'IEND', b''))
+
+#===============================================================================
+
+@dataclass
+class TileEncoding:
+    """
+    How raster tiles are encoded.
+
+    :param encoding: one of the keys of ``TILE_ENCODINGS``
+    :param quality: the quality, from 0 to 100, of lossy encodings
+    """
+    encoding: str = DEFAULT_TILE_ENCODING
+    quality: int = DEFAULT_TILE_QUALITY
+
+    def __post_init__(self):
+        if self.encoding not in TILE_ENCODINGS:
+            raise ValueError(f'Unknown raster tile encoding: {self.encoding}')
+        if self.quality < 0 or self.quality > 100:
+            raise ValueError(f'Raster tile quality must be between 0 and 100: {self.quality}')
+
+    @classmethod
+    def from_description(cls, description: Optional[Any], default: Optional['TileEncoding']=None) -> 'TileEncoding':
+    #===============================================================================================================
+        # Either just the name of an encoding or a dictionary with ``format`` and ``quality``,
+        # with anything not given taken from the default
+        if default is None:
+            default = cls()
+        if description is None:
+            return default
+        elif isinstance(description, str):
+            return cls(description, default.quality)
+        return cls(description.get('format', default.encoding),
+                   int(description.get('quality', default.quality)))
+
+    @property
+    def format(self) -> str:
+        return TILE_ENCODINGS[self.encoding]
+
+    def encode(self, image: np.ndarray) -> bytes:
+    #============================================
+        if self.encoding == 'png8':
+            return _encode_as_png8(image)
+        elif self.encoding == 'webp':
+            return cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, max(1, self.quality)])[1].tobytes()
+        elif self.encoding == 'webp-lossless':
+            # OpenCV uses lossless compression when quality is above 100
+            return cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, 101])[1].tobytes()
+        elif self.encoding == 'jpeg':
+            opaque = np.where(image[:, :, 3:4] == 0, np.uint8(255), image[:, :, :3])
+            return cv2.imencode('.jpg', opaque, [cv2.IMWRITE_JPEG_QUALITY, self.quality])[1].tobytes()
+        return cv2.imencode('.png', image)[1].tobytes()
+
+#===============================================================================
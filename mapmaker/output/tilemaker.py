@@ -18,25 +18,37 @@
 #
 #===============================================================================
 
+from collections import defaultdict, deque, OrderedDict
+import difflib
+import glob
+import hashlib
+import itertools
+import json
+import math
 import os
-import queue
-from time import sleep
-from typing import TYPE_CHECKING
+import shutil
+import time
+from typing import Optional, TYPE_CHECKING
 
 #===============================================================================
 
 import cv2
 import mercantile
 import multiprocess as mp
-import multiprocess.connection as mp_connection
 import numpy as np
+import shapely.affinity
 import shapely.geometry
 
 #===============================================================================
 
-from mapmaker.geometry import extent_to_bounds, Transform as GeometryTransform
-from mapmaker.output.mbtiles import MBTiles, ExtractionError
+from mapmaker import __version__
+from mapmaker.geometry import Transform as GeometryTransform
+from mapmaker.output.mbtiles import decode_tile, has_progress, MBTiles, ExtractionError
+from mapmaker.output.mbtiles import remove_database, start_update
+from mapmaker.output.tile_encoding import TileEncoding
 from mapmaker.sources import add_alpha, blank_image, mask_image, not_empty
+from mapmaker.settings import settings
+from mapmaker.sources.svg.documents import svg_documents
 from mapmaker.sources.svg.rasteriser import SVGTiler
 from mapmaker.utils import log, ProgressBar
 from mapmaker.utils.image import *
@@ -53,8 +65,169 @@ HALF_SIZE = (TILE_SIZE[0]//2, TILE_SIZE[1]//2)
 
 MAX_TILE_PROCESSES = 8 if (cpu_count := os.cpu_count()) is None else cpu_count
 
-IDLE_TIMEOUT = 0.00001
-TILE_BATCH_SIZE = 1024
+# Maximum number of tiles handed to a tiling worker at a time
+TILE_CHUNK_SIZE = 64
+
+# Overview tiles are made by workers for subtrees of the tile pyramid
+# that are at most this many zoom levels deep
+OVERVIEW_SUBTREE_DEPTH = 4
+
+# The number of decoded, half-size tiles (256 KB each) kept in memory
+# for making the next levels of overview tiles
+OVERVIEW_CACHE_SIZE = 1024
+
+#===============================================================================
+
+# Margin, in tile pixels, around an image's edges that interpolation may draw into
+IMAGE_EDGE_MARGIN = 4
+
+#===============================================================================
+
+# Changed SVG elements are remade incrementally, from a previous build's tiles,
+# unless they touch more than this fraction of the layer's tiles
+MAX_UPDATE_FRACTION = 0.5
+
+#===============================================================================
+
+type TileCoords = tuple[int, int]
+
+#===============================================================================
+
+# Each tiling worker is initialised once per layer with the layer's tile
+# extractor, which it inherits from the parent process when forked, how
+# tiles are encoded, and, optionally, the path prefix of a shard database
+# it saves its tiles in, along with a barrier that all workers wait at when
+# closing their shards
+
+_tile_extractor = None
+_tile_encoding = TileEncoding()
+_tile_shard_prefix: Optional[str] = None
+_tile_shard: Optional[MBTiles] = None
+_tile_shard_barrier = None
+
+def _init_tile_worker(tile_extractor, tile_encoding: TileEncoding, shard_prefix: Optional[str]=None,
+                      shard_barrier=None):
+#===================================================================================================
+    global _tile_extractor, _tile_encoding, _tile_shard_prefix, _tile_shard, _tile_shard_barrier
+    _tile_extractor = tile_extractor
+    _tile_encoding = tile_encoding
+    _tile_shard_prefix = shard_prefix
+    _tile_shard = None
+    _tile_shard_barrier = shard_barrier
+
+def _make_tiles(tiles: tuple[mercantile.Tile, ...]) -> tuple[int, Optional[str], list[tuple[int, int, Optional[bytes]]]]:
+#=======================================================================================================================
+    # Extract, check and encode tiles in a worker process so that only encoded
+    # tiles are returned to the parent, or, if we have a shard database, are saved
+    # in the shard with just their coordinates returned. Blank tiles are returned
+    # without data, so that they are recorded as made
+    global _tile_shard
+    assert _tile_extractor is not None
+    made_tiles = []
+    shard_path = None
+    if _tile_shard_prefix is not None:
+        shard_path = f'{_tile_shard_prefix}.{os.getpid()}'
+        if _tile_shard is None:
+            _tile_shard = MBTiles(shard_path, True, True, deduplicate=True)
+    for tile in tiles:
+        tile_data = None
+        tile_image = _tile_extractor.get_tile(tile)
+        if tile_image is not None:
+            alpha_image = add_alpha(tile_image)
+            if not_empty(alpha_image):
+                tile_data = _tile_encoding.encode(alpha_image)
+                if _tile_shard is not None:
+                    _tile_shard.save_tile(tile.z, tile.x, tile.y, tile_data)
+                    tile_data = None
+        made_tiles.append((tile.x, tile.y, tile_data))
+    if _tile_shard is not None:
+        _tile_shard.flush()
+    return (len(tiles), shard_path, made_tiles)
+
+def _close_tile_shard(_):
+#========================
+    # Save pending tiles and close a worker's shard so that it can be merged. Each
+    # worker waits until all workers have been given a close task, so that every
+    # worker is given exactly one
+    global _tile_shard
+    assert _tile_shard_barrier is not None
+    if _tile_shard is not None:
+        _tile_shard.disconnect()
+        _tile_shard = None
+    _tile_shard_barrier.wait()
+
+def _half_tile(image: np.ndarray) -> np.ndarray:
+#===============================================
+    return cv2.resize(image, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+
+def _make_overview_subtree(root: TileCoords, root_zoom: int, leaf_zoom: int,
+                           leaves: list[tuple[int, int, Optional[np.ndarray], Optional[bytes]]],
+                           saved: Optional[set[tuple[int, int, int]]]=None
+                          ) -> tuple[TileCoords, list[tuple[int, int, int, bytes]], Optional[np.ndarray]]:
+#===================================================================================================
+    # Make all the overview tiles of a subtree, level by level, from the subtree's
+    # leaf tiles, given either as a decoded half-size tile or as encoded tile data.
+    # Only encoded overview tiles, along with the half-size root tile, are returned,
+    # with tiles that are already ``saved`` not being encoded
+    half_tiles: dict[TileCoords, np.ndarray] = {}
+    for (x, y, half_tile, tile_data) in leaves:
+        if half_tile is None and tile_data is not None:
+            tile = decode_tile(tile_data)
+            if tile.shape[2] == 3:
+                tile = cv2.cvtColor(tile, cv2.COLOR_BGR2BGRA)
+            half_tile = _half_tile(tile)
+        if half_tile is not None:
+            half_tiles[(x, y)] = half_tile
+    overview_tiles = []
+    for zoom in range(leaf_zoom - 1, root_zoom - 1, -1):
+        overviews: dict[TileCoords, np.ndarray] = {}
+        for ((x, y), half_tile) in half_tiles.items():
+            if (overview_tile := overviews.get((x//2, y//2))) is None:
+                overview_tile = blank_image(TILE_SIZE)
+                overviews[(x//2, y//2)] = overview_tile
+            paste_image(overview_tile, half_tile, ((x % 2)*HALF_SIZE[0], (y % 2)*HALF_SIZE[1]))
+        half_tiles = {}
+        for ((x, y), overview_tile) in overviews.items():
+            if not_empty(overview_tile):
+                if saved is None or (zoom, x, y) not in saved:
+                    overview_tiles.append((zoom, x, y, _tile_encoding.encode(overview_tile)))
+                half_tiles[(x, y)] = _half_tile(overview_tile)
+    return (root, overview_tiles, half_tiles.get(root))
+
+#===============================================================================
+
+class HalfTileCache(object):
+    """
+    A least recently used cache of decoded, half-size tiles.
+
+    :param max_size: The maximum number of tiles to keep
+    """
+    def __init__(self, max_size: int):
+        self.__max_size = max_size
+        self.__half_tiles: OrderedDict[tuple[int, int, int], np.ndarray] = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.__hits + self.__misses
+        return self.__hits/lookups if lookups else 0.0
+
+    def add(self, zoom: int, x: int, y: int, half_tile: np.ndarray):
+    #===============================================================
+        self.__half_tiles[(zoom, x, y)] = half_tile
+        self.__half_tiles.move_to_end((zoom, x, y))
+        if len(self.__half_tiles) > self.__max_size:
+            self.__half_tiles.popitem(last=False)
+
+    def get(self, zoom: int, x: int, y: int) -> Optional[np.ndarray]:
+    #================================================================
+        if (half_tile := self.__half_tiles.pop((zoom, x, y), None)) is not None:
+            # Each tile is the leaf of only one subtree
+            self.__hits += 1
+        else:
+            self.__misses += 1
+        return half_tile
 
 #===============================================================================
 
@@ -143,21 +316,27 @@ class TileSet(object):
     """
     The set of tiles covering a geographic extent.
 
+    Tiles are generated as the set is iterated over and, when a boundary
+    is given, only tiles that intersect the boundary are in the set.
+
     :param extent:
     :type extent: tuple(float, float, float, float)
     :param max_zoom:
     :type max_zoom: int
+    :param boundary: an optional boundary, in world coordinates, of the
+                     set's content
+    :type boundary: :class:`shapely.geometry.base.BaseGeometry`
     """
-    def __init__(self, extent: tuple[float, float, float, float], max_zoom: int):
+    def __init__(self, extent: tuple[float, float, float, float], max_zoom: int,
+                 boundary: Optional[shapely.geometry.base.BaseGeometry]=None):
         self.__extent = extent
+        self.__zoom = max_zoom
 
-        # Get the set of tiles that span the extent
-        self.__tiles: list[mercantile.Tile] = list(mercantile.tiles(*extent, max_zoom))
-
-        tile_0 = self.__tiles[0]
-        tile_N = self.__tiles[-1]
-
-        # Tile coordinates of first and last tiles
+        # Tile coordinates of the first (top left) and last (bottom right) tiles
+        # that span the extent, using the same clamping as ``mercantile.tiles()``
+        tile_0 = mercantile.tile(max(-180.0, extent[0]), min(85.051129, extent[3]), max_zoom)
+        tile_N = mercantile.tile(min(180.0, extent[2]) - mercantile.LL_EPSILON,
+                                 max(-85.051129, extent[1]) + mercantile.LL_EPSILON, max_zoom)
         self.__start_coords = (tile_0.x, tile_0.y)
         self.__end_coords = (tile_N.x, tile_N.y)
 
@@ -165,6 +344,16 @@ class TileSet(object):
         bounds_0 = mercantile.xy_bounds(tile_0)
         bounds_N = mercantile.xy_bounds(tile_N)
         tile_world = Rect(bounds_0.left, bounds_0.top, bounds_N.right, bounds_N.bottom)
+        self.__tile_world_size = (bounds_0.right - bounds_0.left, bounds_0.top - bounds_0.bottom)
+        self.__tile_world_origin = (bounds_0.left, bounds_0.top)
+
+        # Only tiles that intersect the boundary have content
+        if boundary is not None and not boundary.is_empty:
+            self.__boundary = boundary
+            shapely.prepare(self.__boundary)
+        else:
+            self.__boundary = None
+        self.__tile_count = sum(len(columns) for (_, columns) in self.__tile_rows())
 
         # Size of a tile in pixels
         self.__tile_size = TILE_SIZE
@@ -185,17 +374,35 @@ class TileSet(object):
         # Map extent in tile pixel coordinates
         self.__pixel_rect = self.__world_to_tile_pixels.transform_rect(Rect(sw[0], ne[1], ne[0], sw[1]))
 
-    def __getitem__(self, index):
-        if isinstance(index, slice):
-             return self.__tiles[index.start:index.stop:index.step]
-        else:
-            return self.__tiles[index]
-
     def __len__(self):
-        return len(self.__tiles)
+        return self.__tile_count
 
     def __iter__(self):
-        return iter(self.__tiles)
+        for (y, columns) in self.__tile_rows():
+            for x in columns:
+                yield mercantile.Tile(int(x), y, self.__zoom)
+
+    def __tile_rows(self):
+    #=====================
+        # Yield the columns of tiles in each row of the set, using a row's strip of
+        # the boundary to limit the range of columns before testing each tile
+        columns = np.arange(self.__start_coords[0], self.__end_coords[0]+1)
+        (tile_width, tile_height) = self.__tile_world_size
+        lefts = self.__tile_world_origin[0] + tile_width*(columns - self.__start_coords[0])
+        for y in range(self.__start_coords[1], self.__end_coords[1]+1):
+            if self.__boundary is None:
+                yield (y, columns)
+                continue
+            top = self.__tile_world_origin[1] - tile_height*(y - self.__start_coords[1])
+            row_strip = shapely.box(lefts[0], top - tile_height, lefts[-1] + tile_width, top)
+            if not self.__boundary.intersects(row_strip):
+                continue
+            row_part = self.__boundary.intersection(row_strip)
+            (left, _, right, _) = row_part.bounds
+            in_range = (lefts + tile_width >= left) & (lefts <= right)
+            tiles = shapely.box(lefts[in_range], top - tile_height, lefts[in_range] + tile_width, top)
+            shapely.prepare(row_part)
+            yield (y, columns[in_range][shapely.intersects(row_part, tiles)])
 
     @property
     def end_coords(self):
@@ -248,11 +455,10 @@ class TileSet(object):
     @property
     def tiles(self):
         """
-        :returns: List of :class:`mercantile.Tile` tiles spanning an extent.
-        :rtype: list
+        :returns: The :class:`mercantile.Tile` tiles in the set.
+        :rtype: Iterator
         """
-        mercantile.Tile
-        return self.__tiles
+        return iter(self)
 
     @property
     def tile_coords_to_pixels(self):
@@ -342,56 +548,105 @@ class RasterTiler(object):
 #===============================================================================
 
 class RasterImageTiler(RasterTiler):
-    def __init__(self, raster_layer, tile_set, image, image_to_local_world):
+    """
+    Extract tiles from an image pyramid, warping just the window of the
+    pyramid level that a tile needs.
+
+    :param raster_layer:
+    :param tile_set: the set of tiles spanning an extent
+    :param image: the source image
+    :param image_to_local_world: transform from image pixels to the
+                                 raster layer's world coordinates
+    """
+    def __init__(self, raster_layer, tile_set, image: ImagePyramid, image_to_local_world):
+        image_rect = Rect((0, 0), image.size)
+        super().__init__(raster_layer, tile_set, image_rect)
+        self.__image = image
+        # Make the pyramid now, so that tiling processes share it
+        self.__levels = image.levels
+        self.__tile_origin = tile_set.start_coords
+        self.__tile_grid = (tile_set.end_coords[0] - tile_set.start_coords[0] + 1,
+                            tile_set.end_coords[1] - tile_set.start_coords[1] + 1)
         if raster_layer.local_world_to_base is None:
-            image_rect = Rect((0, 0), image_size(image))
+            self.__image_to_tile_pixels = tile_set.tile_pixels_to_image(image_rect).inverse()
         else:
-            image_rect = Rect((0, 0), tile_set.pixel_rect.size)
-            local_world_to_tile_image = (Transform(translateA=tile_set.pixel_rect[0:2])
-                                        @tile_set.world_to_tile_pixels
-                                        @raster_layer.local_world_to_base)
-            image_to_tile_image = local_world_to_tile_image@image_to_local_world
-            image = cv2.warpPerspective(image, image_to_tile_image.matrix,
-                                        image_rect.size_as_int,
-                                        flags=cv2.INTER_CUBIC)
-            if raster_layer.map_source.boundary_geometry is not None:
-                # Remove edge artifacts by masking with boundary
-                image = mask_image(image, local_world_to_tile_image.transform_geometry(
-                                            raster_layer.map_source.boundary_geometry))
-        super().__init__(raster_layer, tile_set, image_rect)
-        self.__source_image = image
+            self.__image_to_tile_pixels = (tile_set.world_to_tile_pixels
+                                          @raster_layer.local_world_to_base
+                                          @image_to_local_world)
+        # Tiles are masked with the layer's boundary, as mapped to tile pixel coordinates
+        self.__boundary = None
+        if ((boundary_geometry := raster_layer.boundary_geometry) is not None
+        and boundary_geometry.geom_type == 'Polygon'):
+            self.__boundary = tile_set.world_to_tile_pixels.transform_geometry(boundary_geometry)
+            shapely.prepare(self.__boundary)
+
+    def tile_coverage(self) -> tuple[np.ndarray, dict[TileCoords, tuple[int, int, int, int]]]:
+    #==========================================================================================
+        """
+        Find which tiles are blank, from the outline of the image in tile pixels.
 
-    def extract_tile_as_image(self, image_tile_rect):           # pyright: ignore[reportIncompatibleMethodOverride]
-    #================================================
-        X0 = max(0, round(image_tile_rect.x0))
-        X1 = min(round(image_tile_rect.x1), self.__source_image.shape[1])
-        Y0 = max(0, round(image_tile_rect.y0))
-        Y1 = min(round(image_tile_rect.y1), self.__source_image.shape[0])
-        if X0 >= X1 or Y0 >= Y1:
+        :returns: A boolean array, indexed by tile row and column relative to
+                  the tile set's first tile, that is ``False`` where a tile is
+                  blank, and, as the image's content isn't examined, no tiles
+                  that are a single colour.
+        """
+        (width, height) = self.__image.size
+        corners = np.array([[[0, 0], [width, 0], [width, height], [0, height]]], dtype=np.float64)
+        outline = shapely.Polygon(cv2.perspectiveTransform(corners, self.__image_to_tile_pixels.matrix)[0])
+        # Allow for interpolation at the image's edges
+        outline = outline.buffer(IMAGE_EDGE_MARGIN, join_style='mitre')
+        if self.__boundary is not None:
+            outline = outline.intersection(self.__boundary.buffer(IMAGE_EDGE_MARGIN))
+        (columns, rows) = self.__tile_grid
+        (x, y) = np.meshgrid(np.arange(columns)*self.tile_size[0], np.arange(rows)*self.tile_size[1])
+        shapely.prepare(outline)
+        return (shapely.intersects(outline, shapely.box(x, y, x + self.tile_size[0], y + self.tile_size[1])), {})
+
+    def get_tile(self, tile: mercantile.Tile) -> np.ndarray:
+    #=======================================================
+        tile_offset = ((self.__tile_origin[0] - tile.x)*self.tile_size[0],
+                       (self.__tile_origin[1] - tile.y)*self.tile_size[1])
+        image_to_tile = GeometryTransform.Translate(tile_offset)@self.__image_to_tile_pixels
+        corners = np.array([[[0, 0], [self.tile_size[0], 0], self.tile_size, [0, self.tile_size[1]]]], dtype=np.float64)
+        image_corners = cv2.perspectiveTransform(corners, image_to_tile.inverse().matrix)[0]
+
+        # Use the most reduced level of the pyramid that still has at
+        # least one pixel for each tile pixel
+        image_pixels = math.sqrt(shapely.Polygon(image_corners).area/(self.tile_size[0]*self.tile_size[1]))
+        level = min(len(self.__levels) - 1, max(0, int(math.floor(math.log2(max(1.0, image_pixels))))))
+        factor = 2**level
+        level_image = self.__levels[level]
+        level_to_image = GeometryTransform([[factor,      0, (factor - 1)/2],
+                                            [     0, factor, (factor - 1)/2],
+                                            [     0,      0,              1]])
+
+        # Only the window of the level under the tile, with a margin for interpolation, is read
+        level_corners = (image_corners - (factor - 1)/2)/factor
+        (x0, y0) = np.maximum(np.floor(level_corners.min(axis=0)).astype(int) - 2, 0)
+        (x1, y1) = np.minimum(np.ceil(level_corners.max(axis=0)).astype(int) + 3,
+                              (level_image.shape[1], level_image.shape[0]))
+        if x0 >= x1 or y0 >= y1:
             return blank_image(self.tile_size)
-        scaling = self.get_scaling(image_tile_rect)
-        width = (self.tile_size[0] if image_tile_rect.x0 >= 0 and image_tile_rect.x1 < self.__source_image.shape[1]
-            else round(scaling[0]*(X1 - X0)))
-        height = (self.tile_size[1] if image_tile_rect.y0 >= 0 and image_tile_rect.y1 < self.__source_image.shape[0]
-            else round(scaling[1]*(Y1 - Y0)))
-        return cv2.resize(self.__source_image[Y0:Y1, X0:X1], (width, height), interpolation=cv2.INTER_CUBIC)
+        window_to_tile = image_to_tile@level_to_image@GeometryTransform.Translate((x0, y0))
+        tile_image = cv2.warpPerspective(np.ascontiguousarray(level_image[y0:y1, x0:x1]),
+                                         window_to_tile.matrix, self.tile_size,
+                                         flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_CONSTANT,
+                                         borderValue=(255, 255, 255, 0))
+
+        if self.__boundary is not None:
+            # Remove edge artifacts by masking with boundary
+            tile_box = shapely.box(-tile_offset[0], -tile_offset[1],
+                                   self.tile_size[0] - tile_offset[0], self.tile_size[1] - tile_offset[1])
+            if not self.__boundary.contains(tile_box):
+                tile_image = mask_image(tile_image, shapely.affinity.translate(self.__boundary, *tile_offset))
+        return tile_image
 
 #===============================================================================
 
 class ImageTiler(RasterImageTiler):
     def __init__(self, raster_layer, tile_set):
-        image = raster_layer.source_data
-        if image.shape[2] == 3:
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2RGBA)
-        tile_bounds = extent_to_bounds(tile_set.extent)
-        super().__init__(raster_layer, tile_set, image, raster_layer.map_source.image_to_world)
-
-#===============================================================================
-
-class SVGImageTiler(RasterImageTiler):
-    def __init__(self, raster_layer, tile_set):
-        svg_tiler = SVGTiler(raster_layer, tile_set)
-        super().__init__(raster_layer, tile_set, svg_tiler.get_image(), svg_tiler.image_to_world)
+        map_source = raster_layer.map_source
+        super().__init__(raster_layer, tile_set, map_source.image, map_source.image_to_world)
 
 #===============================================================================
 
@@ -419,107 +674,297 @@ class RasterTileMaker(object):
         self.__id = raster_layer.id
         self.__database_path = os.path.join(output_dir, f'{raster_layer.id}.mbtiles')
         self.__min_zoom = raster_layer.min_zoom
-        self.__tile_set = TileSet(raster_layer.extent, self.__max_zoom)
+        self.__tile_set = TileSet(raster_layer.extent, self.__max_zoom, raster_layer.boundary_geometry)
 
     @property
     def raster_layer(self):
         return self.__raster_layer
 
-    def __make_zoomed_tiles(self, tile_extractor):
-    #=============================================
-        mbtiles = MBTiles(self.__database_path, True, True)
-        mbtiles.add_metadata(id=self.__id)
+    def __cached_tiles_path(self, lineage=False) -> Optional[str]:
+    #=============================================================
+        # Where the layer's tiles are cached, keyed by everything that determines them.
+        # With ``lineage`` set, the path of a file describing the layer's most recently
+        # made tiles, keyed by everything except the layer's source
+        if (cache_dir := settings.get('rasterCache')) is None:
+            return None
+        layer = self.__raster_layer
+        content_hash = hashlib.sha256() if lineage else hashlib.sha256(layer.source_data)
+        for part in [__version__, layer.id, layer.source_kind, layer.map_source.kind, str(layer.flatmap.map_kind),
+                     tuple(layer.extent), self.__min_zoom, self.__max_zoom, TILE_SIZE,
+                     layer.tile_encoding.encoding, layer.tile_encoding.quality]:
+            content_hash.update(repr(part).encode() + b'\0')
+        if layer.local_world_to_base is not None:
+            content_hash.update(layer.local_world_to_base.matrix.tobytes())
+        if (boundary_geometry := layer.boundary_geometry) is not None:
+            content_hash.update(shapely.to_wkb(boundary_geometry))
+        return os.path.join(cache_dir, f'{content_hash.hexdigest()}.latest.json' if lineage
+                                  else f'{content_hash.hexdigest()}.mbtiles')
+
+    def __copy_tiles(self, source_path: str, destination_path: str):
+    #===============================================================
+        # Hard link when we can as tile databases aren't changed once made. The
+        # link, or copy, is made under a temporary name and then renamed so that
+        # an incomplete database is never seen
+        temporary_path = f'{destination_path}.{os.getpid()}.tmp'
+        try:
+            os.link(source_path, temporary_path)
+        except OSError:
+            shutil.copyfile(source_path, temporary_path)
+        remove_database(destination_path)
+        os.replace(temporary_path, destination_path)
+
+    def __use_cached_tiles(self, cached_path: str):
+    #==============================================
+        log.info('Using cached tiles for layer', layer=self.__id, cache=cached_path)
+        self.__copy_tiles(cached_path, self.__database_path)
+
+    def __changed_tiles(self, previous_elements: list, elements: list) -> set[TileCoords]:
+    #====================================================================================
+        # Tiles at the maximum zoom level that are touched by any element that has
+        # been added, removed, or changed, or whose drawing order has changed
+        changed_bounds = []
+        matcher = difflib.SequenceMatcher(None, [(digest, tuple(bounds)) for (digest, bounds) in previous_elements],
+                                                [(digest, tuple(bounds)) for (digest, bounds) in elements],
+                                          autojunk=False)
+        for (tag, i0, i1, j0, j1) in matcher.get_opcodes():
+            if tag != 'equal':
+                changed_bounds.extend(bounds for (_, bounds) in previous_elements[i0:i1])
+                changed_bounds.extend(bounds for (_, bounds) in elements[j0:j1])
+        (tile_width, tile_height) = self.__tile_set.tile_size
+        (x_origin, y_origin) = self.__tile_set.start_coords
+        changed_tiles = set()
+        for (x0, y0, x1, y1) in changed_bounds:
+            # Allow a pixel for anti-aliasing
+            changed_tiles.update(itertools.product(
+                range(x_origin + math.floor((x0 - 1)/tile_width), x_origin + math.floor((x1 + 1)/tile_width) + 1),
+                range(y_origin + math.floor((y0 - 1)/tile_height), y_origin + math.floor((y1 + 1)/tile_height) + 1)))
+        return changed_tiles
+
+    def __start_update(self, tile_extractor: SVGTiler) -> bool:
+    #==========================================================
+        # Start from the most recently made tiles for the layer, removing those
+        # touched by changed elements, so that only they are remade
+        lineage_path = self.__cached_tiles_path(lineage=True)
+        if lineage_path is None or not os.path.exists(lineage_path):
+            return False
+        with open(lineage_path) as fp:
+            lineage = json.load(fp)
+        previous_path = os.path.join(os.path.dirname(lineage_path), lineage['tiles'])
+        if not os.path.exists(previous_path):
+            log.info('Previous tiles of layer are no longer cached', layer=self.__id, previous=lineage['tiles'])
+            return False
+        tile_coords = set((tile.x, tile.y) for tile in self.__tile_set)
+        changed_tiles = tile_coords.intersection(
+            self.__changed_tiles(lineage['elements'], tile_extractor.element_records))
+        if len(changed_tiles) > MAX_UPDATE_FRACTION*len(tile_coords):
+            log.info('Too many tiles of layer have changed to update them', layer=self.__id,
+                        changed=len(changed_tiles), tiles=len(tile_coords))
+            return False
+
+        # Remove changed tiles and all their overview tiles, and record the roots
+        # of unchanged overview subtrees as having been made
+        removed_tiles: dict[int, set[TileCoords]] = {self.__max_zoom: changed_tiles}
+        made_tiles: dict[int, set[TileCoords]] = {self.__max_zoom: tile_coords - changed_tiles}
+        for zoom in range(self.__min_zoom, self.__max_zoom):
+            depth = self.__max_zoom - zoom
+            removed_tiles[zoom] = set((x >> depth, y >> depth) for (x, y) in changed_tiles)
+        leaf_zoom = self.__max_zoom
+        while leaf_zoom > self.__min_zoom:
+            root_zoom = max(self.__min_zoom, leaf_zoom - OVERVIEW_SUBTREE_DEPTH)
+            depth = self.__max_zoom - root_zoom
+            made_tiles[root_zoom] = set((x >> depth, y >> depth) for (x, y) in tile_coords) - removed_tiles[root_zoom]
+            leaf_zoom = root_zoom
+
+        # The previous tiles may be linked from elsewhere, so are copied before being changed
+        temporary_path = f'{self.__database_path}.{os.getpid()}.tmp'
+        shutil.copyfile(previous_path, temporary_path)
+        start_update(temporary_path, removed_tiles, made_tiles)
+        remove_database(self.__database_path)
+        os.replace(temporary_path, self.__database_path)
+        log.info('Updating tiles of layer', layer=self.__id, previous=lineage['tiles'],
+                    changed=len(changed_tiles), tiles=len(tile_coords))
+        return True
+
+    def __save_lineage(self, cached_path: str, tile_extractor: SVGTiler):
+    #===================================================================
+        lineage_path = self.__cached_tiles_path(lineage=True)
+        assert lineage_path is not None
+        temporary_path = f'{lineage_path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'w') as fp:
+            json.dump({
+                'tiles': os.path.basename(cached_path),
+                'elements': tile_extractor.element_records
+            }, fp)
+        os.replace(temporary_path, lineage_path)
+
+    def __make_zoomed_tiles(self, tile_extractor, cached_path: Optional[str]=None):
+    #==============================================================================
+        if (cached_path is not None and isinstance(tile_extractor, SVGTiler)
+        and not has_progress(self.__database_path)):
+            if not self.__start_update(tile_extractor):
+                log.info('Making all tiles of layer', layer=self.__id)
+        mbtiles = MBTiles(self.__database_path, True, True, deduplicate=True, resumable=True)
+        mbtiles.add_metadata(id=self.__id, format=self.__raster_layer.tile_encoding.format)
 
         zoom = self.__max_zoom
-        tile_count = len(self.__tile_set)
+        shard_prefix = self.__database_path if settings.get('rasterShards', False) else None
+        if mbtiles.resumed:
+            # Carry on from where an interrupted run stopped, first merging any
+            # shards it left, which only have tiles that were made
+            for shard_path in glob.glob(f'{glob.escape(self.__database_path)}.*[0-9]'):
+                mbtiles.merge_shard(shard_path)
+            tile_coords = mbtiles.made_tiles(zoom)
+            log.info('Resuming tiling of layer', layer=self.__id, made=len(tile_coords))
+        else:
+            tile_coords = set()
+        self.__skip_uniform_tiles(tile_extractor, mbtiles, tile_coords)
+        tiles_to_make = (tile for tile in self.__tile_set if (tile.x, tile.y) not in tile_coords)
+        tile_count = len(self.__tile_set) - len(tile_coords)
         log.info(f'Tiling zoom level {zoom} for layer', zoom=zoom, layer=self.__id, tiles=tile_count, cpus=MAX_TILE_PROCESSES)
 
-        tile_processes = {}
-        running = True
-        ending = False
-        image_queue = mp.Queue()                                            # pyright: ignore[reportAttributeAccessIssue]
-        tiles_processed = 0
-        tile_pos = 0
-        while running:
-            # Start a tile extraction process if where have spare processors
-            while not ending and len(tile_processes) < MAX_TILE_PROCESSES:
-                if tile_pos < tile_count:
-                    tiles = self.__tile_set[tile_pos:tile_pos + TILE_BATCH_SIZE]
-                    tile_process = self.__extract_tile__process(tiles, tile_extractor, image_queue)
-                    tile_processes[tile_process.sentinel] = tile_process
-                    tile_pos += len(tiles)
-                else:
-                    ending = True
-
-            # Save extracted tile images
-            try:
-                (x, y, image) = image_queue.get(block=False)
-                mbtiles.save_tile_as_png(zoom, x, y, image)
-                tiles_processed += 1
-            except queue.Empty:
-                pass
-
-            # Check if extraction processes have finished
-            if len(tile_processes) > 0:
-                ended_processes = mp_connection.wait(tile_processes.keys(), IDLE_TIMEOUT)
-                for process in ended_processes:
-                    tile_processes[process].join()
-                    tile_processes.pop(process)
-                if ending:
-                    running = len(tile_processes) > 0 or not image_queue.empty()
-            # Idle...
-            sleep(IDLE_TIMEOUT)
-        image_queue.close()
-        image_queue.join_thread()
-
-        self.__make_overview_tiles(mbtiles, zoom, self.__tile_set.start_coords,
-                                                  self.__tile_set.end_coords)
-        mbtiles.close(compress=True)
-
-    def __extract_tile__process(self, tiles: list[mercantile.Tile], tile_extractor, image_queue):
-    #============================================================================================
-        tile_process = mp.Process(target=self.__extract_tile,               # pyright: ignore[reportAttributeAccessIssue]
-            args=(tiles, tile_extractor, image_queue),
-            name=f'{self.__id}/{tiles[0].z}/{tiles[0].x}/{tiles[0].y}')
-        tile_process.start()
-        return tile_process
-
-    def __extract_tile(self, tiles: list[mercantile.Tile], tile_extractor, image_queue):
-    #===================================================================================
-        for tile in tiles:
-            tile_image = tile_extractor.get_tile(tile)
-            if tile_image is not None:
-                alpha_image = add_alpha(tile_image)
-                if not_empty(alpha_image):
-                    image_queue.put((tile.x, tile.y, alpha_image))
-
-    def __make_overview_tiles(self, mbtiles, zoom, start_coords, end_coords):
-    #========================================================================
-        if zoom > self.__min_zoom:
-            zoom -= 1
-            log.info(f'Tiling zoom {zoom} level for layer', zoom=zoom, layer=self.__id)
-            half_start = (start_coords[0]//2, start_coords[1]//2)
-            half_end = (end_coords[0]//2, end_coords[1]//2)
-            progress_bar = ProgressBar(total=(half_end[0]-half_start[0]+1)
-                                     *(half_end[1]-half_start[1]+1),
-                unit='tiles', ncols=40,
+        chunk_size = max(1, min(TILE_CHUNK_SIZE, tile_count//(4*MAX_TILE_PROCESSES)))
+        progress_bar = ProgressBar(total=tile_count,
+            unit='tiles', ncols=40,
+            bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt}')
+        shard_paths: set[str] = set()
+        shard_barrier = mp.Barrier(MAX_TILE_PROCESSES) if shard_prefix is not None else None  # pyright: ignore[reportAttributeAccessIssue]
+        with mp.Pool(MAX_TILE_PROCESSES, initializer=_init_tile_worker,    # pyright: ignore[reportAttributeAccessIssue]
+                                         initargs=(tile_extractor, self.__raster_layer.tile_encoding,
+                                                   shard_prefix, shard_barrier)) as pool:
+            for (batch_size, shard_path, made_tiles) in pool.imap_unordered(_make_tiles,
+                                                    itertools.batched(tiles_to_make, chunk_size)):
+                if shard_path is not None:
+                    shard_paths.add(shard_path)
+                for (x, y, tile_data) in made_tiles:
+                    if tile_data is not None:
+                        mbtiles.save_tile(zoom, x, y, tile_data)
+                    mbtiles.tile_made(zoom, x, y)
+                    tile_coords.add((x, y))
+                progress_bar.update(batch_size)
+            progress_bar.close()
+            if shard_paths:
+                # Workers close their shards before they are merged
+                pool.map(_close_tile_shard, range(MAX_TILE_PROCESSES), chunksize=1)
+                for shard_path in shard_paths:
+                    mbtiles.merge_shard(shard_path)
+            self.__make_overview_tiles(pool, mbtiles, tile_coords)
+        mbtiles.close()
+        if cached_path is not None:
+            os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+            self.__copy_tiles(self.__database_path, cached_path)
+            if isinstance(tile_extractor, SVGTiler):
+                self.__save_lineage(cached_path, tile_extractor)
+
+    def __skip_uniform_tiles(self, tile_extractor, mbtiles: MBTiles, tile_coords: set[TileCoords]):
+    #=============================================================================================
+        # Tiles that are known to be blank, or a single colour, aren't rendered, with
+        # all single colour tiles of the same colour sharing the same tile data
+        (covered, solid_tiles) = tile_extractor.tile_coverage()
+        (x0, y0) = self.__tile_set.start_coords
+        zoom = self.__max_zoom
+        solid_data: dict[tuple[int, int, int, int], Optional[bytes]] = {}
+        blank_count = 0
+        solid_count = 0
+        for tile in self.__tile_set:
+            if (tile.x, tile.y) in tile_coords:
+                continue
+            if (colour := solid_tiles.get((tile.x, tile.y))) is not None:
+                if colour not in solid_data:
+                    solid_image = add_alpha(np.full((TILE_SIZE[1], TILE_SIZE[0], 4), colour, dtype=np.uint8))
+                    solid_data[colour] = (self.__raster_layer.tile_encoding.encode(solid_image)
+                                            if not_empty(solid_image) else None)
+                if (tile_data := solid_data[colour]) is not None:
+                    mbtiles.save_tile(zoom, tile.x, tile.y, tile_data)
+                solid_count += 1
+            elif not covered[tile.y - y0, tile.x - x0]:
+                blank_count += 1
+            else:
+                continue
+            mbtiles.tile_made(zoom, tile.x, tile.y)
+            tile_coords.add((tile.x, tile.y))
+        if blank_count or solid_count:
+            log.info('Skipped rendering uniform tiles', layer=self.__id, blank=blank_count, solid=solid_count)
+
+    def __make_overview_tiles(self, pool, mbtiles: MBTiles, tile_coords: set[TileCoords]):
+    #=====================================================================================
+        # The pyramid is split into subtrees at most ``OVERVIEW_SUBTREE_DEPTH`` levels
+        # deep, with each subtree made by a worker. Subtree roots become the leaves of
+        # the next level of subtrees, with their half-size images kept in a cache so
+        # that they don't have to be read back from the database and decoded.
+        start_time = time.perf_counter()
+        half_tile_cache = HalfTileCache(OVERVIEW_CACHE_SIZE)
+        resumed = mbtiles.resumed
+        leaf_zoom = self.__max_zoom
+        leaf_coords = tile_coords
+        overview_count = 0
+        while leaf_zoom > self.__min_zoom and len(leaf_coords):
+            root_zoom = max(self.__min_zoom, leaf_zoom - OVERVIEW_SUBTREE_DEPTH)
+            log.info(f'Tiling zoom levels {root_zoom} to {leaf_zoom-1} for layer',
+                        zoom=(root_zoom, leaf_zoom-1), layer=self.__id)
+            depth = leaf_zoom - root_zoom
+            subtrees: defaultdict[TileCoords, list[TileCoords]] = defaultdict(list)
+            for (x, y) in leaf_coords:
+                subtrees[(x >> depth, y >> depth)].append((x, y))
+            progress_bar = ProgressBar(total=len(subtrees),
+                unit='trees', ncols=40,
                 bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt}')
-            for x in range(half_start[0], half_end[0] + 1):
-                for y in range(half_start[1], half_end[1] + 1):
-                    overview_tile = blank_image(TILE_SIZE)
-                    for i in range(2):
-                        for j in range(2):
-                            try:
-                                tile = mbtiles.get_tile(zoom+1, 2*x+i, 2*y+j)
-                                half_tile = cv2.resize(tile, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
-                                paste_image(overview_tile, half_tile, (i*HALF_SIZE[0], j*HALF_SIZE[1]))
-                            except ExtractionError:
-                                pass
-                    if not_empty(overview_tile):
-                        mbtiles.save_tile_as_png(zoom, x, y, overview_tile)
+            root_coords: set[TileCoords] = set()
+            saved_tiles: dict[int, set[TileCoords]] = {}
+            if resumed:
+                # Overview tiles that are saved, by an interrupted run or as the
+                # unchanged tiles of an update, aren't saved again
+                saved_tiles = {zoom: mbtiles.saved_tiles(zoom) for zoom in range(root_zoom, leaf_zoom)}
+                # Subtrees whose root was made before being interrupted are complete
+                made_roots = mbtiles.made_tiles(root_zoom)
+                saved_roots = mbtiles.saved_tiles(root_zoom)
+                for root in made_roots.intersection(subtrees.keys()):
+                    subtrees.pop(root)
+                    if root in saved_roots:
+                        root_coords.add(root)
                     progress_bar.update(1)
+
+            # Database access stays in this process and thread, with a bounded
+            # number of subtrees queued for the workers at any one time
+            def save_subtree(result):
+                nonlocal overview_count
+                (root, overview_tiles, root_half_tile) = result
+                for (zoom, x, y, tile_data) in overview_tiles:
+                    mbtiles.save_tile(zoom, x, y, tile_data)
+                overview_count += len(overview_tiles)
+                if root_half_tile is not None:
+                    half_tile_cache.add(root_zoom, root[0], root[1], root_half_tile)
+                    root_coords.add(root)
+                mbtiles.tile_made(root_zoom, *root)
+                progress_bar.update(1)
+
+            pending = deque()
+            for (root, leaves) in subtrees.items():
+                leaf_tiles = []
+                for (x, y) in leaves:
+                    if (half_tile := half_tile_cache.get(leaf_zoom, x, y)) is not None:
+                        leaf_tiles.append((x, y, half_tile, None))
+                    else:
+                        try:
+                            leaf_tiles.append((x, y, None, mbtiles.get_tile_data(leaf_zoom, x, y)))
+                        except ExtractionError:
+                            pass
+                saved = None
+                if resumed:
+                    saved = set((zoom, x >> (leaf_zoom - zoom), y >> (leaf_zoom - zoom))
+                                    for (x, y) in leaves for zoom in range(root_zoom, leaf_zoom)
+                                        if (x >> (leaf_zoom - zoom), y >> (leaf_zoom - zoom)) in saved_tiles[zoom])
+                pending.append(pool.apply_async(_make_overview_subtree,
+                                                (root, root_zoom, leaf_zoom, leaf_tiles, saved)))
+                if len(pending) >= 2*MAX_TILE_PROCESSES:
+                    save_subtree(pending.popleft().get())
+            while len(pending):
+                save_subtree(pending.popleft().get())
             progress_bar.close()
-            self.__make_overview_tiles(mbtiles, zoom, half_start, half_end)
+            leaf_coords = root_coords
+            leaf_zoom = root_zoom
+        log.info('Made overview tiles for layer', layer=self.__id, tiles=overview_count,
+                    cache_hit_rate=round(half_tile_cache.hit_rate, 3),
+                    seconds=round(time.perf_counter() - start_time, 2))
 
     def have_tiles(self):
     #====================
@@ -527,18 +972,21 @@ class RasterTileMaker(object):
 
     def make_tiles(self):
     #====================
+        cached_path = self.__cached_tiles_path()
+        if cached_path is not None and os.path.exists(cached_path):
+            if self.__raster_layer.source_kind == 'svg':
+                # The layer's SVG won't be rasterised
+                svg_documents.discard(self.__raster_layer.source_data)
+            return mp.Process(target=self.__use_cached_tiles, args=(cached_path, ), name=self.__id)   # pyright: ignore[reportAttributeAccessIssue]
         log.info('Tiling {}...'.format(self.__id))
         kind = self.__raster_layer.source_kind
         if kind == 'image':
             tile_extractor = ImageTiler(self.__raster_layer, self.__tile_set)
         elif kind == 'svg':
-            if self.__raster_layer.local_world_to_base is None:
-                tile_extractor = SVGTiler(self.__raster_layer, self.__tile_set)
-            else:
-                tile_extractor = SVGImageTiler(self.__raster_layer, self.__tile_set)
+            tile_extractor = SVGTiler(self.__raster_layer, self.__tile_set)
         else:
             raise TypeError(f'Unsupported kind of background tile source: {kind}')
-        return mp.Process(target=self.__make_zoomed_tiles, args=(tile_extractor, ), name=self.__id) # pyright: ignore[reportAttributeAccessIssue]
+        return mp.Process(target=self.__make_zoomed_tiles, args=(tile_extractor, cached_path), name=self.__id) # pyright: ignore[reportAttributeAccessIssue]
 
 #===============================================================================
 
@@ -18,6 +18,13 @@
 #
 #===============================================================================
 
+import functools
+import re
+from types import MappingProxyType
+from typing import Any, Mapping
+
+#===============================================================================
+
 from pyparsing import alphanums, nums, printables
 from pyparsing import Combine, delimitedList, Group, Keyword
 from pyparsing import Optional, Suppress, Word, ZeroOrMore
@@ -123,32 +130,84 @@ def parse_layer_directive(s):
 
 #===============================================================================
 
-def parse_markup(markup):
-    properties = {'markup': markup}
+FLAG_NAMES = [
+    'background', 'boundary', 'closed', 'exterior', 'interior',
+    'centreline', 'divider', 'group', 'invisible', 'marker', 'node', 'region', 'siblings', 'styling'
+]
+
+# The common forms of markup, just flags and properties with an identifier, are
+# scanned directly. Their whitespace and keyword boundaries are as for the grammar.
+SIMPLE_MARKUP_TOKEN = re.compile(r'(?:(class|children|id|path)[ \t\n\r]*\([ \t\n\r]*'
+                                 r'([A-Za-z0-9][A-Za-z0-9:/_\-.]*)[ \t\n\r]*\)'
+                                 rf'|({"|".join(FLAG_NAMES)})(?![A-Za-z0-9_$]))[ \t\n\r]*')
+SIMPLE_MARKUP_START = re.compile(r'[ \t\n\r]*\.[ \t\n\r]*')
+
+MARKUP_CACHE_SIZE = 65536
+
+#===============================================================================
+
+def __scan_simple_markup(markup: str) -> list[tuple[str, Any]]|None:
+    if (match := SIMPLE_MARKUP_START.match(markup)) is None:
+        return None
+    parsed = []
+    pos = match.end()
+    while pos < len(markup):
+        if (match := SIMPLE_MARKUP_TOKEN.match(markup, pos)) is None:
+            return None
+        if match[3] is not None:
+            parsed.append((match[3], None))
+        else:
+            parsed.append((match[1], match[2]))
+        pos = match.end()
+    return parsed
+
+def __parse_markup(markup: str) -> list[tuple[str, Any]]:
+    parsed = []
+    for prop in SHAPE_MARKUP.parseString(markup, parseAll=True)[1:]:
+        if (FEATURE_FLAGS.matches(prop[0])
+         or SHAPE_FLAGS.matches(prop[0])):
+            parsed.append((prop[0], None))
+        elif prop[0] == 'details':
+            parsed.append((prop[0], (prop[1], prop[2])))
+        else:
+            parsed.append((prop[0], prop[1]))
+    return parsed
+
+@functools.lru_cache(maxsize=MARKUP_CACHE_SIZE)
+def __markup_properties(markup: str) -> Mapping[str, Any]:
+    properties: dict[str, Any] = {'markup': markup}
     deprecated = []
     try:
-        parsed = SHAPE_MARKUP.parseString(markup, parseAll=True)
-        for prop in parsed[1:]:
-            if prop[0] in DEPRECATED_MARKUP:
-                deprecated.append(prop[0])
-            if (FEATURE_FLAGS.matches(prop[0])
-             or SHAPE_FLAGS.matches(prop[0])):
-                properties[prop[0]] = True
-            elif prop[0] == 'details':
-                properties[prop[0]] = prop[1]
-                properties['maxzoom'] = int(prop[2]) - 1
+        if (parsed := __scan_simple_markup(markup)) is None:
+            parsed = __parse_markup(markup)
+        for (name, value) in parsed:
+            if name in DEPRECATED_MARKUP:
+                deprecated.append(name)
+            if name == 'details':
+                properties[name] = value[0]
+                properties['maxzoom'] = int(value[1]) - 1
             else:
-                properties[prop[0]] = prop[1]
+                properties[name] = True if value is None else value
     except ParseException:
         properties['error'] = 'Syntax error'
-        if settings.get('debug', False):
-            raise
     if len(deprecated):
         properties['warning'] = f"Deprecated `{', '.join(deprecated)}`"
     if ('styling' in properties
     and ('id' in properties or 'class' in properties)):
         properties['error'] = "'styling' element can't have an 'id' nor 'class'"
-    return properties
+    return MappingProxyType(properties)
+
+def parse_markup(markup):
+    """
+    Get the properties given by markup.
+
+    Parsed markup is cached, with each call getting its own copy of the properties.
+    """
+    properties = __markup_properties(markup)
+    if properties.get('error') == 'Syntax error' and settings.get('debug', False):
+        # Raise the parser's exception
+        SHAPE_MARKUP.parseString(markup, parseAll=True)
+    return dict(properties)
 
 #===============================================================================
 
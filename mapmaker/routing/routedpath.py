@@ -273,7 +273,7 @@ class IntermediateNode:
            log.error(f'Cannot get width of node {id}')
         self.__width_normal = mid_normal*width/2.0
 
-    def geometry(self, path_source, path_id, start_point, end_point, num_points=100, offset=0, show_controls=False):
+    def geometry(self, path_source, path_id, start_point, end_point, num_points=None, offset=0, show_controls=False):
         node_point = self.__mid_point + self.__width_normal*offset
         geometry = [GeometricShape.circle(
             point_to_coords(node_point),
@@ -125,6 +125,7 @@ class MapSource(object):
         self.__bounds: MapBounds = (0, 0, 0, 0)
         self.__raster_sources = None
         self.__background_raster_source = source_manifest.background_source
+        self.__tile_encoding = source_manifest.tile_encoding
         self.__zoom_point_id = None
         if self.__kind in SOURCE_DETAIL_KINDS:
             if source_manifest.feature is None:
@@ -220,6 +221,10 @@ class MapSource(object):
     def source_range(self) -> Optional[list[int]]:
         return self.__source_range
 
+    @property
+    def tile_encoding(self) -> Optional[str|dict]:
+        return self.__tile_encoding
+
     @property
     def transform(self) -> Optional[Transform]:
         return None
@@ -22,7 +22,6 @@ from urllib.parse import urljoin
 
 #===============================================================================
 
-import cv2
 import lxml.etree as etree
 import numpy as np
 import shapely.geometry
@@ -34,8 +33,8 @@ from .. import MapSource, RasterSource
 from mapmaker.flatmap import FlatMap, SourceManifest
 from mapmaker.flatmap.layers import FEATURES_TILE_LAYER, MapLayer
 from mapmaker.geometry import Transform
-from mapmaker.sources import mask_image
 from mapmaker.utils import FilePath
+from mapmaker.utils.image import ImagePyramid
 
 #===============================================================================
 
@@ -79,12 +78,10 @@ class MBFSource(MapSource):
         offset = (float(coord_element.get('x', 0.0)), float(coord_element.get('y', 0.0)))
 
         filename = image_element.find(self.ns_tag('filename')).text
-        image_file = FilePath(urljoin(self.href, filename.split('\\')[-1]))
-        image_array = np.frombuffer(image_file.get_data(), dtype=np.uint8)
-        self.__image = cv2.imdecode(image_array, cv2.IMREAD_UNCHANGED)
-        if self.__image.shape[2] == 3:
-            self.__image = cv2.cvtColor(self.__image, cv2.COLOR_RGB2RGBA)
-        image_size = (self.__image.shape[1], self.__image.shape[0])
+        self.__image_data = FilePath(urljoin(self.href, filename.split('\\')[-1])).get_data()
+        # The image is only decoded when it is tiled
+        self.__image = ImagePyramid(self.__image_data)
+        image_size = self.__image.size
         self.__image_to_world = (Transform([[scaling[0]*WORLD_METRES_PER_UM,                    0, 0],
                                             [                  0, -scaling[1]*WORLD_METRES_PER_UM, 0],
                                             [                  0,                               0, 1]])
@@ -108,6 +105,10 @@ class MBFSource(MapSource):
     def boundary_geometry(self):
         return self.__boundary_geometry
 
+    @property
+    def image(self) -> ImagePyramid:
+        return self.__image
+
     @property
     def image_to_world(self):
         return self.__image_to_world
@@ -158,14 +159,11 @@ class MBFSource(MapSource):
                     boundary_geometry = feature.geometry
                     self.__layer.boundary_feature = feature
         if boundary_geometry is not None and boundary_geometry.geom_type == 'Polygon':
-            # Save boundary in case transformed image is used for details
+            # Image tiles are masked with the boundary to remove artifacts
             self.__boundary_geometry = boundary_geometry
-            # Mask image with boundary to remove artifacts
-            self.__image = mask_image(self.__image,
-                                      self.__world_to_image.transform_geometry(boundary_geometry))
 
     def get_raster_sources(self) -> list[RasterSource]:
     #==================================================
-        return [RasterSource(f'{self.id}_image', 'image', lambda: self.__image.tobytes(), self)]
+        return [RasterSource(f'{self.id}_image', 'image', lambda: self.__image_data, self)]
 
 #===============================================================================
@@ -27,6 +27,7 @@ from beziers.cubicbezier import CubicBezier
 from beziers.path import BezierPath
 from beziers.point import Point as BezierPoint
 from beziers.quadraticbezier import QuadraticBezier
+from beziers.segment import Segment as BezierSegment
 
 from pptx.shapes.base import BaseShape as PptxShape
 import shapely.geometry
@@ -35,7 +36,7 @@ import svgelements
 #===============================================================================
 
 from mapmaker.geometry import ellipse_point, Transform
-from mapmaker.geometry.beziers import bezier_sample
+from mapmaker.geometry.beziers import bezier_flatten
 from mapmaker.geometry.arc_to_bezier import bezier_segments_from_arc_endpoints, tuple2
 from mapmaker.utils import log
 
@@ -84,7 +85,7 @@ def get_shape_geometry(shape: PptxShape, transform: Transform, properties=None):
                                     tuple2(*current_point), tuple2(*pt),
                                     T)
                 bezier_segments.extend(segs)
-                coordinates.extend(bezier_sample(BezierPath.fromSegments(segs)))
+                coordinates.extend(bezier_flatten(BezierPath.fromSegments(list[BezierSegment](segs))))
                 x_axis_rotation = 0
                 sweep_flag = 1 if segs[0].curvatureAtTime(0) > 0 else 0
                 svg_path.append(svgelements.Arc(T.transform_point(current_point),
@@ -112,7 +113,7 @@ def get_shape_geometry(shape: PptxShape, transform: Transform, properties=None):
                     current_point = pt
                 bz = CubicBezier(*coords)
                 bezier_segments.append(bz)
-                coordinates.extend(bezier_sample(bz))
+                coordinates.extend(bezier_flatten(bz))
                 svg_path.append(segment_as_string('C', *svg_coords))
 
             elif c.tag == DRAWINGML('lnTo'):
@@ -145,7 +146,7 @@ def get_shape_geometry(shape: PptxShape, transform: Transform, properties=None):
                     current_point = pt
                 bz = QuadraticBezier(*coords)
                 bezier_segments.append(bz)
-                coordinates.extend(bezier_sample(bz))
+                coordinates.extend(bezier_flatten(bz))
                 svg_path.append(segment_as_string('Q', *svg_coords))
 
             else:
@@ -20,7 +20,6 @@
 
 import math
 import os
-import tempfile
 import typing
 from typing import Optional
 import unicodedata
@@ -51,10 +50,12 @@ from mapmaker.utils import FilePath, pathlib_path, ProgressBar, log, TreeList
 
 from .. import MapSource, MAX_MAP_DIMENSION, RasterSource
 
-from .cleaner import SVGCleaner
+from .cleaner import CleanedSVG, SVGCleaner
+from .documents import svg_documents
 from .definitions import DefinitionStore, ObjectStore
 from .metadata import get_metadata_names
-from .styling import StyleMatcher, wrap_element
+from .streaming import stream_svg_layers, svg_skeleton
+from .styling import style_matchers, wrap_element
 from .transform import SVGTransform
 from .utils import circle_from_bounds, geometry_from_svg_path, length_as_pixels
 from .utils import check_non_negative, get_geometric_attribute, length_as_points
@@ -112,7 +113,17 @@ class SVGSource(MapSource):
         super().__init__(flatmap, source_manifest)
         self.__source_file = FilePath(source_manifest.href)
         self.__exported = (self.kind == 'base' or self.kind in SOURCE_DETAIL_KINDS)
-        svg_element: etree.Element = etree.parse(self.__source_file.get_fp()).getroot()
+        # Functional maps keep SVG elements with their shapes, so aren't streamed
+        self.__streamed = (settings.get('streamSVG', False)
+                       and flatmap.map_kind != MAP_KIND.FUNCTIONAL)
+        svg_element: etree.Element
+        if self.__streamed:
+            svg_element = svg_skeleton(self.__source_file)
+        else:
+            # The source is parsed again to be cleaned if it's rasterised or is
+            # previewed, otherwise its document needn't be kept
+            last_use = not (self.kind == 'base' or settings.get('backgroundTiles', False))
+            svg_element = svg_documents.parse(self.__source_file.get_data(), last_use=last_use).getroot()
         if 'viewBox' in svg_element.attrib:
             viewbox = [float(x) for x in svg_element.attrib.get('viewBox', '').split()]
             (left, top) = tuple(viewbox[:2])
@@ -158,8 +169,10 @@ class SVGSource(MapSource):
         bottom_right = self.__transform.transform_point((left+width, top+height))
         # southwest and northeast corners
         self.bounds = (top_left[0], bottom_right[1], bottom_right[0], top_left[1])
-        self.__layer = SVGLayer(self.id, self, svg_element, exported=self.__exported, min_zoom=self.min_zoom)
+        self.__layer = SVGLayer(self.id, self, svg_element, exported=self.__exported, min_zoom=self.min_zoom,
+                                stream_from=self.__source_file if self.__streamed else None)
         self.__boundary_geometry = None
+        self.__preview_svg: Optional[bytes] = None
 
     @property
     def boundary_geometry(self):
@@ -184,13 +197,13 @@ class SVGSource(MapSource):
     #========================
         # Save a cleaned copy of the SVG in the map's output directory. Call after
         # connectivity has been generated otherwise no paths will be in the saved SVG
-        cleaner = SVGCleaner(self.__source_file, self.id, self.flatmap.properties_store, all_layers=True)
-        cleaner.clean()
-        cleaner.add_connectivity_group(self.flatmap, self.__transform)
+        if (preview_svg := self.__preview_svg) is None:
+            preview_svg = self.__clean_svg(preview=True, raster=False).preview
+        self.__preview_svg = None
         cleaned_svg = self.flatmap.full_filename(f'images/{self.flatmap.id}.svg')
         os.makedirs(os.path.dirname(cleaned_svg), exist_ok=True)
         with open(cleaned_svg, 'wb') as fp:
-            cleaner.save(fp)
+            fp.write(preview_svg)   # type: ignore
 
     def get_raster_sources(self) -> list[RasterSource]:
     #==================================================
@@ -206,22 +219,36 @@ class SVGSource(MapSource):
 
     def __get_raster_data(self) -> bytes:
     #====================================
-        cleaner = SVGCleaner(self.__source_file, '', self.flatmap.properties_store, all_layers=False)
-        cleaner.clean()
-        cleaned_svg = tempfile.TemporaryFile()
-        cleaner.save(cleaned_svg)
-        cleaned_svg.seek(0)
-        return cleaned_svg.read()
+        # Rasterising is after connectivity has been generated, so the base map's
+        # preview is cleaned at the same time and kept until it is saved
+        cleaned_svg = self.__clean_svg(preview=(self.kind == 'base'), raster=True)
+        self.__preview_svg = cleaned_svg.preview
+        return cleaned_svg.raster       # type: ignore
+
+    def __clean_svg(self, preview: bool, raster: bool) -> CleanedSVG:
+    #================================================================
+        cleaner = SVGCleaner(self.__source_file, self.id, self.flatmap.properties_store)
+        return cleaner.clean(preview=preview, raster=raster,
+                             flatmap=self.flatmap, transform=self.__transform)
 
 #===============================================================================
 
 class SVGLayer(MapLayer):
-    def __init__(self, layer_id: str, source: SVGSource, svg_element: etree.Element, exported=True, min_zoom=None):
+    def __init__(self, layer_id: str, source: SVGSource, svg_element: etree.Element, exported=True, min_zoom=None,
+                       stream_from: Optional[FilePath]=None):
         super().__init__(layer_id, source, exported=exported, min_zoom=min_zoom)
         self.__svg_element = svg_element
-        self.__style_matcher = StyleMatcher(svg_element.find(f'.//{SVG_TAG('style')}'))
+        self.__style_matcher = style_matchers.get(svg_element.find(f'.//{SVG_TAG('style')}'))
         self.__transform = source.transform
         self.__definitions = DefinitionStore()
+        self.__stream_from = stream_from
+        if stream_from is not None:
+            # ``svg_element`` is a skeleton of the source, so all definitions
+            # are known before any element that uses them is streamed
+            for defs_element in svg_element.iter(SVG_TAG('defs')):
+                for element in defs_element:
+                    if element.tag != SVG_TAG('clipPath'):
+                        self.__definitions.add_definition(element)
         self.__clip_geometries = ObjectStore[BaseGeometry]()
         self.__celldl_source = False
         if self.flatmap.map_kind == MAP_KIND.FUNCTIONAL:
@@ -246,10 +273,13 @@ class SVGLayer(MapLayer):
     def process(self):
     #=================
         properties = {'tile-layer': FEATURES_TILE_LAYER}   # Passed through to map viewer
-        shapes = self.__process_element_list(wrap_element(self.__svg_element),
-                                             self.__transform,
-                                             properties,
-                                             None, show_progress=True)
+        if self.__stream_from is None:
+            shapes = self.__process_element_list(wrap_element(self.__svg_element),
+                                                 self.__transform,
+                                                 properties,
+                                                 None, show_progress=True)
+        else:
+            shapes = self.__process_element_stream(self.__stream_from, properties)
         self.__process_shapes(shapes)
 
     def __process_shapes(self, shapes: TreeList[Shape]) -> list[Feature]:
@@ -342,7 +372,7 @@ class SVGLayer(MapLayer):
         group_style = self.__style_matcher.element_style(wrapped_group, parent_style)
         group_transform = self.__get_transform(wrapped_group)
         T = transform@group_transform
-        group_clip_path = group_style.pop('clip-path', None)
+        group_clip_path = group_style.get('clip-path')
         clipped = self.__clip_geometries.get_by_url(group_clip_path)
         if clipped is not None:
             # Replace any shapes inside a clipped group with just the clipped outline
@@ -370,24 +400,49 @@ class SVGLayer(MapLayer):
         shapes: TreeList[Shape] = TreeList()
         for wrapped_element in children:
             progress_bar.update(1)
-            element = wrapped_element.etree_element
-            if (element.tag is etree.Comment
-             or element.tag is etree.PI
-             or element.tag in IGNORED_SVG_TAGS):
-                continue
-            elif element.tag == SVG_TAG('defs'):
-                self.__add_definitions(element, transform)
-                continue
-            elif element.tag == SVG_TAG('use'):
-                element = self.__definitions.use(element)
-                wrapped_element = wrap_element(element)
-            if element is not None and element.tag == SVG_TAG('clipPath'):
-                self.__add_clip_geometry(element, transform)
-            elif (shape := self.__process_element(wrapped_element, transform, parent_properties, parent_style)) is not None:
+            if (shape := self.__process_list_element(wrapped_element, transform, parent_properties, parent_style)) is not None:
+                shapes.append(shape)
+        progress_bar.close()
+        return shapes
+
+    def __process_element_stream(self, svg_file: FilePath, properties) -> TreeList[Shape]:
+    #=====================================================================================
+        # Process the top-level elements of an SVG source one at a time, releasing
+        # each once it has been converted into shapes
+        progress_bar = ProgressBar(unit='lyr', ncols=40,
+            bar_format='{l_bar}{bar}| {n_fmt} layers')
+        shapes: TreeList[Shape] = TreeList()
+        for element in stream_svg_layers(svg_file):
+            progress_bar.update(1)
+            # The element is the root's first child, with any following it
+            # still being parsed
+            wrapped_element = next(wrap_element(element.getparent()).iter_children())
+            if (shape := self.__process_list_element(wrapped_element, self.__transform, properties, None)) is not None:
+                # Shapes mustn't keep the element, so that its memory can be reused
+                for child in (shape.flatten() if isinstance(shape, TreeList) else [shape]):
+                    child.pop_property('svg-element')
                 shapes.append(shape)
         progress_bar.close()
         return shapes
 
+    def __process_list_element(self, wrapped_element: ElementWrapper, transform, parent_properties, parent_style) -> Optional[Shape|TreeList[Shape]]:
+    #================================================================================================================================================
+        element = wrapped_element.etree_element
+        if (element.tag is etree.Comment
+         or element.tag is etree.PI
+         or element.tag in IGNORED_SVG_TAGS):
+            return None
+        elif element.tag == SVG_TAG('defs'):
+            self.__add_definitions(element, transform)
+            return None
+        elif element.tag == SVG_TAG('use'):
+            element = self.__definitions.use(element)
+            wrapped_element = wrap_element(element)
+        if element is not None and element.tag == SVG_TAG('clipPath'):
+            self.__add_clip_geometry(element, transform)
+            return None
+        return self.__process_element(wrapped_element, transform, parent_properties, parent_style)
+
     def __add_definitions(self, defs_element, transform):
     #====================================================
         for element in defs_element:
@@ -460,7 +515,7 @@ class SVGLayer(MapLayer):
                 return Shape(shape_id, geometry, properties, svg_element=element)
         elif element.tag == SVG_TAG('image'):
             geometry = None
-            clip_path_url = element_style.pop('clip-path', None)
+            clip_path_url = element_style.get('clip-path')
             if clip_path_url is not None:
                 if ((geometry := self.__clip_geometries.get_by_url(clip_path_url)) is None
                 and (clip_path_element := self.__definitions.get_by_url(clip_path_url)) is not None):
@@ -18,8 +18,11 @@
 #
 #===============================================================================
 
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import BinaryIO, TYPE_CHECKING
+import enum
+import hashlib
+from typing import Optional, TYPE_CHECKING
 
 #===============================================================================
 
@@ -35,6 +38,7 @@ from mapmaker.properties.markup import parse_markup
 from mapmaker.utils import FilePath
 
 from .. import EXCLUDED_FEATURE_TYPES, EXCLUDE_SHAPE_TYPES, EXCLUDE_TILE_LAYERS
+from .documents import svg_documents
 from .utils import length_as_pixels, svg_element_from_feature, svg_markup, SVG_TAG
 
 if TYPE_CHECKING:
@@ -43,9 +47,77 @@ if TYPE_CHECKING:
 
 #===============================================================================
 
+class ELEMENT_CLASS(enum.IntFlag):
+    NONE            = 0
+    EXCLUDED        = 1     # Not in any cleaned SVG
+    RASTER_EXCLUDED = 2     # Not in the SVG that is rasterised
+    FEATURE         = 4     # Has feature markup, so isn't stroked when rasterised
+
+#===============================================================================
+
+class ElementClassCache(object):
+    """
+    How elements with markup were classified when cleaning SVG, by element
+    id, for the cleaned SVG that is rasterised. This saves the rasteriser
+    parsing markup again.
+    """
+    def __init__(self):
+        self.__element_classes: dict[bytes, dict[str, Optional[ELEMENT_CLASS]]] = {}
+        self.__classified = 0
+        self.__lookups = 0
+
+    @property
+    def statistics(self) -> dict[str, int]:
+        return {
+            'classified': self.__classified,
+            'lookups': self.__lookups
+        }
+
+    def add(self, data: bytes, element_classes: dict[str, Optional[ELEMENT_CLASS]]):
+    #================================================================================
+        self.__element_classes[hashlib.sha256(data).digest()] = element_classes
+        self.__classified += len(element_classes)
+
+    def clear(self):
+    #===============
+        self.__element_classes = {}
+        self.__classified = 0
+        self.__lookups = 0
+
+    def get(self, data: bytes) -> dict[str, Optional[ELEMENT_CLASS]]:
+    #================================================================
+        """
+        Element classes, by id, for some cleaned SVG. An id maps to ``None`` when
+        elements sharing it were classified differently.
+        """
+        self.__lookups += 1
+        return self.__element_classes.get(hashlib.sha256(data).digest(), {})
+
+#===============================================================================
+
+# Elements classified in making a map
+
+element_classes = ElementClassCache()
+
+#===============================================================================
+
+@dataclass
+class CleanedSVG:
+    preview: Optional[bytes] = None     # With all layers, connectivity and element ids prefixed by the layer's
+    raster: Optional[bytes] = None      # Without the layers that are only vector tiles
+
+#===============================================================================
+
 class SVGCleaner(object):
-    def __init__(self, svg_file: FilePath, map_layer_id: str, properties_store: 'PropertiesStore', all_layers: bool=True):
-        self.__svg = etree.parse(svg_file.get_fp())
+    """
+    Clean SVG for previews and rasterising.
+
+    The SVG is traversed once, classifying each element with markup, with all
+    of the requested variants of the cleaned SVG then made from the result.
+    """
+    def __init__(self, svg_file: FilePath, map_layer_id: str, properties_store: 'PropertiesStore'):
+        # Cleaning is the last use of the source's document
+        self.__svg = svg_documents.parse(svg_file.get_data(), last_use=True)
         self.__svg_root = self.__svg.getroot()
         self.__map_layer_id = map_layer_id
 
@@ -60,68 +132,131 @@ class SVGCleaner(object):
         self.__svg_root.attrib.pop('height', None)
 
         self.__properties_store = properties_store
-        self.__all_layers = all_layers
+        self.__element_classes: dict[str, Optional[ELEMENT_CLASS]] = {}
+        self.__raster_excluded: list[etree.Element] = []
 
-    def add_connectivity_group(self, flatmap: 'FlatMap', transform: Transform):
-    #==========================================================================
-        # add tile-layer features that don't have an 'svg-element'
-        # need to add a <g> element
-        if self.__all_layers:
-            connectivity_group = etree.Element(SVG_TAG('g'))
-            inverse_transform = svgelements.Matrix(transform.inverse().svg_matrix)
-            self.__svg_root.append(connectivity_group)
-            for layer in flatmap.layers:
-                if layer.exported:
-                    for feature in layer.features:
-                        if (feature.properties.get('tile-layer') == PATHWAYS_TILE_LAYER
-                        and 'Line' in feature.properties['geometry']):
-                            element = svg_element_from_feature(feature, inverse_transform)
-                            connectivity_group.append(element)
-
-    def clean(self):
-    #===============
-        self.__filter(self.__svg_root)
+    def clean(self, preview: bool=True, raster: bool=True,
+              flatmap: Optional['FlatMap']=None, transform: Optional[Transform]=None) -> CleanedSVG:
+    #==========================================================================================
+        """
+        Make cleaned SVG.
+
+        :param preview: Make SVG to preview the map
+        :param raster: Make SVG for rasterising
+        :param flatmap: The map whose connectivity is added to the preview
+        :param transform: The transform from SVG to map coordinates
+        :returns: The requested variants of the cleaned SVG
+        """
+        cleaned = CleanedSVG()
+        self.__filter(self.__svg_root, preview)
+        if preview:
+            cleaned.preview = self.__preview_data(flatmap, transform, restore=raster)
+        if raster:
+            for element in self.__raster_excluded:
+                if (parent := element.getparent()) is not None:
+                    parent.remove(element)
+            # No generator comment so that the same source always gives the same
+            # result. The cleaned document is kept so that it doesn't have to be
+            # parsed again.
+            raster_data = etree.tostring(self.__svg, encoding='utf-8', xml_declaration=True)
+            svg_documents.add(raster_data, self.__svg)
+            element_classes.add(raster_data, self.__element_classes)
+            cleaned.raster = raster_data
+        return cleaned
+
+    def __preview_data(self, flatmap: Optional['FlatMap'], transform: Optional[Transform], restore: bool) -> bytes:
+    #==============================================================================================================
         # Update element IDs to include that of the map layer they are in
+        original_ids = []
         if self.__map_layer_id != '':
             layer_prefix = f'{self.__map_layer_id}/'
             for xml_element in self.__svg.findall('.//*[@id]'):
                 id = xml_element.attrib['id']
                 if not id.startswith(layer_prefix):
                     xml_element.attrib['id'] = f'{layer_prefix}{id}'
-
-    def save(self, file_object: BinaryIO):
-    #=====================================
+                    original_ids.append((xml_element, id))
+        connectivity_group = None
+        if flatmap is not None and transform is not None:
+            connectivity_group = self.__connectivity_group(flatmap, transform)
+            self.__svg_root.append(connectivity_group)
         header = ' Generator: mapmaker {} at {} '.format(__version__, datetime.now(timezone.utc).isoformat(timespec='seconds'))
         comments = self.__svg.xpath('/comment()')
         if len(comments):
-            comments[0].text = header
+            comment = comments[0]
+            original_header = comment.text
+            comment.text = header
         else:
-            self.__svg_root.addprevious(etree.Comment(header))
-        self.__svg.write(file_object, encoding='utf-8', pretty_print=True, xml_declaration=True)
-
-    def __filter(self, element, parent=None):
-    #========================================
-        if parent is not None and self.__exclude(element):
-            parent.remove(element)
-            return
+            comment = etree.Comment(header)
+            original_header = None
+            self.__svg_root.addprevious(comment)
+        data = etree.tostring(self.__svg, encoding='UTF-8', pretty_print=True, xml_declaration=True)
+        if restore:
+            # Undo changes so that the document can be used for other variants
+            if original_header is not None:
+                comment.text = original_header
+            else:
+                # A sibling of the root has no parent to remove it from
+                self.__svg_root.insert(0, comment)
+                self.__svg_root.remove(comment)
+            if connectivity_group is not None:
+                self.__svg_root.remove(connectivity_group)
+            for (xml_element, id) in original_ids:
+                xml_element.attrib['id'] = id
+        return data
+
+    def __connectivity_group(self, flatmap: 'FlatMap', transform: Transform) -> etree.Element:
+    #=========================================================================================
+        # add tile-layer features that don't have an 'svg-element'
+        # need to add a <g> element
+        connectivity_group = etree.Element(SVG_TAG('g'))
+        inverse_transform = svgelements.Matrix(transform.inverse().svg_matrix)
+        for layer in flatmap.layers:
+            if layer.exported:
+                for feature in layer.features:
+                    if (feature.properties.get('tile-layer') == PATHWAYS_TILE_LAYER
+                    and 'Line' in feature.properties['geometry']):
+                        element = svg_element_from_feature(feature, inverse_transform)
+                        connectivity_group.append(element)
+        return connectivity_group
+
+    def __filter(self, element, all_layers: bool, parent=None):
+    #==========================================================
+        if parent is not None:
+            element_class = self.__classify(element)
+            if element_class & ELEMENT_CLASS.EXCLUDED:
+                parent.remove(element)
+                return
+            elif element_class & ELEMENT_CLASS.RASTER_EXCLUDED:
+                self.__raster_excluded.append(element)
+                if not all_layers:
+                    return
         for child in element:
-            self.__filter(child, element)
+            self.__filter(child, all_layers, element)
 
-    def __exclude(self, element):
-    #============================
+    def __classify(self, element) -> ELEMENT_CLASS:
+    #==============================================
+        element_class = ELEMENT_CLASS.NONE
         markup = svg_markup(element)
         if markup.startswith('.'):
             properties = parse_markup(markup)
+            if ('centreline' in properties or 'node' in properties
+             or 'id' in properties or 'class' in properties):
+                element_class |= ELEMENT_CLASS.FEATURE
             properties = self.__properties_store.update_properties(properties)
             for key, value in properties.items():
-                if not self.__all_layers and key == 'tile-layer' and value in EXCLUDE_TILE_LAYERS:
-                    return True
+                if key == 'tile-layer' and value in EXCLUDE_TILE_LAYERS:
+                    element_class |= ELEMENT_CLASS.RASTER_EXCLUDED
                 elif key in EXCLUDE_SHAPE_TYPES:
-                    return True
+                    element_class |= ELEMENT_CLASS.EXCLUDED
                 elif key == 'type' and value in EXCLUDED_FEATURE_TYPES:
-                    return True
+                    element_class |= ELEMENT_CLASS.EXCLUDED
                 elif key == 'exclude' and value:
-                    return True
-        return False
+                    element_class |= ELEMENT_CLASS.EXCLUDED
+            if (id := element.attrib.get('id')) is not None:
+                if id not in self.__element_classes:
+                    self.__element_classes[id] = element_class
+                elif self.__element_classes[id] != element_class:
+                    self.__element_classes[id] = None
+        return element_class
 
 #===============================================================================
@@ -0,0 +1,121 @@
+#===============================================================================
+#
+#  Flatmap viewer and annotation tools
+#
+#  Copyright (c) 2026  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#===============================================================================
+
+import copy
+import hashlib
+import time
+
+#===============================================================================
+
+import lxml.etree as etree
+
+#===============================================================================
+
+class SVGDocumentCache(object):
+    """
+    Parsed SVG documents, keyed by a hash of their content, so that the same
+    SVG is only parsed once in a build.
+
+    Documents are changed by the code using them, so each use gets its own
+    copy of the parsed document, which is much quicker to make than parsing.
+    A document's last expected user is given the parsed document itself, which
+    is then no longer kept.
+    """
+    def __init__(self):
+        self.__documents: dict[bytes, etree._ElementTree] = {}
+        self.__parse_time = 0.0
+        self.__parse_count = 0
+        self.__copy_count = 0
+        self.__evict_count = 0
+
+    @property
+    def statistics(self) -> dict[str, int|float]:
+        return {
+            'parsed': self.__parse_count,
+            'copied': self.__copy_count,
+            'evicted': self.__evict_count,
+            'parse_seconds': round(self.__parse_time, 2)
+        }
+
+    @staticmethod
+    def __key(data: bytes) -> bytes:
+        return hashlib.sha256(data).digest()
+
+    def add(self, data: bytes, document: etree._ElementTree):
+    #========================================================
+        """
+        Add an already parsed document, such as one made in memory from
+        another, as the parsed form of ``data``. The document mustn't be
+        changed after being added.
+        """
+        self.__documents[self.__key(data)] = document
+
+    def clear(self):
+    #===============
+        self.__documents = {}
+        self.__parse_time = 0.0
+        self.__parse_count = 0
+        self.__copy_count = 0
+        self.__evict_count = 0
+
+    def discard(self, data: bytes):
+    #==============================
+        """
+        Forget the parsed document for some SVG that won't be used again.
+        """
+        if self.__documents.pop(self.__key(data), None) is not None:
+            self.__evict_count += 1
+
+    def parse(self, data: bytes, last_use: bool=False) -> etree._ElementTree:
+    #========================================================================
+        """
+        Get a copy of the parsed document for some SVG.
+
+        :param data: The SVG
+        :param last_use: Nothing else will parse the SVG, so return the
+                         parsed document itself, without keeping it
+        """
+        key = self.__key(data)
+        if last_use:
+            if (document := self.__documents.pop(key, None)) is not None:
+                self.__evict_count += 1
+                return document
+            return self.__parse(data)
+        if (document := self.__documents.get(key)) is None:
+            document = self.__parse(data)
+            self.__documents[key] = document
+        self.__copy_count += 1
+        return copy.deepcopy(document)
+
+    def __parse(self, data: bytes) -> etree._ElementTree:
+    #====================================================
+        start_time = time.perf_counter()
+        document = etree.fromstring(data, parser=etree.XMLParser(huge_tree=True)).getroottree()
+        self.__parse_time += time.perf_counter() - start_time
+        self.__parse_count += 1
+        return document
+
+#===============================================================================
+
+# Documents used in making a map
+
+svg_documents = SVGDocumentCache()
+
+#===============================================================================
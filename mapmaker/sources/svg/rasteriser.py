@@ -20,9 +20,10 @@
 
 import base64
 import contextlib
+import hashlib
 import math
 import typing
-from typing import Optional, TYPE_CHECKING
+from typing import Any, Callable, Optional, TYPE_CHECKING
 
 #===============================================================================
 
@@ -43,8 +44,10 @@ from mapmaker.settings import MAP_KIND
 from mapmaker.utils import FilePath, ProgressBar, log
 
 from . import DETAILED_MAP_BORDER, SVGSource
+from .cleaner import element_classes, ELEMENT_CLASS
 from .definitions import DefinitionStore, ObjectStore
-from .styling import ElementStyleDict, StyleMatcher, wrap_element
+from .documents import svg_documents
+from .styling import ElementStyleDict, style_matchers, wrap_element
 from .transform import SVGTransform
 from .utils import get_geometric_attribute, length_as_pixels, length_as_points, parse_svg_path
 from .utils import percentage_dimension, svg_from_image_element, svg_markup, SVG_TAG, XLINK_HREF
@@ -84,9 +87,36 @@ def prescale_factor(width: float, height: float) -> int:
 
 #===============================================================================
 
+# Groups with at least this many drawing objects have a spatial index of them
+SPATIAL_INDEX_MIN_OBJECTS = 32
+
+#===============================================================================
+
+type PixelBounds = tuple[float, float, float, float]
+
+# The BGRA colour of an opaque fill and the rectangle it completely covers
+type OpaqueFill = tuple[tuple[int, int, int, int], PixelBounds]
+
+def _pixel_bounds(bounds) -> PixelBounds:
+#========================================
+    (x0, y0, x1, y1) = (float(b) for b in bounds)
+    return (x0, y0, x1, y1)
+
+#===============================================================================
+
 def round(x: float|int) -> int:
     return int(math.floor(x + 0.5))
 
+def is_axis_aligned(transform: Transform) -> bool:
+    matrix = transform.matrix
+    return (matrix[0, 1] == 0 and matrix[1, 0] == 0
+        and matrix[2, 0] == 0 and matrix[2, 1] == 0)
+
+def opaque_colour(paint: skia.Paint) -> Optional[tuple[int, int, int, int]]:
+    if paint.getShader() is None and paint.getAlpha() == 255:
+        colour = paint.getColor()
+        return (skia.ColorGetB(colour), skia.ColorGetG(colour), skia.ColorGetR(colour), 255)
+
 #===============================================================================
 
 def make_colour(colour_string, opacity=1.0):
@@ -117,6 +147,36 @@ def make_colour(colour_string, opacity=1.0):
 
 #===============================================================================
 
+class ResourceCache(object):
+    """
+    Resources, such as decoded images, that are made once when first used
+    and then shared, with a count of how often they are reused.
+    """
+    def __init__(self):
+        self.__resources: dict[Any, Any] = {}
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.__hits + self.__misses
+        return self.__hits/lookups if lookups else 0.0
+
+    @property
+    def lookups(self) -> int:
+        return self.__hits + self.__misses
+
+    def get(self, key, make: Callable[[], Any]) -> Any:
+    #==================================================
+        if key in self.__resources:
+            self.__hits += 1
+        else:
+            self.__misses += 1
+            self.__resources[key] = make()
+        return self.__resources[key]
+
+#===============================================================================
+
 class GradientStops(object):
     def __init__(self, element):
         self.__offsets = []
@@ -202,7 +262,11 @@ class CanvasDrawingObject(object):
 class CanvasPath(CanvasDrawingObject):
     def __init__(self, path: skia.Path, paint: skia.Paint, parent_transform: Transform,
                        local_transform: Optional[Transform], clip_path):
-        super().__init__(paint, path.getBounds(), parent_transform, local_transform, clip_path)
+        bounds = path.getBounds()
+        if paint.getStyle() != skia.Paint.kFill_Style and paint.canComputeFastBounds():
+            # Include the width of any stroke so neighbouring tiles still draw it
+            bounds = paint.computeFastBounds(bounds)
+        super().__init__(paint, bounds, parent_transform, local_transform, clip_path)
         self.__path = path
 
     def draw_element(self, canvas: skia.Canvas, bounds: shapely.Polygon) -> int:
@@ -236,32 +300,21 @@ class CanvasImage(CanvasDrawingObject):
 
 class CanvasText(CanvasDrawingObject):
     def __init__(self, text, attribs, parent_transform: Transform,
-                       local_transform: Optional[Transform], clip_path: skia.Path):
+                       local_transform: Optional[Transform], clip_path: skia.Path,
+                       font_cache: Optional[ResourceCache]=None):
         self.__text = text
         style_rules = dict(attribs)
         if 'style' in attribs:
             styling = attribs.pop('style')
             style_rules.update(dict([rule.split(':', 1) for rule in [rule.strip()
                                                 for rule in styling[:-1].split(';')]]))
-        font_style = skia.FontStyle(int(style_rules.get('font-weight', skia.FontStyle.kNormal_Weight)),
-                                    skia.FontStyle.kNormal_Width,
-                                    skia.FontStyle.kUpright_Slant)
-        type_face = None
-        font_manager = skia.FontMgr()
+        font_weight = int(style_rules.get('font-weight', skia.FontStyle.kNormal_Weight))
         font_families = style_rules.get('font-family', 'Calibri')
-        for font_family in font_families.split(','):
-            type_face = font_manager.matchFamilyStyle(font_family, font_style)
-            if type_face is not None:
-                break
-        if type_face is None:
-            if 'Calibri' not in font_families:
-                type_face = font_manager.matchFamilyStyle('Calibri', font_style)
-                if type_face is None:
-                    type_face = font_manager.matchFamilyStyle(None, font_style)
-            else:
-                type_face = font_manager.matchFamilyStyle(None, font_style)
-        self.__font = skia.Font(type_face,
-                                length_as_points(style_rules.get('font-size', 10)))
+        font_size = length_as_points(style_rules.get('font-size', 10))
+        if font_cache is None:
+            font_cache = ResourceCache()
+        self.__font = font_cache.get((font_families, font_weight, font_size),
+                                     lambda: CanvasText.__make_font(font_families, font_weight, font_size))
         self.__pos = [float(attribs.get('x', 0)), float(attribs.get('y', 0))]
         text_width = self.__font.measureText(text)
         text_height = self.__font.getSpacing()
@@ -278,6 +331,27 @@ class CanvasText(CanvasDrawingObject):
         paint = skia.Paint(AntiAlias=True, Color=skia.ColorBLACK)
         super().__init__(paint, bounds, parent_transform, local_transform, clip_path)
 
+    @staticmethod
+    def __make_font(font_families: str, font_weight: int, font_size) -> skia.Font:
+    #=============================================================================
+        font_style = skia.FontStyle(font_weight,
+                                    skia.FontStyle.kNormal_Width,
+                                    skia.FontStyle.kUpright_Slant)
+        type_face = None
+        font_manager = skia.FontMgr()
+        for font_family in font_families.split(','):
+            type_face = font_manager.matchFamilyStyle(font_family, font_style)
+            if type_face is not None:
+                break
+        if type_face is None:
+            if 'Calibri' not in font_families:
+                type_face = font_manager.matchFamilyStyle('Calibri', font_style)
+                if type_face is None:
+                    type_face = font_manager.matchFamilyStyle(None, font_style)
+            else:
+                type_face = font_manager.matchFamilyStyle(None, font_style)
+        return skia.Font(type_face, font_size)
+
     def draw_element(self, canvas: skia.Canvas, bounds: shapely.Polygon) -> int:
     #===========================================================================
         if self.intersects(bounds):
@@ -296,6 +370,11 @@ class CanvasGroup(CanvasDrawingObject):
                 None)
         super().__init__(None, None, parent_transform, local_transform, clip_path, bbox=bbox, root_object=outermost)
         self.__drawing_objects = drawing_objects
+        # Large groups index their objects' bounds when first drawn into bounds that
+        # don't cover them, so that drawing part of an image only visits the objects
+        # that intersect it. Recording the whole drawing never needs the index
+        self.__spatial_index: Optional[shapely.STRtree] = None
+        self.__unbounded = np.empty(0, dtype=np.intp)
 
     @property
     def is_valid(self):
@@ -306,10 +385,24 @@ class CanvasGroup(CanvasDrawingObject):
         drawn_elements: int = 0
         if self.intersects(bounds):
             with self.transformed_clipped_canvas(canvas):
-                for element in self.__drawing_objects:
+                for element in self.__objects_intersecting(bounds):
                     drawn_elements += element.draw_element(canvas, bounds)
         return drawn_elements
 
+    def __objects_intersecting(self, bounds: shapely.Polygon) -> list[CanvasDrawingObject]:
+    #======================================================================================
+        if (len(self.__drawing_objects) < SPATIAL_INDEX_MIN_OBJECTS
+         or self.bbox is None or bounds.contains(self.bbox)):
+            return self.__drawing_objects
+        if self.__spatial_index is None:
+            bboxes = [element.bbox for element in self.__drawing_objects]
+            self.__spatial_index = shapely.STRtree(bboxes)
+            self.__unbounded = np.array([n for (n, bbox) in enumerate(bboxes) if bbox is None], dtype=np.intp)
+        # Objects without bounds are always visited, and objects are drawn in their
+        # original order
+        indices = np.union1d(self.__spatial_index.query(bounds, predicate='intersects'), self.__unbounded)
+        return [self.__drawing_objects[n] for n in indices]
+
 #===============================================================================
 #===============================================================================
 
@@ -327,11 +420,20 @@ class SVGTiler(object):
         self.__rasteriser = SVGRasteriser(raster_layer.source_data,
                                           (tile_set.pixel_rect.width, tile_set.pixel_rect.height),
                                           background=background,
-                                          source_path=raster_layer.source_path)
+                                          source_path=raster_layer.source_path,
+                                          last_use=True)
         self.__rasteriser.render()
 
+        # Tiles replay the drawing as recorded, with skia culling drawing operations
+        # that are outside of a tile
+        self.__picture = self.__rasteriser.get_picture()
+        self.__picture_bbox = (shapely.box(*tuple(self.__picture.cullRect()))
+                                if self.__picture is not None else None)
+        log.info('Rendered layer for tiling', layer=raster_layer.id,
+                    cache_hit_rates=self.__rasteriser.cache_hit_rates)
+
         scaling = self.__rasteriser.scaling
-        local_size = self.__rasteriser.scaling
+        local_size = (self.__rasteriser.size[0]/scaling[0], self.__rasteriser.size[1]/scaling[1])
         svg_source = typing.cast(SVGSource, raster_layer.map_source)
         metres_per_pixel = svg_source.metres_per_pixel
 
@@ -344,16 +446,96 @@ class SVGTiler(object):
                       [0.0, -1.0,  scaling[1]*local_size[1]/2.0],
                       [0.0,  0.0,                          1.0]]))
 
-        self.__pixel_offset = tuple(tile_set.pixel_rect)[0:2]
         self.__tile_size = tile_set.tile_size
         self.__tile_origin = tile_set.start_coords
-        self.__tile_bboxes: dict[str, shapely.Polygon] = {}
-        for tile in tile_set:
-            tile_set.tile_coords_to_pixels.transform_point((tile.x, tile.y))
-            x0 = (tile.x - self.__tile_origin[0])*self.__tile_size[0] - self.__pixel_offset[0]
-            y0 = (tile.y - self.__tile_origin[1])*self.__tile_size[1] - self.__pixel_offset[1]
-            tile_bbox = shapely.box(x0, y0, x0 + self.__tile_size[0], y0 + self.__tile_size[0])
-            self.__tile_bboxes[mercantile.quadkey(tile)] = tile_bbox
+        self.__tile_grid = (tile_set.end_coords[0] - tile_set.start_coords[0] + 1,
+                            tile_set.end_coords[1] - tile_set.start_coords[1] + 1)
+
+        # Transform from SVG pixels to tile pixel coordinates, rendering detail layers
+        # directly into their place on the base map rather than via an intermediate
+        # image of the entire layer
+        if raster_layer.local_world_to_base is None:
+            self.__svg_offset: Optional[tuple[float, float]] = (tile_set.pixel_rect.x0, tile_set.pixel_rect.y0)
+            self.__svg_to_tile_pixels = Transform.Translate(self.__svg_offset)
+        else:
+            self.__svg_offset = None
+            self.__svg_to_tile_pixels = (tile_set.world_to_tile_pixels
+                                        @raster_layer.local_world_to_base
+                                        @self.__image_to_world)
+
+        # Clip detail layers to their boundary, as mapped to tile pixel coordinates
+        self.__boundary_path = None
+        if (boundary_geometry := raster_layer.boundary_geometry) is not None:
+            self.__boundary_path = skia.Path()
+            for polygon in shapely.get_parts(tile_set.world_to_tile_pixels.transform_geometry(boundary_geometry)):
+                if polygon.geom_type == 'Polygon':
+                    self.__boundary_path.addPoly([skia.Point(*point) for point in polygon.exterior.coords], True)
+
+    @property
+    def element_records(self) -> list[tuple[str, PixelBounds]]:
+    #==========================================================
+        """
+        The digest of each rendered element, along with its bounds in the tile
+        set's pixel coordinates.
+        """
+        digests = self.__rasteriser.element_digests
+        return [(digest[0], _pixel_bounds(bounds))
+                    for (digest, bounds) in zip(digests, self.__tile_pixel_bounds(
+                        np.array([digest[1] for digest in digests], dtype=np.float64)))]
+
+    def __tile_pixel_bounds(self, bounds: np.ndarray) -> np.ndarray:
+    #===============================================================
+        # Map bounds in SVG pixels to bounds in the tile set's pixel coordinates
+        if len(bounds) == 0:
+            return np.empty((0, 4))
+        corners = np.stack([bounds[:, [0, 1]], bounds[:, [2, 1]],
+                            bounds[:, [2, 3]], bounds[:, [0, 3]]], axis=1).reshape((1, -1, 2))
+        corners = cv2.perspectiveTransform(corners, self.__svg_to_tile_pixels.matrix).reshape((-1, 4, 2))
+        return np.round(np.concatenate([corners.min(axis=1), corners.max(axis=1)], axis=1), 3)
+
+    def tile_coverage(self) -> tuple[np.ndarray, dict[tuple[int, int], tuple[int, int, int, int]]]:
+    #==============================================================================================
+        """
+        Find which tiles are blank and which are a single colour, without
+        rendering them.
+
+        :returns: A boolean array, indexed by tile row and column relative to
+                  the tile set's first tile, that is ``False`` where a tile is
+                  blank, and the BGRA colour of tiles that are a single colour.
+        """
+        (tile_width, tile_height) = self.__tile_size
+        (columns, rows) = self.__tile_grid
+        digests = self.__rasteriser.element_digests
+        bounds = self.__tile_pixel_bounds(np.array([digest[1] for digest in digests], dtype=np.float64))
+
+        # The last element drawn in each tile, allowing a pixel for anti-aliasing
+        tile_ranges = np.stack([np.floor((bounds[:, 0] - 1)/tile_width),
+                                np.floor((bounds[:, 1] - 1)/tile_height),
+                                np.floor((bounds[:, 2] + 1)/tile_width),
+                                np.floor((bounds[:, 3] + 1)/tile_height)], axis=1).astype(np.int64)
+        tile_ranges = np.clip(tile_ranges, 0, [columns-1, rows-1, columns-1, rows-1])
+        last_drawn = np.full((rows, columns), -1, dtype=np.int64)
+        for (n, (x0, y0, x1, y1)) in enumerate(tile_ranges):
+            last_drawn[y0:y1+1, x0:x1+1] = n
+
+        # A tile is a single colour when the last element drawn in it is an
+        # opaque rectangle that covers it. This needs the rectangle's sides to
+        # stay parallel with the tile's, and for there to be no clipping boundary
+        solid_tiles = {}
+        if self.__boundary_path is None and (offset := self.__svg_offset) is not None:
+            for (n, digest) in enumerate(digests):
+                if (opaque_fill := digest[2]) is None:
+                    continue
+                (colour, (x0, y0, x1, y1)) = opaque_fill
+                (x0, x1) = (x0 + offset[0], x1 + offset[0])
+                (y0, y1) = (y0 + offset[1], y1 + offset[1])
+                (tx0, ty0) = (max(0, math.ceil(x0/tile_width)), max(0, math.ceil(y0/tile_height)))
+                (tx1, ty1) = (min(columns, math.floor(x1/tile_width)), min(rows, math.floor(y1/tile_height)))
+                if tx0 < tx1 and ty0 < ty1:
+                    for (ty, tx) in np.argwhere(last_drawn[ty0:ty1, tx0:tx1] == n):
+                        solid_tiles[(self.__tile_origin[0] + tx0 + int(tx),
+                                     self.__tile_origin[1] + ty0 + int(ty))] = colour
+        return (last_drawn >= 0, solid_tiles)
 
     @property
     def image_to_world(self) -> Transform:
@@ -369,15 +551,25 @@ class SVGTiler(object):
         surface = skia.Surface(*self.__tile_size)  ## In pixels...
         canvas = surface.getCanvas()
         canvas.clear(skia.Color4f(0xFFFFFFFF))
-        canvas.translate(self.__pixel_offset[0] + (self.__tile_origin[0] - tile.x)*self.__tile_size[0],
-                         self.__pixel_offset[1] + (self.__tile_origin[1] - tile.y)*self.__tile_size[1])
-        quadkey = mercantile.quadkey(tile)
-        if quadkey in self.__tile_bboxes:
-            drawn_elements = self.__rasteriser.draw_element(canvas, self.__tile_bboxes[quadkey])
-            if drawn_elements:
-                image = surface.makeImageSnapshot()
-                return image.toarray(colorType=skia.kBGRA_8888_ColorType)
-        return None
+        tile_offset = ((self.__tile_origin[0] - tile.x)*self.__tile_size[0],
+                       (self.__tile_origin[1] - tile.y)*self.__tile_size[1])
+        canvas.translate(*tile_offset)
+        if self.__boundary_path is not None:
+            canvas.clipPath(self.__boundary_path, doAntiAlias=True)
+        svg_to_tile = Transform.Translate(tile_offset)@self.__svg_to_tile_pixels
+        if self.__picture_bbox is None or not self.__picture_bbox.intersects(self.__tile_bbox(svg_to_tile)):
+            return None
+        canvas.concat(skia.Matrix(list(self.__svg_to_tile_pixels.flatten())))
+        canvas.drawPicture(self.__picture)
+        image = surface.makeImageSnapshot()
+        return image.toarray(colorType=skia.kBGRA_8888_ColorType)
+
+    def __tile_bbox(self, svg_to_tile: Transform) -> shapely.Polygon:
+    #================================================================
+        # The tile's outline in SVG pixels, allowing for any perspective in the transform
+        (width, height) = self.__tile_size
+        corners = np.array([[[0, 0], [width, 0], [width, height], [0, height]]], dtype=np.float64)
+        return shapely.Polygon(cv2.perspectiveTransform(corners, svg_to_tile.inverse().matrix)[0])
 
 #===============================================================================
 
@@ -392,10 +584,15 @@ class SVGRasteriser:
     :param background: optionally add a background to the rasterised image with this colour.
     :param source_path: the path of the SVG source, used to resolve
                         relative ``href``s of any embedded images.
+    :param last_use: nothing else will parse the SVG, so its parsed document
+                     needn't be kept.
     """
     def __init__(self, source_svg: bytes, size: tuple[float, float]|None=None,
-                       background: str|None=None, source_path: Optional[FilePath]=None):
-        self.__svg = etree.fromstring(source_svg, parser=etree.XMLParser(huge_tree=True))
+                       background: str|None=None, source_path: Optional[FilePath]=None,
+                       last_use: bool=False):
+        self.__svg = svg_documents.parse(source_svg, last_use=last_use).getroot()
+        # Element classes found when the SVG was cleaned
+        self.__element_classes = element_classes.get(source_svg)
         # Get any size specified in the <svg /> element
         width = length_as_pixels(self.__svg.attrib.get('width'))
         height = length_as_pixels(self.__svg.attrib.get('height'))
@@ -440,12 +637,37 @@ class SVGRasteriser:
                                       [0.0, 0.0,  1.0]])
 
         self.__background = background
-        self.__clip_paths = ObjectStore[BaseGeometry]()
+        self.__clip_paths = ObjectStore[skia.Path]()
         self.__definitions = DefinitionStore()
         self.__source_path = source_path
-        self.__style_matcher = StyleMatcher(self.__svg.find(f'.//{SVG_TAG('style')}'))
+        self.__style_matcher = style_matchers.get(self.__svg.find(f'.//{SVG_TAG('style')}'))
+        # Resources that are used by more than one element are only made once
+        self.__resource_caches = {
+            'clip-paths': ResourceCache(),
+            'fonts': ResourceCache(),
+            'gradients': ResourceCache(),
+            'images': ResourceCache(),
+            'shaders': ResourceCache(),
+        }
         self.__scaling = None
         self.__svg_drawing = None
+        self.__element_digests: list[tuple[str, PixelBounds, Optional[OpaqueFill]]] = []
+
+    @property
+    def element_digests(self) -> list[tuple[str, PixelBounds, Optional[OpaqueFill]]]:
+    #================================================================================
+        """
+        A digest of each rendered element and group, in drawing order, along
+        with the bounds of what it draws, in rendered pixels, and, for an element
+        that is an opaque rectangle, its colour and the area it covers.
+        """
+        return self.__element_digests
+
+    @property
+    def cache_hit_rates(self) -> dict[str, float]:
+    #=============================================
+        return {name: round(1000*cache.hit_rate)/1000 for (name, cache) in self.__resource_caches.items()
+                    if cache.lookups > 0}
 
     @property
     def scaling(self):
@@ -466,6 +688,7 @@ class SVGRasteriser:
         svg_to_tile_transform = Transform([[self.__scaling[0],               0.0, 0.0],
                                            [              0.0, self.__scaling[1], 0.0],
                                            [              0.0,               0.0, 1.0]])@self.__transform
+        self.__element_digests = []
         self.__svg_drawing = self.__draw_svg(svg_to_tile_transform)
 
     def get_image(self, bounds: shapely.Polygon|None=None) -> skia.Image:
@@ -481,6 +704,17 @@ class SVGRasteriser:
         self.draw_element(canvas, bounds)
         return surface.makeImageSnapshot()
 
+    def get_picture(self) -> Optional[skia.Picture]:
+    #===============================================
+        assert self.__svg_drawing is not None
+        # Record the drawing, with a spatial index of its operations
+        if (bounds := self.__svg_drawing.bbox) is None:
+            return None
+        recorder = skia.PictureRecorder()
+        canvas = recorder.beginRecording(skia.Rect(*bounds.bounds), skia.RTreeFactory()())
+        self.draw_element(canvas, bounds)
+        return recorder.finishRecordingAsPicture()
+
     def save_image(self, png_output):
     #================================
         image = self.get_image()
@@ -523,18 +757,53 @@ class SVGRasteriser:
                                     self.__local_size[0], self.__local_size[1]),
                                     DETAILED_MAP_BORDER/2, DETAILED_MAP_BORDER/2)
             paint = skia.Paint(AntiAlias=True, Color=make_colour(self.__background, 1.0))
-            drawing_objects.insert(0, CanvasPath(path, paint, svg_to_tile_transform, transform, None))
+            background = CanvasPath(path, paint, svg_to_tile_transform, transform, None)
+            drawing_objects.insert(0, background)
+            opaque_fill = None
+            T = svg_to_tile_transform if transform is None else svg_to_tile_transform@transform
+            if (colour := opaque_colour(paint)) is not None and is_axis_aligned(T):
+                inset = DETAILED_MAP_BORDER/2
+                opaque_fill = (colour, T.transform_geometry(shapely.box(
+                    self.__left_top[0] + inset, self.__left_top[1] + inset,
+                    self.__left_top[0] + self.__local_size[0] - inset,
+                    self.__left_top[1] + self.__local_size[1] - inset)).bounds)
+            assert background.bbox is not None
+            self.__add_element_digest([b'background', self.__background.encode()],
+                                      background.bbox.bounds, opaque_fill, position=0)
         return CanvasGroup(drawing_objects, svg_to_tile_transform, transform, None, outermost=True)
 
     def __draw_group(self, group, parent_transform, parent_style) -> CanvasGroup:
     #============================================================================
         group_style = self.__style_matcher.element_style(group, parent_style)
-        group_clip_path = group_style.pop('clip-path', None)
+        group_clip_path = group_style.get('clip-path')
         transform = self.__get_transform(group)
+        first_digest = len(self.__element_digests)
         drawing_objects = self.__draw_element_list(group,
             parent_transform if transform is None else parent_transform@transform,
             group_style)
-        return CanvasGroup(drawing_objects, parent_transform, transform, self.__clip_paths.get_by_url(group_clip_path))
+        clip_path = self.__clip_paths.get_by_url(group_clip_path)
+        if len(self.__element_digests) > first_digest:
+            # A group's own attributes and clipping affect everything drawn by its children
+            bounds = np.array([digest[1] for digest in self.__element_digests[first_digest:]])
+            self.__add_element_digest(
+                [repr(sorted(group.etree_element.attrib.items())).encode(),
+                 repr(sorted(group_style.items())).encode(),
+                 clip_path.serialize().bytes() if clip_path is not None else b''],
+                (*bounds[:, 0:2].min(axis=0), *bounds[:, 2:4].max(axis=0)))
+        return CanvasGroup(drawing_objects, parent_transform, transform, clip_path)
+
+    def __add_element_digest(self, parts: list[bytes], bounds, opaque_fill: Optional[OpaqueFill]=None,
+                             position: Optional[int]=None):
+    #===============================================================================================
+        digest = hashlib.sha1(usedforsecurity=False)
+        for part in parts:
+            digest.update(part)
+            digest.update(b'\0')
+        record = (digest.hexdigest(), _pixel_bounds(bounds), opaque_fill)
+        if position is None:
+            self.__element_digests.append(record)
+        else:
+            self.__element_digests.insert(position, record)
 
     def __draw_element_list(self, elements, parent_transform, parent_style, show_progress=False) -> list[CanvasDrawingObject]:
     #=========================================================================================================================
@@ -587,6 +856,36 @@ class SVGRasteriser:
         svg_transform = SVGTransform(gradient.attrib.get('gradientTransform'))
         return skia.Matrix(list((path_transform@svg_transform).flatten()))
 
+    @staticmethod
+    def __gradient_shader(gradient, path) -> skia.Shader:
+    #====================================================
+        gradient_stops = GradientStops(gradient)
+        if gradient.tag == SVG_TAG('linearGradient'):
+            points = [(float(gradient.attrib.get('x1', 0.0)),
+                       float(gradient.attrib.get('y1', 0.0))),
+                      (float(gradient.attrib.get('x2', 1.0)),
+                       float(gradient.attrib.get('y2', 0.0)))]
+            return skia.GradientShader.MakeLinear(
+                points=points,
+                positions=gradient_stops.offsets,
+                colors=gradient_stops.colours,
+                localMatrix=SVGRasteriser.__gradient_matrix(gradient, path)
+            )
+        else:           # radialGradient
+            centre = (float(gradient.attrib.get('cx')),
+                      float(gradient.attrib.get('cy')))
+            radius = float(gradient.attrib.get('r'))
+            # TODO: fx, fy
+            #       This will need a two point conical shader
+            #       -- see chromium/blink sources
+            return skia.GradientShader.MakeRadial(
+                center=centre,
+                radius=radius,
+                positions=gradient_stops.offsets,
+                colors=gradient_stops.colours,
+                localMatrix=SVGRasteriser.__gradient_matrix(gradient, path)
+            )
+
     def __add_clip_path(self, clip_path_element):
     #============================================
         if ((clip_id := clip_path_element.attrib.get('id')) is not None
@@ -622,6 +921,8 @@ class SVGRasteriser:
     def __draw_element(self, wrapped_element, parent_transform, parent_style)-> list[CanvasDrawingObject]:
     #=====================================================================================================
         drawing_objects = []
+        digest_parts = []
+        opaque_colour_fill = None
         element = wrapped_element.etree_element
         element_style = self.__style_matcher.element_style(wrapped_element, parent_style)
         transform = self.__get_transform(wrapped_element)
@@ -647,37 +948,17 @@ class SVGRasteriser:
                 opacity = float(element_style.get('fill-opacity', 1.0))
                 paint = skia.Paint(AntiAlias=True)
                 if fill.startswith('url('):
-                    gradient = self.__gradient_from_url(fill)
+                    gradient = self.__resource_caches['gradients'].get(fill,
+                        lambda: self.__gradient_from_url(fill))
                     if gradient is None:
                         fill = '#800'     # Something's wrong so show show in image...
                         opacity = 0.5
-                    elif gradient.tag == SVG_TAG('linearGradient'):
-                        gradient_stops = GradientStops(gradient)
-                        points = [(float(gradient.attrib.get('x1', 0.0)),
-                                   float(gradient.attrib.get('y1', 0.0))),
-                                  (float(gradient.attrib.get('x2', 1.0)),
-                                   float(gradient.attrib.get('y2', 0.0)))]
-                        paint.setShader(skia.GradientShader.MakeLinear(
-                            points=points,
-                            positions=gradient_stops.offsets,
-                            colors=gradient_stops.colours,
-                            localMatrix=SVGRasteriser.__gradient_matrix(gradient, path)
-                        ))
-                    elif gradient.tag == SVG_TAG('radialGradient'):
-                        gradient_stops = GradientStops(gradient)
-                        centre = (float(gradient.attrib.get('cx')),
-                                  float(gradient.attrib.get('cy')))
-                        radius = float(gradient.attrib.get('r'))
-                        # TODO: fx, fy
-                        #       This will need a two point conical shader
-                        #       -- see chromium/blink sources
-                        paint.setShader(skia.GradientShader.MakeRadial(
-                            center=centre,
-                            radius=radius,
-                            positions=gradient_stops.offsets,
-                            colors=gradient_stops.colours,
-                            localMatrix=SVGRasteriser.__gradient_matrix(gradient, path)
-                        ))
+                    elif gradient.tag in [SVG_TAG('linearGradient'), SVG_TAG('radialGradient')]:
+                        # Shaders for gradients in a path's bounding box depend on the path's bounds
+                        shader_key = (fill, None if gradient.attrib.get('gradientUnits') == 'userSpaceOnUse'
+                                                 else tuple(path.getBounds()))
+                        paint.setShader(self.__resource_caches['shaders'].get(shader_key,
+                            lambda: SVGRasteriser.__gradient_shader(gradient, path)))
                     else:
                         fill = '#008'     # Something's wrong so show show in image...
                         opacity = 0.5
@@ -691,13 +972,18 @@ class SVGRasteriser:
                 drawing_objects.append(CanvasPath(path, paint, parent_transform, transform,
                     self.__clip_paths.get_by_url(element_style.get('clip-path'))
                     ))
+                if (path.isRect() and element_style.get('clip-path') is None
+                and (colour := opaque_colour(paint)) is not None
+                and is_axis_aligned(parent_transform if transform is None else parent_transform@transform)):
+                    opaque_colour_fill = colour
 
             stroke = element_style.get('stroke', 'none')
             stroked = (stroke != 'none')
             if stroked:
                 stroke_opacity = 1.0
-                markup = svg_markup(element)
-                if markup.startswith('.'):
+                if (element_class := self.__element_classes.get(element.attrib.get('id', ''))) is not None:
+                    stroked = not (element_class & ELEMENT_CLASS.FEATURE)
+                elif (markup := svg_markup(element)).startswith('.'):
                     properties = parse_markup(markup)
                     if ('centreline' in properties or 'node' in properties
                      or 'id' in properties or 'class' in properties):
@@ -742,67 +1028,107 @@ class SVGRasteriser:
             image_href = element.attrib.get('href', element.attrib.get(XLINK_HREF))
 
             if image_href is not None:
-                pixel_bytes = None
-                image = None
-                image_scale = 1.0
-                if (svg_source := svg_from_image_element(element)) is not None:
+                # Images are decoded and prescaled once for each size they are drawn at
+                width = get_geometric_attribute('width', element.attrib, element_style)
+                height = get_geometric_attribute('height', element.attrib, element_style)
+                (image, image_scale, image_digest) = self.__resource_caches['images'].get(
+                    (image_href, width, height),
+                    lambda: self.__load_image(element, image_href, width, height))
+                if image_digest is not None:
+                    digest_parts.append(image_digest)
+                if image is not None:
                     x = length_as_pixels(get_geometric_attribute('x', element.attrib, element_style, 0))
                     y = length_as_pixels(get_geometric_attribute('y', element.attrib, element_style, 0))
-                    width = length_as_pixels(get_geometric_attribute('width', element.attrib, element_style))
-                    height = length_as_pixels(get_geometric_attribute('height', element.attrib, element_style))
-                    rasteriser = SVGRasteriser(svg_source)
-                    if width is None or height is None:
-                        (width, height) = rasteriser.size
-                    image_scale = prescale_factor(width, height)
-                    rasteriser.render(scaling=image_scale)
-                    image = rasteriser.get_image()
-
-                elif image_href.startswith('data:'):
-                    parts = image_href[5:].split(',', 1)
-                    if parts[0].endswith(';base64'):
-                        media_type = parts[0].split(';', 1)[0]
-                        if media_type in IMAGE_MEDIA_TYPES:
-                            pixel_bytes = base64.b64decode(parts[1])
-                elif self.__source_path is not None:
-                    pixel_bytes = self.__source_path.join_path(image_href).get_data()
-
-                if pixel_bytes is not None:
-                    pixel_array = np.frombuffer(pixel_bytes, dtype=np.uint8)
-                    image_data = cv2.imdecode(pixel_array, cv2.IMREAD_UNCHANGED)    # type: ignore
-                    if image_data.shape[2] == 3:
-                        image_data = cv2.cvtColor(image_data, cv2.COLOR_RGB2RGBA)   # type: ignore
-                    image = skia.Image.fromarray(image_data, colorType=skia.kBGRA_8888_ColorType)
-                    if image is not None:
-                        width = percentage_dimension(get_geometric_attribute('width', element.attrib, element_style), image.width())
-                        height = percentage_dimension(get_geometric_attribute('height', element.attrib, element_style), image.height())
-                        x = length_as_pixels(get_geometric_attribute('x', element.attrib, element_style, 0))
-                        y = length_as_pixels(get_geometric_attribute('y', element.attrib, element_style, 0))
-                        image_scale = prescale_factor(width, height)
-                        width *= image_scale
-                        height *= image_scale
-                        if round(width) != image.width() or round(height) != image.height():
-                            image = image.resize(round(width), round(height), skia.SamplingOptions(skia.CubicResampler.Mitchell()))
-                if image is not None:
                     paint = skia.Paint()
                     opacity = float(element_style.get('opacity', 1.0))
                     paint.setAlpha(round(opacity * 255))
-                    clip_path_url = element_style.pop('clip-path', None)
-                    if ((clip_path := self.__clip_paths.get_by_url(clip_path_url)) is None
-                    and (clip_path_element := self.__definitions.get_by_url(clip_path_url)) is not None):
-                        clip_path = self.__get_clip_path(clip_path_element)
+                    clip_path_url = element_style.get('clip-path')
+                    clip_path = self.__clip_paths.get_by_url(clip_path_url)
+                    if clip_path is None and clip_path_url is not None:
+                        clip_path = self.__resource_caches['clip-paths'].get(clip_path_url,
+                            lambda: self.__clip_path_from_url(clip_path_url))
                     drawing_objects.append(
                         CanvasImage(image, paint, parent_transform, transform, clip_path, pos=(x, y), scale=image_scale))
 
         elif element.tag == SVG_TAG('text'):
             drawing_objects.append(CanvasText(element.text, element.attrib, parent_transform, transform,
-                self.__clip_paths.get_by_url(element_style.get('clip-path'))
+                self.__clip_paths.get_by_url(element_style.get('clip-path')),
+                font_cache=self.__resource_caches['fonts']
             ))
 
         elif element.tag not in IGNORED_SVG_TAGS:
             log.warning("'{}' not supported...".format(element.tag))
 
+        if (element.tag not in [SVG_TAG('a'), SVG_TAG('g')]
+        and len(bboxes := [drawing_object.bbox for drawing_object in drawing_objects
+                                if drawing_object.bbox is not None])):
+            # Referenced gradients and clip paths are part of what is drawn
+            digest_parts.extend([etree.tostring(element, with_tail=False),
+                                 repr(sorted(element_style.items())).encode()])
+            for name in ['fill', 'clip-path']:
+                if (url := element_style.get(name, '').strip()).startswith('url('):
+                    if (definition := self.__definitions.get_by_url(url)) is not None:
+                        digest_parts.append(etree.tostring(definition, with_tail=False))
+                    if (clip_path := self.__clip_paths.get_by_url(url)) is not None:
+                        digest_parts.append(clip_path.serialize().bytes())
+            opaque_fill = None
+            if opaque_colour_fill is not None and len(drawing_objects) == 1:
+                # An unstroked, axis-aligned, rectangle exactly covers its bounds
+                opaque_fill = (opaque_colour_fill, _pixel_bounds(bboxes[0].bounds))
+            self.__add_element_digest(digest_parts, shapely.total_bounds(bboxes), opaque_fill)
+
         return drawing_objects
 
+    def __clip_path_from_url(self, url: Optional[str]) -> Optional[skia.Path]:
+    #=========================================================================
+        if (clip_path_element := self.__definitions.get_by_url(url)) is not None:
+            return self.__get_clip_path(clip_path_element)
+
+    def __load_image(self, element, image_href: str, width, height) -> tuple[Optional[skia.Image], float, Optional[bytes]]:
+    #======================================================================================================================
+        # Returns the image, prescaled by the given factor, and a digest of any
+        # external image data
+        pixel_bytes = None
+        image = None
+        image_scale = 1.0
+        image_digest = None
+        if (svg_source := svg_from_image_element(element)) is not None:
+            image_width = length_as_pixels(width)
+            image_height = length_as_pixels(height)
+            rasteriser = SVGRasteriser(svg_source)
+            if image_width is None or image_height is None:
+                (image_width, image_height) = rasteriser.size
+            image_scale = prescale_factor(image_width, image_height)
+            rasteriser.render(scaling=image_scale)
+            image = rasteriser.get_image()
+
+        elif image_href.startswith('data:'):
+            parts = image_href[5:].split(',', 1)
+            if parts[0].endswith(';base64'):
+                media_type = parts[0].split(';', 1)[0]
+                if media_type in IMAGE_MEDIA_TYPES:
+                    pixel_bytes = base64.b64decode(parts[1])
+        elif self.__source_path is not None:
+            pixel_bytes = self.__source_path.join_path(image_href).get_data()
+            image_digest = hashlib.sha1(pixel_bytes, usedforsecurity=False).digest()
+
+        if pixel_bytes is not None:
+            pixel_array = np.frombuffer(pixel_bytes, dtype=np.uint8)
+            image_data = cv2.imdecode(pixel_array, cv2.IMREAD_UNCHANGED)    # type: ignore
+            if image_data.shape[2] == 3:
+                image_data = cv2.cvtColor(image_data, cv2.COLOR_RGB2RGBA)   # type: ignore
+            image = skia.Image.fromarray(image_data, colorType=skia.kBGRA_8888_ColorType)
+            if image is not None:
+                image_width = percentage_dimension(width, image.width())
+                image_height = percentage_dimension(height, image.height())
+                image_scale = prescale_factor(image_width, image_height)
+                image_width *= image_scale
+                image_height *= image_scale
+                if round(image_width) != image.width() or round(image_height) != image.height():
+                    image = image.resize(round(image_width), round(image_height),
+                                         skia.SamplingOptions(skia.CubicResampler.Mitchell()))
+        return (image, image_scale, image_digest)
+
     @staticmethod
     def __get_graphics_path(element, element_style: dict|None=None) -> skia.Path:
     #============================================================================
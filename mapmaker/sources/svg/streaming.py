@@ -0,0 +1,122 @@
+#===============================================================================
+#
+#  Flatmap viewer and annotation tools
+#
+#  Copyright (c) 2026  David Brooks
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#===============================================================================
+
+"""
+Stream very large SVG sources, so that only one of a document's top-level
+elements (usually a layer) and its descendants are in memory at once.
+"""
+
+#===============================================================================
+
+import copy
+from typing import Iterator, Optional
+
+#===============================================================================
+
+import lxml.etree as etree
+
+#===============================================================================
+
+from mapmaker.utils import FilePath
+
+from .utils import SVG_TAG
+
+#===============================================================================
+
+# Elements needed before a document's layers are processed
+
+SKELETON_TAGS = [
+    SVG_TAG('defs'),
+    SVG_TAG('metadata'),
+    SVG_TAG('style'),
+]
+
+#===============================================================================
+
+def __release(element: etree.Element):
+    # Free an element and any of its previous siblings, which have all
+    # been dealt with once the element has been parsed
+    element.clear(keep_tail=True)
+    if (parent := element.getparent()) is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+#===============================================================================
+
+def svg_skeleton(svg_file: FilePath) -> etree.Element:
+#======================================================
+    """
+    Scan an SVG source for the parts of it needed before it is streamed.
+
+    :param svg_file: The SVG source
+    :returns: An ``<svg>`` element with the source's root attributes and copies
+              of all its ``<defs>``, ``<metadata>`` and ``<style>`` elements,
+              in document order
+    """
+    skeleton: Optional[etree.Element] = None
+    kept_depth = None
+    depth = 0
+    with svg_file.get_fp() as fp:
+        for (event, element) in etree.iterparse(fp, events=('start', 'end'), huge_tree=True):
+            if event == 'start':
+                if skeleton is None:
+                    skeleton = etree.Element(element.tag, element.attrib, nsmap=element.nsmap)
+                elif kept_depth is None and element.tag in SKELETON_TAGS:
+                    kept_depth = depth
+                depth += 1
+            else:
+                depth -= 1
+                if depth == kept_depth:
+                    skeleton.append(copy.deepcopy(element))         # type: ignore
+                    kept_depth = None
+                if kept_depth is None:
+                    __release(element)
+    if skeleton is None:
+        raise ValueError(f'{svg_file} is not an SVG document')
+    return skeleton
+
+def stream_svg_layers(svg_file: FilePath) -> Iterator[etree.Element]:
+#====================================================================
+    """
+    Stream the top-level elements of an SVG source.
+
+    Each element is yielded once it and all of its descendants have been parsed,
+    when it is the only child of the document's root element. It is cleared
+    before the next is parsed, so the element, and anything it was copied into,
+    mustn't be kept.
+
+    :param svg_file: The SVG source
+    """
+    depth = 0
+    with svg_file.get_fp() as fp:
+        for (event, element) in etree.iterparse(fp, events=('start', 'end'), huge_tree=True):
+            if event == 'start':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 1:
+                    # Remove earlier top-level elements and anything between them
+                    parent = element.getparent()
+                    while element.getprevious() is not None:
+                        del parent[0]
+                    yield element
+                    element.clear(keep_tail=True)
+
+#===============================================================================
@@ -18,7 +18,14 @@
 #
 #===============================================================================
 
+import time
+from typing import Hashable, Optional
+
+#===============================================================================
+
 import cssselect2
+from cssselect2 import parser as selector_parser
+from cssselect2.compiler import CompiledSelector
 import tinycss2
 
 #===============================================================================
@@ -38,9 +45,16 @@ GEOMETRIC_STYLE_ATTRIBUTES = [
 ]
 
 NON_INHERITED_STYLE_ATTRIBUTES = GEOMETRIC_STYLE_ATTRIBUTES + [
-    'id', 'class'
+    'id', 'class', 'clip-path'
 ]
 
+# Attributes that aren't copied into an element's style
+NON_STYLE_ATTRIBUTES = GEOMETRIC_STYLE_ATTRIBUTES + ['id']
+
+# Selectors made up of only these only depend on an element's own tag and attributes
+CONTEXT_FREE_SELECTORS = (selector_parser.ClassSelector, selector_parser.IDSelector,
+                          selector_parser.LocalNameSelector, selector_parser.NamespaceSelector)
+
 # See https://developer.mozilla.org/en-US/docs/Web/SVG/Reference/Attribute#presentation_attributes
 PRESENTATION_STYLE_ATTRIBUTES = [
     'alignment-baseline', 'baseline-shift', 'clip', 'clip-path', 'clip-rule', 'color',
@@ -63,6 +77,7 @@ PRESENTATION_STYLE_ATTRIBUTES = [
 class ElementStyleDict(dict):
     def __init__(self, element, style_dict={}):
         super().__init__(style_dict)   # Copies dict
+        self.style_key: Optional[int] = None
         attributes = dict(element.attrib)
         if 'style' in attributes:
             style_attribute = attributes.pop('style')
@@ -74,7 +89,7 @@ class ElementStyleDict(dict):
                     [t.serialize() for t in declaration.value])
             super().update(local_style)
         for key, value in attributes.items():
-            if key not in GEOMETRIC_STYLE_ATTRIBUTES:
+            if key not in NON_STYLE_ATTRIBUTES:
                 if key not in PRESENTATION_STYLE_ATTRIBUTES or key not in self:
                     self[key] = value
 
@@ -84,17 +99,50 @@ class StyleMatcher(cssselect2.Matcher):
     '''Parse CSS and add rules to the matcher.'''
     def __init__(self, style_element):
         super().__init__()
+        # Computed styles can be reused for elements with the same tag, attributes
+        # and parent style when no selector depends on an element's context
+        self.__context_free = True
+        self.__id_selectors = False
         rules = tinycss2.parse_stylesheet(style_element.text
                     if style_element is not None else '',
                     skip_comments=True, skip_whitespace=True)
         for rule in rules:
-            selectors = cssselect2.compile_selector_list(rule.prelude)
+            selectors = list(selector_parser.parse(rule.prelude))
             declarations = [obj for obj in tinycss2.parse_declaration_list(
                                                rule.content,
                                                skip_whitespace=True)
                             if obj.type == 'declaration']
             for selector in selectors:
-                self.add_selector(selector, declarations)
+                self.__check_selector(selector)
+                self.add_selector(CompiledSelector(selector), declarations)
+        self.__computed_styles: dict[Hashable, ElementStyleDict] = {}
+        self.__interned_styles: dict[tuple, ElementStyleDict] = {}
+        self.__lookups = 0
+        self.__hits = 0
+        self.__resolve_time = 0.0
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def lookups(self) -> int:
+        return self.__lookups
+
+    @property
+    def resolve_time(self) -> float:
+        return self.__resolve_time
+
+    def __check_selector(self, selector):
+    #====================================
+        if (not isinstance(selector.parsed_tree, selector_parser.CompoundSelector)
+         or selector.pseudo_element is not None
+         or not all(isinstance(simple_selector, CONTEXT_FREE_SELECTORS)
+                        for simple_selector in selector.parsed_tree.simple_selectors)):
+            self.__context_free = False
+        elif any(isinstance(simple_selector, selector_parser.IDSelector)
+                    for simple_selector in selector.parsed_tree.simple_selectors):
+            self.__id_selectors = True
 
     def __match(self, element):
     #==========================
@@ -107,8 +155,53 @@ class StyleMatcher(cssselect2.Matcher):
                     styling[declaration.lower_name] = declaration.value
         return styling
 
+    def __intern(self, element_style: ElementStyleDict) -> ElementStyleDict:
+    #=======================================================================
+        items = tuple(sorted(element_style.items()))
+        if (interned_style := self.__interned_styles.get(items)) is None:
+            element_style.style_key = len(self.__interned_styles)
+            self.__interned_styles[items] = element_style
+            interned_style = element_style
+        return interned_style
+
+    def __signature(self, element, parent_style) -> Hashable:
+    #========================================================
+        if parent_style is None:
+            parent_key = None
+        elif isinstance(parent_style, ElementStyleDict) and parent_style.style_key is not None:
+            parent_key = parent_style.style_key
+        else:
+            parent_key = tuple(sorted(parent_style.items()))
+        return (element.tag,
+                tuple(sorted((key, value) for key, value in element.attrib.items()
+                                if key not in GEOMETRIC_STYLE_ATTRIBUTES
+                                and (key != 'id' or self.__id_selectors))),
+                parent_key)
+
     def element_style(self, wrapped_element, parent_style=None) -> ElementStyleDict:
     #===============================================================================
+        """
+        Get an element's computed style.
+
+        Styles are shared between elements with the same tag, non-geometric
+        attributes and parent style, so must not be modified.
+        """
+        start_time = time.perf_counter()
+        self.__lookups += 1
+        if self.__context_free:
+            key = self.__signature(wrapped_element.etree_element, parent_style)
+            if (element_style := self.__computed_styles.get(key)) is not None:
+                self.__hits += 1
+            else:
+                element_style = self.__intern(self.__compute_style(wrapped_element, parent_style))
+                self.__computed_styles[key] = element_style
+        else:
+            element_style = self.__intern(self.__compute_style(wrapped_element, parent_style))
+        self.__resolve_time += time.perf_counter() - start_time
+        return element_style
+
+    def __compute_style(self, wrapped_element, parent_style) -> ElementStyleDict:
+    #============================================================================
         if parent_style is None:
             element_style = {}
         else:
@@ -131,6 +224,46 @@ class StyleMatcher(cssselect2.Matcher):
 
 #===============================================================================
 
+class StyleMatcherCache(object):
+    """
+    Style matchers, keyed by the text of their stylesheet, so that a document's
+    stylesheet is compiled once in a build and its layers and rasterised images
+    share computed styles.
+    """
+    def __init__(self):
+        self.__matchers: dict[str, StyleMatcher] = {}
+
+    @property
+    def statistics(self) -> dict[str, int|float]:
+        lookups = sum(matcher.lookups for matcher in self.__matchers.values())
+        hits = sum(matcher.hits for matcher in self.__matchers.values())
+        return {
+            'stylesheets': len(self.__matchers),
+            'lookups': lookups,
+            'hit_ratio': round(hits/lookups, 3) if lookups else 0.0,
+            'resolve_seconds': round(sum(matcher.resolve_time for matcher in self.__matchers.values()), 2)
+        }
+
+    def clear(self):
+    #===============
+        self.__matchers = {}
+
+    def get(self, style_element) -> StyleMatcher:
+    #============================================
+        stylesheet = style_element.text if style_element is not None and style_element.text else ''
+        if (matcher := self.__matchers.get(stylesheet)) is None:
+            matcher = StyleMatcher(style_element)
+            self.__matchers[stylesheet] = matcher
+        return matcher
+
+#===============================================================================
+
+# Style matchers used in making a map
+
+style_matchers = StyleMatcherCache()
+
+#===============================================================================
+
 def wrap_element(element) -> cssselect2.ElementWrapper:
 #======================================================
     return cssselect2.ElementWrapper.from_xml_root(element)
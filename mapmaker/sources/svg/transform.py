@@ -23,17 +23,13 @@ from typing import Optional
 
 #===============================================================================
 
-import numpy as np
-
-#===============================================================================
-
 from mapmaker.geometry import Transform
 
 #===============================================================================
 
 class SVGTransform(Transform):
     def __init__(self, transform: Optional[str]):
-        T = np.identity(3)
+        T = Transform.Identity()
         if transform is not None:
             # A simple parser, assuming well-formed SVG
             tokens = transform.replace('(', ' ').replace(')', ' ').replace(',', ' ').split()
@@ -44,9 +40,9 @@ class SVGTransform(Transform):
                 if xfm == 'matrix':
                     params = tuple(float(x) for x in tokens[pos:pos+6])
                     pos += 6
-                    T = T@np.array([[params[0], params[2], params[4]],
-                                    [params[1], params[3], params[5]],
-                                    [        0,         0,         1]])
+                    T = T@Transform([[params[0], params[2], params[4]],
+                                     [params[1], params[3], params[5]],
+                                     [        0,         0,         1]])
                 elif xfm == 'translate':
                     x = float(tokens[pos])
                     pos += 1
@@ -55,9 +51,9 @@ class SVGTransform(Transform):
                     else:
                         y = float(tokens[pos])
                         pos += 1
-                    T = T@np.array([[1, 0, x],
-                                    [0, 1, y],
-                                    [0, 0, 1]])
+                    T = T@Transform([[1, 0, x],
+                                     [0, 1, y],
+                                     [0, 0, 1]])
                 elif xfm == 'scale':
                     sx = float(tokens[pos])
                     pos += 1
@@ -66,34 +62,34 @@ class SVGTransform(Transform):
                     else:
                         sy = float(tokens[pos])
                         pos += 1
-                    T = T@np.array([[sx,  0, 0],
-                                    [ 0, sy, 0],
-                                    [ 0,  0, 1]])
+                    T = T@Transform([[sx,  0, 0],
+                                     [ 0, sy, 0],
+                                     [ 0,  0, 1]])
                 elif xfm == 'rotate':
                     a = radians(float(tokens[pos]))
                     pos += 1
                     if pos >= len(tokens) or tokens[pos].isalpha():
-                        T = T@np.array([[cos(a), -sin(a), 0],
-                                        [sin(a),  cos(a), 0],
-                                        [     0,       0, 1]])
+                        T = T@Transform([[cos(a), -sin(a), 0],
+                                         [sin(a),  cos(a), 0],
+                                         [     0,       0, 1]])
                     else:
                         (cx, cy) = tuple(float(x) for x in tokens[pos:pos+2])
                         pos += 2
-                        T = T@np.array([[cos(a), -sin(a), -cx*cos(a) + cy*sin(a) + cx],
-                                        [sin(a),  cos(a), -cx*sin(a) - cy*cos(a) + cy],
-                                        [     0,       0,                           1]])
+                        T = T@Transform([[cos(a), -sin(a), -cx*cos(a) + cy*sin(a) + cx],
+                                         [sin(a),  cos(a), -cx*sin(a) - cy*cos(a) + cy],
+                                         [     0,       0,                           1]])
                 elif xfm == 'skewX':
                     a = float(tokens[pos])
                     pos += 1
-                    T = T@np.array([[1, tan(a), 0],
-                                    [0,      1, 0],
-                                    [0,      0, 1]])
+                    T = T@Transform([[1, tan(a), 0],
+                                     [0,      1, 0],
+                                     [0,      0, 1]])
                 elif xfm == 'skewY':
                     a = float(tokens[pos])
                     pos += 1
-                    T = T@np.array([[     1, 0, 0],
-                                    [tan(a), 1, 0],
-                                    [     0, 0, 1]])
+                    T = T@Transform([[     1, 0, 0],
+                                     [tan(a), 1, 0],
+                                     [     0, 0, 1]])
                 else:
                     raise ValueError('Invalid SVG transform: {}'.format(transform))
         super().__init__(T)
@@ -19,10 +19,11 @@
 #===============================================================================
 
 import base64
+from collections import defaultdict
 import math
 import re
 import string
-from typing import Optional
+from typing import Optional, Sequence
 import urllib.parse
 
 #===============================================================================
@@ -30,11 +31,11 @@ import urllib.parse
 # https://simoncozens.github.io/beziers.py/index.html
 from beziers.cubicbezier import CubicBezier
 from beziers.line import Line as BezierLine
-from beziers.path import BezierPath
 from beziers.point import Point as BezierPoint
 from beziers.quadraticbezier import QuadraticBezier
 from beziers.segment import Segment as BezierSegment
 
+import numpy as np
 import shapely
 from shapely.geometry.base import BaseGeometry
 
@@ -46,8 +47,8 @@ import svgelements
 from mapmaker.exceptions import MakerException
 from mapmaker.flatmap import Feature
 from mapmaker.geometry import Transform, reflect_point
-from mapmaker.geometry.beziers import bezier_sample, Coordinate
-from mapmaker.geometry.arc_to_bezier import bezier_segments_from_arc_endpoints, tuple2
+from mapmaker.geometry.beziers import bezier_flatten_array, flattening_tolerance
+from mapmaker.geometry.arc_to_bezier import cubic_control_points_from_arc_endpoints, tuple2
 from mapmaker.output.path_colours import get_path_colour
 from mapmaker.utils import log
 
@@ -269,7 +270,7 @@ def svg_element_from_feature(feature: Feature, inverse_transform: svgelements.Ma
 
 #===============================================================================
 
-def __geometry_from_coordinates(coordinates: list[Coordinate], closed: bool, must_close: Optional[bool]) -> Optional[BaseGeometry]:
+def __geometry_from_coordinates(coordinates: np.ndarray, closed: bool, must_close: Optional[bool]) -> Optional[BaseGeometry]:
     if must_close == False and closed:
         raise ValueError("Shape can't have closed geometry")
     elif must_close == True and not closed:
@@ -279,7 +280,7 @@ def __geometry_from_coordinates(coordinates: list[Coordinate], closed: bool, mus
         geometry = shapely.Polygon(coordinates).buffer(0)
     elif must_close == True and len(coordinates) >= 3:
         # Return a polygon if flagged as `closed`
-        coordinates.append(coordinates[0])
+        coordinates = np.concatenate((coordinates, coordinates[0:1]))
         geometry = shapely.Polygon(coordinates).buffer(0)
     elif len(coordinates) >= 2:
         ## Warn if start and end point are ``close`` wrt to the length of the line as shape
@@ -304,174 +305,238 @@ type GeometricObject = tuple[Optional[BaseGeometry], list[BezierSegment]]
 
 #===============================================================================
 
-def geometry_from_svg_path(path_tokens: list[str|float], transform: Transform,
-                           must_close: Optional[bool]=None) -> GeometricObject:
-
-    geometries: list[BaseGeometry] = []
+class CompiledSVGPath:
+    """
+    The points of an SVG path, in the path's own coordinates, along with how
+    they make up lines, curves and subpaths.
+
+    :ivar points: An ``(N, 2)`` array of the path's end and control points
+    :ivar segments: The indices into ``points`` of each segment of the path,
+                    with two points for a line, three for a quadratic curve
+                    and four for a cubic curve
+    :ivar curves: ``(order, first, count)`` for each curve to flatten, with the
+                  curve's control points starting at ``first`` and made up of
+                  ``count`` consecutive segments
+    :ivar subpaths: For each subpath, a list of items with indices into
+                    ``points`` for vertices and ``-(n + 1)`` for the vertices
+                    of curve ``n``, along with whether the subpath is closed
+    """
+    def __init__(self, path_tokens: list[str|float]):
+        self.segments: list[tuple[int, ...]] = []
+        self.curves: list[tuple[int, int, int]] = []
+        self.subpaths: list[tuple[list[int], bool]] = []
+        self.__points: list[Sequence[float]] = []
+        self.__compile(path_tokens)
+        self.points = np.array(self.__points, dtype=float).reshape((-1, 2))
+
+    def __add_point(self, pt: list[float]) -> int:
+    #=============================================
+        self.__points.append(pt)
+        return len(self.__points) - 1
+
+    def __add_curve(self, control_points: list) -> int:
+    #==================================================
+        first = len(self.__points)
+        self.__points.extend(control_points)
+        order = len(control_points) - 1
+        self.segments.append(tuple(range(first, first + order + 1)))
+        self.curves.append((order, first, 1))
+        return -len(self.curves)
+
+    def __compile(self, path_tokens: list[str|float]):
+    #=================================================
+        # Convert all numeric tokens at once, keeping the position of commands
+        commands: list[tuple[str, int, int]] = []
+        numbers: list[str|float] = []
+        for token in path_tokens:
+            if isinstance(token, str) and token.isalpha():
+                commands.append((token, len(numbers), 0))
+            elif len(commands):
+                numbers.append(token)
+                (cmd, start, _) = commands[-1]
+                commands[-1] = (cmd, start, len(numbers) - start)
+        params = np.array(numbers, dtype=float).tolist()
+
+        items: list[int] = []
+        closed = False
+        moved = False
+        first_point = None
+        current_point = []
+        last_index = -1         # Point index of the last vertex added to ``items``
+        second_cubic_control = None
+        second_quad_control = None
+
+        for (command, start, count) in commands:
+            pos = start
+            end = start + count
+            cmd = command
+            while pos < end or (count == 0 and pos == start):
+                if pos > start:
+                    # Repeat previous command with new coordinates,
+                    # with `moveTo` becoming `lineTo`
+                    if cmd == 'M':
+                        cmd = 'L'
+                    elif cmd == 'm':
+                        cmd = 'l'
+
+                if cmd not in ['s', 'S']:
+                    second_cubic_control = None
+                if cmd not in ['t', 'T']:
+                    second_quad_control = None
+
+                if cmd in ['a', 'A']:
+                    arc = params[pos:pos+7]
+                    pos += 7
+                    pt = arc[5:7]
+                    if cmd == 'a':
+                        pt[0] += current_point[0]
+                        pt[1] += current_point[1]
+                    first = len(self.__points)
+                    control_points = cubic_control_points_from_arc_endpoints(tuple2(*arc[0:2]), math.radians(arc[2]),
+                                        arc[3], arc[4], tuple2(*current_point), tuple2(*pt))
+                    for cps in control_points:
+                        self.segments.append(tuple(range(len(self.__points), len(self.__points) + 4)))
+                        self.__points.extend(cps)
+                    self.curves.append((3, first, len(control_points)))
+                    items.append(-len(self.curves))
+                    last_index = len(self.__points) - 1
+                    current_point = pt
+
+                elif cmd in ['c', 'C', 's', 'S', 'q', 'Q', 't', 'T']:
+                    cubic = cmd in ['c', 'C', 's', 'S']
+                    control_points = [current_point]
+                    if cmd in ['c', 'C']:
+                        n_params = 6
+                    elif cmd in ['q', 'Q']:
+                        n_params = 4
+                    else:
+                        n_params = 4 if cubic else 2
+                        second_control = second_cubic_control if cubic else second_quad_control
+                        if second_control is None:
+                            control_points.append(current_point)
+                        else:
+                            control_points.append(reflect_point(second_control, current_point))
+                    pt = current_point
+                    for n in range(0, n_params, 2):
+                        pt = params[pos+n:pos+n+2]
+                        if cmd.islower():
+                            pt[0] += current_point[0]
+                            pt[1] += current_point[1]
+                        if n == (n_params - 4):
+                            if cubic:
+                                second_cubic_control = pt
+                            else:
+                                second_quad_control = pt
+                        control_points.append(pt)
+                    pos += n_params
+                    items.append(self.__add_curve(control_points))
+                    last_index = len(self.__points) - 1
+                    current_point = pt
+
+                elif cmd in ['l', 'L', 'h', 'H', 'v', 'V']:
+                    if cmd in ['l', 'L']:
+                        pt = params[pos:pos+2]
+                        pos += 2
+                        if cmd == 'l':
+                            pt[0] += current_point[0]
+                            pt[1] += current_point[1]
+                    else:
+                        param = params[pos]
+                        pos += 1
+                        if cmd == 'h':
+                            param += current_point[0]
+                        elif cmd == 'v':
+                            param += current_point[1]
+                        if cmd in ['h', 'H']:
+                            pt = [param, current_point[1]]
+                        else:
+                            pt = [current_point[0], param]
+                    if moved:
+                        last_index = self.__add_point(current_point)
+                        items.append(last_index)
+                        moved = False
+                    index = self.__add_point(pt)
+                    items.append(index)
+                    self.segments.append((last_index, index))
+                    last_index = index
+                    current_point = pt
+
+                elif cmd in ['m', 'M']:
+                    if len(items):
+                        self.subpaths.append((items, closed))
+                        items = []
+                        closed = False
+                    pt = params[pos:pos+2]
+                    pos += 2
+                    if first_point is None:
+                        # First `m` in a path is treated as `M`
+                        first_point = pt
+                    else:
+                        if cmd == 'm':
+                            pt[0] += current_point[0]
+                            pt[1] += current_point[1]
+                    current_point = pt
+                    moved = True
+
+                elif cmd in ['z', 'Z']:
+                    if first_point is not None and current_point != first_point:
+                        last_index = self.__add_point(first_point)
+                        items.append(last_index)
+                    closed = True
+                    first_point = None
+                    pos = end + 1
 
-    coordinates: list[Coordinate] = []
-    bezier_segments: list[BezierSegment] = []
-    closed = False
-
-    moved = False
-    first_point = None
-    current_point = []
-    pt = []
-
-    pos = 0
-    cmd = None
-    second_cubic_control = None
-    second_quad_control = None
-    while pos < len(path_tokens):
-        if isinstance(path_tokens[pos], str) and path_tokens[pos].isalpha():    # type: ignore
-            cmd = path_tokens[pos]
-            pos += 1
-        # Else repeat previous command with new coordinates
-        # with `moveTo` becoming `lineTo`
-        elif cmd == 'M':
-            cmd = 'L'
-        elif cmd == 'm':
-            cmd = 'l'
-
-        if cmd not in ['s', 'S']:
-            second_cubic_control = None
-        if cmd not in ['t', 'T']:
-            second_quad_control = None
-
-        if cmd in ['a', 'A']:
-            params = [float(x) for x in path_tokens[pos:pos+7]]
-            pos += 7
-            pt = params[5:7]
-            if cmd == 'a':
-                pt[0] += current_point[0]
-                pt[1] += current_point[1]
-            phi = math.radians(params[2])
-            segs = bezier_segments_from_arc_endpoints(tuple2(*params[0:2]), phi, params[3], params[4],
-                                                      tuple2(*current_point), tuple2(*pt), transform)
-            bezier_segments.extend(segs)
-            coordinates.extend(bezier_sample(BezierPath.fromSegments(segs)))
-            current_point = pt
-
-        elif cmd in ['c', 'C', 's', 'S']:
-            coords = [BezierPoint(*transform.transform_point(current_point))]
-            if cmd in ['c', 'C']:
-                n_params = 6
-            else:
-                n_params = 4
-                if second_cubic_control is None:
-                    coords.append(BezierPoint(*transform.transform_point(current_point)))
                 else:
-                    coords.append(BezierPoint(*transform.transform_point(
-                        reflect_point(second_cubic_control, current_point))))
-            params = [float(x) for x in path_tokens[pos:pos+n_params]]
-            pos += n_params
-            for n in range(0, n_params, 2):
-                pt = params[n:n+2]
-                if cmd.islower():
-                    pt[0] += current_point[0]
-                    pt[1] += current_point[1]
-                if n == (n_params - 4):
-                    second_cubic_control = pt
-                coords.append(BezierPoint(*transform.transform_point(pt)))
-            bz = CubicBezier(*coords)
-            bezier_segments.append(bz)
-            coordinates.extend(bezier_sample(bz))
-            current_point = pt
-
-        elif cmd in ['l', 'L', 'h', 'H', 'v', 'V']:
-            if cmd in ['l', 'L']:
-                params = [float(x) for x in path_tokens[pos:pos+2]]
-                pos += 2
-                pt = params[0:2]
-                if cmd == 'l':
-                    pt[0] += current_point[0]
-                    pt[1] += current_point[1]
-            else:
-                param = float(path_tokens[pos])
-                pos += 1
-                if cmd == 'h':
-                    param += current_point[0]
-                elif cmd == 'v':
-                    param += current_point[1]
-                if cmd in ['h', 'H']:
-                    pt = [param, current_point[1]]
-                else:
-                    pt = [current_point[0], param]
-            if moved:
-                coordinates.append(transform.transform_point(current_point))
-                moved = False
-            coordinates.append(transform.transform_point(pt))
-            bz = BezierLine(BezierPoint(*coordinates[-2]), BezierPoint(*coordinates[-1]))
-            bezier_segments.append(bz)
-            current_point = pt
-
-        elif cmd in ['m', 'M']:
-            if len(coordinates):
-                if (geometry := __geometry_from_coordinates(coordinates, closed, must_close)) is not None:
-                    geometries.append(geometry)
-                coordinates: list[Coordinate] = []
-                closed = False
-
-            params = [float(x) for x in path_tokens[pos:pos+2]]
-            pos += 2
-            pt = params[0:2]
-            if first_point is None:
-                # First `m` in a path is treated as `M`
-                first_point = pt
-            else:
-                if cmd == 'm':
-                    pt[0] += current_point[0]
-                    pt[1] += current_point[1]
-            current_point = pt
-            moved = True
-
-        elif cmd in ['q', 'Q', 't', 'T']:
-            coords = [BezierPoint(*transform.transform_point(current_point))]
-            if cmd in ['q', 'Q']:
-                n_params = 4
-            else:
-                n_params = 2
-                if second_quad_control is None:
-                    coords.append(BezierPoint(*transform.transform_point(current_point)))
-                else:
-                    coords.append(BezierPoint(*transform.transform_point(
-                        reflect_point(second_quad_control, current_point))))
-            params = [float(x) for x in path_tokens[pos:pos+n_params]]
-            pos += n_params
-            for n in range(0, n_params, 2):
-                pt = params[n:n+2]
-                if cmd.islower():
-                    pt[0] += current_point[0]
-                    pt[1] += current_point[1]
-                if n == (n_params - 4):
-                    second_quad_control = pt
-                coords.append(BezierPoint(*transform.transform_point(pt)))
-            bz = QuadraticBezier(*coords)
-            bezier_segments.append(bz)
-            coordinates.extend(bezier_sample(bz))
-            current_point = pt
-
-        elif cmd in ['z', 'Z']:
-            if first_point is not None and current_point != first_point:
-                coordinates.append(transform.transform_point(first_point))
-            closed = True
-            first_point = None
+                    log.warning(f'Unknown SVG path command: {cmd}')
+                    pos = end + 1
 
-        else:
-            log.warning(f'Unknown SVG path command: {cmd}')
+        self.subpaths.append((items, closed))
 
-    if must_close == False and closed:
-        raise ValueError("Shape can't have closed geometry")
-    elif must_close == True and not closed:
-        raise ValueError("Shape must have closed geometry")
+#===============================================================================
 
-    if (geometry := __geometry_from_coordinates(coordinates, closed, must_close)) is not None:
-        geometries.append(geometry)
+def geometry_from_svg_path(path_tokens: list[str|float], transform: Transform,
+                           must_close: Optional[bool]=None) -> GeometricObject:
+
+    path = CompiledSVGPath(path_tokens)
+
+    # Transform all points at once
+    points = transform.transform_coordinates(path.points)
+
+    # Flatten the segments of all curves of the same order together
+    tolerance = flattening_tolerance()
+    curve_points: list[np.ndarray] = [np.empty((0, 2))]*len(path.curves)
+    curves_by_order: dict[int, list[int]] = defaultdict(list)
+    for n, (order, _, _) in enumerate(path.curves):
+        curves_by_order[order].append(n)
+    for order, curves in curves_by_order.items():
+        firsts = np.concatenate([path.curves[n][1] + (order + 1)*np.arange(path.curves[n][2]) for n in curves])
+        control_points = points[firsts[:, np.newaxis] + np.arange(order + 1)]
+        segment_points = bezier_flatten_array(control_points, tolerance)
+        segment = 0
+        for n in curves:
+            (_, first, count) = path.curves[n]
+            end = first + count*(order + 1) - 1
+            curve_points[n] = np.concatenate(segment_points[segment:segment+count] + [points[end:end+1]])
+            segment += count
+
+    geometries: list[BaseGeometry] = []
+    for (items, closed) in path.subpaths:
+        coordinates = np.concatenate([points[item:item+1] if item >= 0 else curve_points[-item - 1]
+                                        for item in items]) if len(items) else np.empty((0, 2))
+        if (geometry := __geometry_from_coordinates(coordinates, closed, must_close)) is not None:
+            geometries.append(geometry)
 
     geometry = (None if len(geometries) == 0
            else geometries[0] if len(geometries) == 1
            else shapely.unary_union(geometries))
 
+    bezier_points = [BezierPoint(*pt) for pt in points.tolist()]
+    bezier_segments: list[BezierSegment] = [
+        BezierLine(*[bezier_points[i] for i in segment]) if len(segment) == 2
+   else QuadraticBezier(*[bezier_points[i] for i in segment]) if len(segment) == 3
+   else CubicBezier(*[bezier_points[i] for i in segment])
+        for segment in path.segments]
+
     return (geometry, bezier_segments)
 
 #===============================================================================
@@ -19,6 +19,14 @@
 #===============================================================================
 
 import math
+import struct
+import tempfile
+from typing import Optional
+
+#===============================================================================
+
+import cv2
+import numpy as np
 
 #===============================================================================
 
@@ -45,3 +53,171 @@ def paste_image(destination, source, offset):
     return destination
 
 #===============================================================================
+
+def encoded_image_size(image_data: bytes) -> Optional[tuple[int, int]]:
+#======================================================================
+    """
+    Find the size of an encoded image from its header, without decoding it.
+
+    :param image_data: a PNG, JPEG, JPEG 2000 or TIFF image
+    :returns: the image's width and height, or ``None`` if the image's format
+              isn't recognised
+    """
+    try:
+        if image_data.startswith(b'\x89PNG\r\n\x1a\n'):
+            (width, height) = struct.unpack('>II', image_data[16:24])
+            return (width, height)
+        elif image_data.startswith(b'\xff\xd8'):
+            return _jpeg_size(image_data)
+        elif image_data.startswith(b'\x00\x00\x00\x0cjP  \r\n\x87\n'):
+            return _jp2_size(image_data)
+        elif image_data.startswith(b'\xff\x4f\xff\x51'):
+            # A JPEG 2000 codestream, starting with its SIZ marker segment
+            (x_size, y_size, x_offset, y_offset) = struct.unpack('>IIII', image_data[8:24])
+            return (x_size - x_offset, y_size - y_offset)
+        elif image_data[:4] in [b'II*\x00', b'MM\x00*']:
+            return _tiff_size(image_data)
+    except struct.error:
+        pass
+    return None
+
+def _jpeg_size(image_data: bytes) -> Optional[tuple[int, int]]:
+#==============================================================
+    pos = 2
+    while pos < len(image_data):
+        if image_data[pos] != 0xFF:
+            return None
+        marker = image_data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+        elif marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            pos += 2
+        elif 0xC0 <= marker <= 0xCF and marker not in [0xC4, 0xC8, 0xCC]:
+            # Start of frame, giving sample precision, height and width
+            (height, width) = struct.unpack('>HH', image_data[pos+5:pos+9])
+            return (width, height)
+        else:
+            pos += 2 + struct.unpack('>H', image_data[pos+2:pos+4])[0]
+    return None
+
+def _jp2_size(image_data: bytes, start: int=0, end: Optional[int]=None) -> Optional[tuple[int, int]]:
+#====================================================================================================
+    end = len(image_data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        (length, kind) = struct.unpack('>I4s', image_data[pos:pos+8])
+        header = 8
+        if length == 1:
+            length = struct.unpack('>Q', image_data[pos+8:pos+16])[0]
+            header = 16
+        elif length == 0:
+            length = end - pos
+        if kind == b'jp2h':
+            return _jp2_size(image_data, pos + header, pos + length)
+        elif kind == b'ihdr':
+            (height, width) = struct.unpack('>II', image_data[pos+header:pos+header+8])
+            return (width, height)
+        pos += length
+    return None
+
+def _tiff_size(image_data: bytes) -> Optional[tuple[int, int]]:
+#==============================================================
+    order = '<' if image_data[:2] == b'II' else '>'
+    ifd = struct.unpack(f'{order}I', image_data[4:8])[0]
+    size = {}
+    for entry in range(struct.unpack(f'{order}H', image_data[ifd:ifd+2])[0]):
+        pos = ifd + 2 + 12*entry
+        (tag, kind) = struct.unpack(f'{order}HH', image_data[pos:pos+4])
+        if tag in [256, 257]:       # ImageWidth and ImageLength, as a SHORT or a LONG
+            size[tag] = struct.unpack(f'{order}{"H" if kind == 3 else "I"}',
+                                      image_data[pos+8:pos+(10 if kind == 3 else 12)])[0]
+    return (size[256], size[257]) if len(size) == 2 else None
+
+#===============================================================================
+
+# Image pyramid levels are halved until they are no larger than this
+MIN_PYRAMID_SIZE = 512
+
+# The number of rows of a pyramid level that are made at a time
+PYRAMID_STRIP_ROWS = 1024
+
+class ImagePyramid(object):
+    """
+    A BGRA image, along with successively halved reductions of it, held in
+    memory-mapped temporary files.
+
+    The image is only decoded, and the pyramid made, when its levels are
+    first used, which should be before tiling processes are forked. They
+    then share the pyramid's mapping and only read the parts of levels that
+    their tiles need, rather than each holding a decoded copy of what may be
+    a very large image.
+
+    :param image_data: the encoded source image
+    """
+    def __init__(self, image_data: bytes):
+        self.__image_data: Optional[bytes] = image_data
+        self.__levels: Optional[list[np.ndarray]] = None
+        self.__size = encoded_image_size(image_data)
+
+    @property
+    def levels(self) -> list[np.ndarray]:
+        if self.__levels is None:
+            self.__levels = self.__make_levels()
+        return self.__levels
+
+    @property
+    def size(self) -> tuple[int, int]:
+        if self.__size is None:
+            (height, width) = self.levels[0].shape[:2]
+            self.__size = (width, height)
+        return self.__size
+
+    def __make_levels(self) -> list[np.ndarray]:
+    #===========================================
+        # The encoded image is released once the pyramid has been made
+        assert self.__image_data is not None
+        image = cv2.imdecode(np.frombuffer(self.__image_data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise ValueError('Cannot decode image')
+        elif self.__size is not None and image_size(image) != self.__size:
+            raise ValueError(f'Image size {image_size(image)} does not match its header: {self.__size}')
+        self.__image_data = None
+        level = self.__new_level(image.shape[:2])
+        for row in range(0, image.shape[0], PYRAMID_STRIP_ROWS):
+            level[row:row+PYRAMID_STRIP_ROWS] = self.__as_bgra(image[row:row+PYRAMID_STRIP_ROWS])
+        del image
+        levels = [level]
+        while max(level.shape[:2]) > MIN_PYRAMID_SIZE:
+            level = self.__reduced_level(level)
+            levels.append(level)
+        return levels
+
+    @staticmethod
+    def __as_bgra(image: np.ndarray) -> np.ndarray:
+    #==============================================
+        if image.dtype == np.uint16:
+            image = (image >> 8).astype(np.uint8)
+        if image.ndim == 2:
+            return cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+        elif image.shape[2] == 3:
+            return cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        return image
+
+    @staticmethod
+    def __new_level(shape: tuple[int, ...]) -> np.ndarray:
+    #=====================================================
+        # The file is unlinked when created, so its space is freed when the
+        # last process using the mapping exits
+        return np.memmap(tempfile.TemporaryFile(), dtype=np.uint8, mode='w+', shape=(shape[0], shape[1], 4))
+
+    def __reduced_level(self, level: np.ndarray) -> np.ndarray:
+    #==========================================================
+        (height, width) = level.shape[:2]
+        reduced = self.__new_level(((height + 1)//2, (width + 1)//2))
+        for row in range(0, height, 2*PYRAMID_STRIP_ROWS):
+            strip = level[row:row+2*PYRAMID_STRIP_ROWS]
+            reduced[row//2:(row + strip.shape[0] + 1)//2] = cv2.resize(strip,
+                (reduced.shape[1], (strip.shape[0] + 1)//2), interpolation=cv2.INTER_AREA)
+        return reduced
+
+#===============================================================================
@@ -0,0 +1,53 @@
+#===============================================================================
+#
+#  Check that an image pyramid has its image's size before the image is
+#  decoded, and that its levels are made from the image.
+#
+#  Run with ``pytest tests/image-pyramid``.
+#
+#===============================================================================
+
+import os
+
+#===============================================================================
+
+import cv2
+import numpy as np
+import pytest
+
+#===============================================================================
+
+from mapmaker.utils.image import encoded_image_size, ImagePyramid
+
+#===============================================================================
+
+VAGUS_IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'vagus', 'sub-10sam-1P10-1Slide2p3MT10x.jp2')
+
+#===============================================================================
+
+@pytest.mark.parametrize('extension', ['.png', '.jpg', '.jp2', '.tif'])
+def test_encoded_image_size(extension):
+    image = np.random.default_rng(0).integers(0, 256, (300, 700, 3), dtype=np.uint8)
+    image_data = cv2.imencode(extension, image)[1].tobytes()
+    assert encoded_image_size(image_data) == (700, 300)
+
+def test_unknown_format():
+    assert encoded_image_size(b'GIF89a\x01\x00\x01\x00') is None
+
+def test_lazy_pyramid(monkeypatch):
+    decoded = []
+    imdecode = cv2.imdecode
+    monkeypatch.setattr(cv2, 'imdecode', lambda *args: decoded.append(True) or imdecode(*args))
+    with open(VAGUS_IMAGE, 'rb') as fp:
+        pyramid = ImagePyramid(fp.read())
+    assert pyramid.size == (4502, 3053)
+    assert len(decoded) == 0
+    levels = pyramid.levels
+    assert len(decoded) == 1
+    assert [level.shape for level in levels] == [(3053, 4502, 4), (1527, 2251, 4),
+                                                 (764, 1126, 4), (382, 563, 4), (191, 282, 4)]
+    assert pyramid.levels is levels
+    assert len(decoded) == 1
+
+#===============================================================================
@@ -0,0 +1,63 @@
+#===============================================================================
+#
+#  Check that marker positions are at polygons' poles of inaccessibility,
+#  or inside convex polygons, and are reused by later builds.
+#
+#  Run with ``pytest tests/markers``.
+#
+#===============================================================================
+
+import math
+
+#===============================================================================
+
+import numpy as np
+import shapely
+import shapely.ops
+
+#===============================================================================
+
+from mapmaker.output.markers import marker_cache, marker_positions, MARKER_TOLERANCE
+from mapmaker.settings import settings
+
+#===============================================================================
+
+def star_polygons(count: int, vertices: int) -> list[shapely.Polygon]:
+    rng = np.random.default_rng(0)
+    polygons = []
+    for centre in rng.uniform(0, 1000, (count, 2)):
+        angles = np.sort(rng.uniform(0, 2*math.pi, vertices))
+        radii = rng.uniform(5, 10, vertices)
+        polygons.append(shapely.Polygon(np.column_stack((centre[0] + radii*np.cos(angles),
+                                                         centre[1] + radii*np.sin(angles)))))
+    return polygons
+
+#===============================================================================
+
+def test_marker_positions():
+    marker_cache.clear()
+    polygons = star_polygons(100, 50)
+    others = [shapely.Point(1, 2), shapely.LineString([(0, 0), (2, 4)])]
+    convex = shapely.box(0, 0, 30, 10)
+    (positions, counts) = marker_positions(polygons + others + [convex])
+    assert counts == {'cached': 0, 'convex': 1, 'computed': len(polygons)}
+    for (polygon, position) in zip(polygons, positions):
+        assert position == list(shapely.ops.polylabel(polygon, tolerance=MARKER_TOLERANCE).coords[0])
+    assert positions[len(polygons):] == [[1.0, 2.0], [1.0, 2.0], [15.0, 5.0]]
+
+def test_marker_cache(tmp_path):
+    polygons = star_polygons(10, 50)
+    settings['markerCache'] = str(tmp_path)
+    try:
+        marker_cache.clear()
+        (positions, _) = marker_positions(polygons)
+        marker_cache.save()
+        marker_cache.clear()
+        (cached_positions, counts) = marker_positions(polygons)
+        assert counts['cached'] == len(polygons)
+        assert cached_positions == positions
+    finally:
+        settings.pop('markerCache')
+        marker_cache.clear()
+
+#===============================================================================
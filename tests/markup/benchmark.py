@@ -0,0 +1,51 @@
+#===============================================================================
+#
+#  Throughput of markup parsing.
+#
+#  Parses all markup in the SVG files under ``tests/`` with the markup grammar
+#  alone, and with ``parse_markup``, both before and after its cache is filled.
+#
+#===============================================================================
+
+import time
+
+#===============================================================================
+
+from mapmaker.properties import markup as markup_module
+from mapmaker.properties.markup import parse_markup
+
+from test_markup import markup_strings, reference_parse_markup
+
+#===============================================================================
+
+def throughput(parse, markups: list[str], repeats: int) -> float:
+#================================================================
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for markup in markups:
+            parse(markup)
+    return repeats*len(markups)/(time.perf_counter() - start)
+
+#===============================================================================
+
+def main():
+#==========
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark parsing of the markup in `tests/`.')
+    parser.add_argument('--repeats', type=int, default=20, help='Number of times to parse each markup string')
+    args = parser.parse_args()
+
+    markups = markup_strings()
+    print(f'{len(markups)} markup strings')
+    print(f'Grammar:  {throughput(reference_parse_markup, markups, args.repeats):10.0f} markups/s')
+    getattr(markup_module, '__markup_properties').cache_clear()
+    print(f'Uncached: {throughput(parse_markup, markups, 1):10.0f} markups/s')
+    print(f'Cached:   {throughput(parse_markup, markups, args.repeats):10.0f} markups/s')
+
+#===============================================================================
+
+if __name__ == '__main__':
+    main()
+
+#===============================================================================
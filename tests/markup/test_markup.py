@@ -0,0 +1,118 @@
+#===============================================================================
+#
+#  Check that cached and directly scanned markup gives the same properties
+#  as parsing with the markup grammar.
+#
+#  Run with ``pytest tests/markup``.
+#
+#===============================================================================
+
+from pathlib import Path
+
+#===============================================================================
+
+import lxml.etree as etree
+from pyparsing import ParseException
+
+#===============================================================================
+
+from mapmaker.properties.markup import DEPRECATED_MARKUP, FEATURE_FLAGS, SHAPE_FLAGS, SHAPE_MARKUP
+from mapmaker.properties.markup import parse_markup
+from mapmaker.sources.svg.utils import svg_markup
+
+#===============================================================================
+
+TESTS_DIRECTORY = Path(__file__).parent.parent
+
+# Markup at the edges of what is scanned directly
+EDGE_CASE_MARKUP = [
+    '.',
+    ' .id(x)',
+    '.  node  ',
+    '.node\t',
+    '.id( x )class(y)',
+    '.id(x) id(y)',
+    '.id(UBERON:123/abc_-.)',
+    '.group id(x) class(y) node centreline',
+    '.marker siblings',
+    '.styling id(x)',
+    '.path(P1) children(c)',
+    '.boundaryclosed',
+    '.boundary.closed',
+    '.boundary(',
+    '.closedid(x)',
+    '.identifier(x)',
+    '.id(a b)',
+    '.id(-x)',
+    '.id(x$)',
+    '.node$',
+    '.node_x',
+    '.ID(x)',
+    '.name(Some name)',
+    '.details(x, 3)',
+    '.style(1) id(x)',
+    '.models(FMA:1)',
+]
+
+#===============================================================================
+
+def reference_parse_markup(markup: str) -> dict:
+    """
+    Markup properties from the grammar alone.
+    """
+    properties = {'markup': markup}
+    deprecated = []
+    try:
+        parsed = SHAPE_MARKUP.parseString(markup, parseAll=True)
+        for prop in parsed[1:]:
+            if prop[0] in DEPRECATED_MARKUP:
+                deprecated.append(prop[0])
+            if (FEATURE_FLAGS.matches(prop[0])
+             or SHAPE_FLAGS.matches(prop[0])):
+                properties[prop[0]] = True
+            elif prop[0] == 'details':
+                properties[prop[0]] = prop[1]
+                properties['maxzoom'] = int(prop[2]) - 1
+            else:
+                properties[prop[0]] = prop[1]
+    except ParseException:
+        properties['error'] = 'Syntax error'
+    if len(deprecated):
+        properties['warning'] = f"Deprecated `{', '.join(deprecated)}`"
+    if ('styling' in properties
+    and ('id' in properties or 'class' in properties)):
+        properties['error'] = "'styling' element can't have an 'id' nor 'class'"
+    return properties
+
+def markup_strings() -> list[str]:
+#=================================
+    """
+    All markup in the SVG files under ``tests/``.
+    """
+    markups = set()
+    for svg_file in sorted(TESTS_DIRECTORY.rglob('*.svg')):
+        for element in etree.parse(svg_file).iter():
+            if isinstance(element.tag, str) and (markup := svg_markup(element)).startswith('.'):
+                markups.add(markup)
+    return sorted(markups)
+
+#===============================================================================
+
+def test_markup_in_tests():
+    markups = markup_strings()
+    assert len(markups) > 0
+    for markup in markups:
+        assert parse_markup(markup) == reference_parse_markup(markup), markup
+
+def test_edge_case_markup():
+    for markup in EDGE_CASE_MARKUP:
+        assert parse_markup(markup) == reference_parse_markup(markup), markup
+
+def test_cached_markup_is_copied():
+    properties = parse_markup('.id(cached) class(copy)')
+    properties['id'] = 'changed'
+    properties['extra'] = True
+    assert parse_markup('.id(cached) class(copy)') == {'markup': '.id(cached) class(copy)',
+                                                       'id': 'cached', 'class': 'copy'}
+
+#===============================================================================
@@ -0,0 +1,124 @@
+#===============================================================================
+#
+#  Throughput of saving raster tiles.
+#
+#  Saves synthetic tiles in an mbtiles database: one insert at a time followed
+#  by compression, as was done before tiles were batched; through the batched
+#  writer; and from worker processes into their own shard databases, which are
+#  then merged into the main database.
+#
+#===============================================================================
+
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+#===============================================================================
+
+import mbutil as mb
+import multiprocess as mp
+
+#===============================================================================
+
+from mapmaker.output.mbtiles import MBTiles
+
+#===============================================================================
+
+ZOOM = 10
+
+type Tile = tuple[int, int, bytes]
+
+#===============================================================================
+
+def make_tiles(count: int, size: int, duplicates: float) -> list[Tile]:
+#======================================================================
+    # Tiles in rows at a zoom level, with a fraction of them all having the
+    # same content, as blank and single coloured tiles do
+    rng = random.Random(0)
+    duplicate = rng.randbytes(size)
+    width = 1 << ZOOM
+    return [(n % width, n//width, duplicate if rng.random() < duplicates else rng.randbytes(size))
+                for n in range(count)]
+
+#===============================================================================
+
+def save_one_at_a_time(tiles: list[Tile], database_path: str, _: int):
+#=====================================================================
+    connection = mb.mbtiles_connect(database_path, True)
+    cursor = connection.cursor()
+    mb.mbtiles_setup(cursor)
+    for (x, y, tile_data) in tiles:
+        cursor.execute("""insert into tiles (zoom_level, tile_column, tile_row, tile_data)
+                                     values (?, ?, ?, ?);""",
+                                            (ZOOM, x, mb.flip_y(ZOOM, y), sqlite3.Binary(tile_data)))
+    mb.compression_prepare(cursor, True)
+    mb.compression_do(cursor, connection, 256, True)
+    mb.compression_finalize(cursor)
+    mb.optimize_database(connection, True)
+    connection.close()
+
+def save_batched(tiles: list[Tile], database_path: str, _: int):
+#===============================================================
+    mbtiles = MBTiles(database_path, True, True, silent=True, deduplicate=True)
+    for (x, y, tile_data) in tiles:
+        mbtiles.save_tile(ZOOM, x, y, tile_data)
+    mbtiles.close()
+
+def _save_shard(tiles: list[Tile], shard_path: str):
+#===================================================
+    shard = MBTiles(shard_path, True, True, silent=True, deduplicate=True)
+    for (x, y, tile_data) in tiles:
+        shard.save_tile(ZOOM, x, y, tile_data)
+    shard.flush()
+
+def save_sharded(tiles: list[Tile], database_path: str, workers: int):
+#=====================================================================
+    shard_paths = [f'{database_path}.{n}' for n in range(workers)]
+    processes = [mp.Process(target=_save_shard, args=(tiles[n::workers], shard_path))   # pyright: ignore[reportAttributeAccessIssue]
+                    for (n, shard_path) in enumerate(shard_paths)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    mbtiles = MBTiles(database_path, True, True, silent=True, deduplicate=True)
+    for shard_path in shard_paths:
+        mbtiles.merge_shard(shard_path)
+    mbtiles.close()
+
+#===============================================================================
+
+def main():
+#==========
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark saving raster tiles in an mbtiles database.')
+    parser.add_argument('--tiles', type=int, default=100000, help='Number of tiles to save')
+    parser.add_argument('--size', type=int, default=2048, help='Size, in bytes, of each tile')
+    parser.add_argument('--duplicates', type=float, default=0.2, help='Fraction of tiles with the same content')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 8, help='Number of shard databases')
+    args = parser.parse_args()
+
+    tiles = make_tiles(args.tiles, args.size, args.duplicates)
+    print(f'{len(tiles)} tiles of {args.size} bytes, {args.workers} shards')
+    with tempfile.TemporaryDirectory() as directory:
+        for (name, save) in [('One at a time', save_one_at_a_time),
+                             ('Batched', save_batched),
+                             ('Shards', save_sharded)]:
+            database_path = os.path.join(directory, f'{name.replace(' ', '-').lower()}.mbtiles')
+            start_time = time.perf_counter()
+            save(tiles, database_path, args.workers)
+            seconds = time.perf_counter() - start_time
+            connection = sqlite3.connect(database_path)
+            saved = connection.execute('select count(*) from tiles;').fetchone()[0]
+            connection.close()
+            size = os.path.getsize(database_path)/(1024*1024)
+            print(f'{name:14} {seconds:7.2f} s {len(tiles)/seconds:10.0f} tiles/s {size:8.1f} MB, {saved} tiles')
+
+#===============================================================================
+
+if __name__ == '__main__':
+    main()
+
+#===============================================================================
@@ -0,0 +1,50 @@
+#===============================================================================
+#
+#  Check that the closed-form inverse Web Mercator projection matches
+#  ``pyproj``.
+#
+#  Run with ``pytest tests/mercator``.
+#
+#===============================================================================
+
+import numpy as np
+import shapely
+
+#===============================================================================
+
+from mapmaker.geometry import inverse_mercator, mercator_transform, mercator_transform_geometries
+from mapmaker.geometry import mercator_transformer
+
+#===============================================================================
+
+TOLERANCE = 1e-9            # degrees
+
+# Half the width of the Web Mercator world, in metres
+MERCATOR_LIMIT = 20037508.342789244
+
+#===============================================================================
+
+def test_inverse_mercator():
+    rng = np.random.default_rng(0)
+    coordinates = rng.uniform(-MERCATOR_LIMIT, MERCATOR_LIMIT, (100000, 2))
+    coordinates = np.concatenate((coordinates, [[0.0, 0.0],
+                                                [MERCATOR_LIMIT, MERCATOR_LIMIT],
+                                                [-MERCATOR_LIMIT, -MERCATOR_LIMIT]]))
+    expected = np.column_stack(mercator_transformer.transform(coordinates[:, 0], coordinates[:, 1]))
+    assert np.abs(inverse_mercator(coordinates) - expected).max() < TOLERANCE
+
+def test_mercator_transform_geometries():
+    geometries = [
+        shapely.Point(1000.0, -2000.0),
+        shapely.LineString([(0, 0), (1e6, 2e6), (-3e6, 5e5)]),
+        shapely.box(-1e6, -1e6, 2e6, 3e6).difference(shapely.box(0, 0, 1e6, 1e6)),
+        shapely.MultiPolygon([shapely.box(0, 0, 10, 10), shapely.box(100, 100, 200, 300)]),
+        shapely.Polygon(),
+    ]
+    for (geometry, transformed) in zip(geometries, mercator_transform_geometries(geometries)):
+        expected = mercator_transform(geometry)
+        assert transformed.geom_type == expected.geom_type
+        assert shapely.equals_exact(transformed, expected, tolerance=TOLERANCE)
+    assert geometries[1].coords[1] == (1e6, 2e6)
+
+#===============================================================================
@@ -0,0 +1,122 @@
+#===============================================================================
+#
+#  Peak memory and time taken to make the tiles of the details layer of
+#  ``tests/svg-details``.
+#
+#  Tiles are made by drawing each tile directly, as ``SVGTiler`` now does, and
+#  as they were before, by rasterising the whole layer into one image at the
+#  zoom level, warping it into place on the base map, masking it with the
+#  layer's boundary, and cutting tiles from the result. Each way is run in its
+#  own process, so that its peak resident set size (RSS) is its own.
+#
+#===============================================================================
+
+import multiprocessing
+import resource
+import time
+import typing
+
+#===============================================================================
+
+import cv2
+import numpy as np
+import skia
+
+#===============================================================================
+
+from mapmaker.geometry import Transform
+from mapmaker.output.tilemaker import TileSet
+from mapmaker.sources import mask_image, not_empty
+from mapmaker.sources.svg.rasteriser import SVGRasteriser, SVGTiler
+
+from detail_layers import tissue_detail_layer
+
+#===============================================================================
+
+def rss_mb() -> float:
+#=====================
+    with open('/proc/self/status') as fp:
+        for line in fp:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])/1024
+    return 0.0
+
+def warped_tiles(layer, tile_set: TileSet) -> int:
+#=================================================
+    # Rasterise the whole layer, as before tiles were drawn directly
+    rasteriser = SVGRasteriser(layer.source_data, (tile_set.pixel_rect.width, tile_set.pixel_rect.height))
+    rasteriser.render()
+    image = rasteriser.get_image().toarray(colorType=skia.kBGRA_8888_ColorType)
+    (scaling, size) = (rasteriser.scaling, rasteriser.size)
+    metres_per_pixel = layer.map_source.metres_per_pixel
+    image_to_world = (Transform([[metres_per_pixel/scaling[0],                           0, 0],
+                                 [                          0, metres_per_pixel/scaling[1], 0],
+                                 [                          0,                           0, 1]])
+                     @np.array([[1.0,  0.0, -size[0]/2.0],
+                                [0.0, -1.0,  size[1]/2.0],
+                                [0.0,  0.0,          1.0]]))
+    # Warp it into the tile set's pixels and mask it with the layer's boundary
+    (tile_width, tile_height) = tile_set.tile_size
+    grid_size = ((tile_set.end_coords[0] - tile_set.start_coords[0] + 1)*tile_width,
+                 (tile_set.end_coords[1] - tile_set.start_coords[1] + 1)*tile_height)
+    image_to_tile_pixels = tile_set.world_to_tile_pixels@layer.local_world_to_base@image_to_world
+    image = cv2.warpPerspective(image, image_to_tile_pixels.matrix, grid_size, flags=cv2.INTER_CUBIC)
+    image = mask_image(image, tile_set.world_to_tile_pixels.transform_geometry(layer.boundary_geometry))
+    made = 0
+    for tile in tile_set:
+        x0 = (tile.x - tile_set.start_coords[0])*tile_width
+        y0 = (tile.y - tile_set.start_coords[1])*tile_height
+        if not_empty(image[y0:y0+tile_height, x0:x0+tile_width]):
+            made += 1
+    return made
+
+def direct_tiles(layer, tile_set: TileSet) -> int:
+#=================================================
+    tiler = SVGTiler(typing.cast(typing.Any, layer), tile_set)
+    made = 0
+    for tile in tile_set:
+        if tiler.get_tile(tile) is not None:
+            made += 1
+    return made
+
+#===============================================================================
+
+def measure(make_tiles, zoom: int, results):
+#===========================================
+    layer = tissue_detail_layer()
+    tile_set = TileSet(layer.extent, zoom, layer.boundary_geometry)
+    start_rss = rss_mb()
+    start_time = time.perf_counter()
+    made = make_tiles(layer, tile_set)
+    seconds = time.perf_counter() - start_time
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+    results.put((len(tile_set), made, seconds, peak_rss, peak_rss - start_rss))
+
+#===============================================================================
+
+def main():
+#==========
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark making the tiles of a detail layer.')
+    parser.add_argument('--zoom', type=int, nargs='+', default=[10, 12, 13],
+                        help='Zoom levels to make tiles at')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    print(f'{"zoom":>4} {"method":8} {"tiles":>6} {"made":>6} {"seconds":>8} {"peak RSS MB":>12} {"added MB":>9}')
+    for zoom in args.zoom:
+        for (name, make_tiles) in [('warped', warped_tiles), ('direct', direct_tiles)]:
+            results = context.Queue()
+            process = context.Process(target=measure, args=(make_tiles, zoom, results))
+            process.start()
+            (tiles, made, seconds, peak_rss, added_rss) = results.get()
+            process.join()
+            print(f'{zoom:4} {name:8} {tiles:6} {made:6} {seconds:8.2f} {peak_rss:12.0f} {added_rss:9.0f}')
+
+#===============================================================================
+
+if __name__ == '__main__':
+    main()
+
+#===============================================================================
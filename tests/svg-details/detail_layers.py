@@ -0,0 +1,125 @@
+#===============================================================================
+#
+#  Raster layers of SVG detail maps, placed into a feature of their base map
+#  as ``FlatMap`` places the details layer of ``tests/svg-details``, for
+#  testing and benchmarking the making of detail tiles.
+#
+#===============================================================================
+
+import os
+from types import SimpleNamespace
+from typing import Optional
+
+#===============================================================================
+
+import cv2
+import lxml.etree as etree
+import numpy as np
+from shapely.geometry.base import BaseGeometry
+
+#===============================================================================
+
+from mapmaker.geometry import bounds_to_extent, normalised_coords, Transform
+from mapmaker.output.tile_encoding import TileEncoding
+from mapmaker.settings import MAP_KIND
+from mapmaker.sources.svg import world_meters_per_pixel
+from mapmaker.sources.svg.utils import geometry_from_svg_path, length_as_pixels, parse_svg_path
+
+#===============================================================================
+
+SVG_DETAILS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BASE_SVG = os.path.join(SVG_DETAILS_DIR, 'tissue-outline.svg')
+DETAILS_SVG = os.path.join(SVG_DETAILS_DIR, 'tissue-details.svg')
+
+# The base map's feature that the details layer is placed into, and the
+# details layer's boundary
+BASE_FEATURE_ID = '_x2E_details_x28_details_x2C__7_x29_'
+DETAILS_BOUNDARY_ID = '_x2E_boundary'
+
+# The details layer's minimum zoom, one more than the ``7`` of the feature's markup
+DETAILS_MIN_ZOOM = 8
+
+#===============================================================================
+
+def svg_placement(svg_data: bytes) -> tuple[Transform, float, tuple[float, float]]:
+#==================================================================================
+    """
+    The transform from SVG pixels to world coordinates, metres per SVG pixel,
+    and size of an SVG source without a base feature, as ``SVGSource`` places it.
+    """
+    svg = etree.fromstring(svg_data)
+    if 'viewBox' in svg.attrib:
+        (left, top, width, height) = tuple(float(x) for x in svg.attrib['viewBox'].split())
+    else:
+        (left, top) = (0.0, 0.0)
+        width = length_as_pixels(svg.attrib.get('width'))
+        height = length_as_pixels(svg.attrib.get('height'))
+    assert width is not None and height is not None
+    metres_per_pixel = world_meters_per_pixel(width, height)
+    svg_to_world = (Transform([[metres_per_pixel,                0, 0],
+                               [               0, metres_per_pixel, 0],
+                               [               0,                0, 1]])
+                   @np.array([[1.0,  0.0, -left-width/2.0],
+                              [0.0, -1.0,  top+height/2.0],
+                              [0.0,  0.0,             1.0]]))
+    return (svg_to_world, metres_per_pixel, (width, height))
+
+def svg_path_geometry(svg_data: bytes, element_id: str, svg_to_world: Transform) -> BaseGeometry:
+#===============================================================================================
+    element = etree.fromstring(svg_data).find(f'.//*[@id="{element_id}"]')
+    assert element is not None
+    geometry = geometry_from_svg_path(list(parse_svg_path(element.attrib['d'])), svg_to_world)[0]
+    assert geometry is not None
+    return geometry
+
+#===============================================================================
+
+def svg_detail_layer(svg_data: bytes, boundary: BaseGeometry, base_feature: BaseGeometry,
+                     layer_id: str='details', min_zoom: int=DETAILS_MIN_ZOOM,
+                     tile_encoding: Optional[TileEncoding]=None) -> SimpleNamespace:
+#=========================================================================================
+    """
+    A raster layer of an SVG detail map, with just the attributes used when
+    making the layer's tiles.
+
+    :param svg_data: the detail map's SVG
+    :param boundary: the detail map's boundary, in its world coordinates
+    :param base_feature: the feature the detail map is placed into, in the
+                         base map's world coordinates
+    """
+    (_, metres_per_pixel, (width, height)) = svg_placement(svg_data)
+    src = np.array(normalised_coords(boundary.minimum_rotated_rectangle), dtype="float32")
+    dst = np.array(normalised_coords(base_feature.minimum_rotated_rectangle), dtype="float32")
+    local_world_to_base = Transform(cv2.getPerspectiveTransform(src, dst))      # type: ignore
+    (half_width, half_height) = (metres_per_pixel*width/2, metres_per_pixel*height/2)
+    local_extent = bounds_to_extent((-half_width, -half_height, half_width, half_height))
+    return SimpleNamespace(
+        id=layer_id,
+        boundary_geometry=local_world_to_base.transform_geometry(boundary),
+        extent=local_world_to_base.transform_extent(local_extent),
+        flatmap=SimpleNamespace(map_kind=MAP_KIND.ANATOMICAL),
+        local_world_to_base=local_world_to_base,
+        map_source=SimpleNamespace(kind='details', base_feature=None, metres_per_pixel=metres_per_pixel,
+                                   boundary_geometry=boundary),
+        min_zoom=min_zoom,
+        source_data=svg_data,
+        source_kind='svg',
+        source_path=None,
+        tile_encoding=tile_encoding if tile_encoding is not None else TileEncoding()
+    )
+
+def tissue_detail_layer() -> SimpleNamespace:
+#============================================
+    """
+    The details layer of ``tests/svg-details``.
+    """
+    with open(BASE_SVG, 'rb') as fp:
+        base_data = fp.read()
+    with open(DETAILS_SVG, 'rb') as fp:
+        details_data = fp.read()
+    base_feature = svg_path_geometry(base_data, BASE_FEATURE_ID, svg_placement(base_data)[0])
+    boundary = svg_path_geometry(details_data, DETAILS_BOUNDARY_ID, svg_placement(details_data)[0])
+    return svg_detail_layer(details_data, boundary, base_feature)
+
+#===============================================================================
@@ -0,0 +1,94 @@
+#===============================================================================
+#
+#  Check that a shape in a detail layer is drawn where the layer's placement
+#  into its base map feature puts it in the layer's tiles.
+#
+#  Run with ``pytest tests/svg-details``.
+#
+#===============================================================================
+
+import typing
+
+#===============================================================================
+
+import cv2
+import numpy as np
+import shapely
+import shapely.affinity
+
+#===============================================================================
+
+from mapmaker.output.tilemaker import TileSet
+from mapmaker.sources.svg.rasteriser import SVGTiler
+
+from detail_layers import svg_detail_layer, svg_placement, tissue_detail_layer
+
+#===============================================================================
+
+MAX_ZOOM = 14
+
+# A red square in a detail map, which is placed into a rotated rectangle
+DETAIL_SVG = (b'<svg xmlns="http://www.w3.org/2000/svg" width="1000" height="800">'
+              b'<rect x="600" y="200" width="100" height="100" fill="#FF0000"/></svg>')
+SQUARE = [(600, 200), (700, 200), (700, 300), (600, 300)]
+BASE_FEATURE = shapely.affinity.rotate(shapely.box(100000, 200000, 105000, 204000), 30)
+
+#===============================================================================
+
+def tile_pixel_coordinates(layer, tile_set: TileSet, svg_points: list[tuple[float, float]]) -> np.ndarray:
+    # SVG pixels to the base map's world coordinates, with any perspective, and
+    # then to tile pixels
+    svg_to_world = svg_placement(layer.source_data)[0]
+    local_world = np.array([[svg_to_world.transform_point(point) for point in svg_points]], dtype=np.float64)
+    base_world = cv2.perspectiveTransform(local_world, layer.local_world_to_base.matrix)[0]
+    return np.array([tile_set.world_to_tile_pixels.transform_point(point) for point in base_world])
+
+def red_pixels(layer, tile_set: TileSet) -> np.ndarray:
+    # The centres, in tile pixels, of the red pixels of all tiles
+    tiler = SVGTiler(typing.cast(typing.Any, layer), tile_set)
+    (tile_width, tile_height) = tile_set.tile_size
+    centres = []
+    for tile in tile_set:
+        if (image := tiler.get_tile(tile)) is not None:
+            (rows, columns) = np.nonzero((image[:, :, 2] > 200) & (image[:, :, 1] < 60) & (image[:, :, 0] < 60))
+            centres.append(np.column_stack(((tile.x - tile_set.start_coords[0])*tile_width + columns + 0.5,
+                                            (tile.y - tile_set.start_coords[1])*tile_height + rows + 0.5)))
+    return np.concatenate(centres) if centres else np.empty((0, 2))
+
+#===============================================================================
+
+def test_shape_placement():
+    (svg_to_world, _, (width, height)) = svg_placement(DETAIL_SVG)
+    boundary = svg_to_world.transform_geometry(shapely.box(0, 0, width, height))
+    layer = svg_detail_layer(DETAIL_SVG, boundary, BASE_FEATURE)
+    tile_set = TileSet(layer.extent, MAX_ZOOM, layer.boundary_geometry)
+    square = shapely.Polygon(tile_pixel_coordinates(layer, tile_set, SQUARE))
+    assert square.area > 1000
+
+    pixels = red_pixels(layer, tile_set)
+    # All red pixels are in the square, allowing for anti-aliasing, and they
+    # cover it
+    assert np.all(shapely.contains_xy(square.buffer(1.0), pixels[:, 0], pixels[:, 1]))
+    assert abs(len(pixels) - square.area) < 0.05*square.area
+    assert np.allclose(pixels.mean(axis=0), square.centroid.coords[0], atol=0.5)
+
+def test_tissue_details():
+    # The details map of ``tests/svg-details`` is drawn inside its boundary,
+    # as placed into the base map's feature, and fills most of it
+    layer = tissue_detail_layer()
+    tile_set = TileSet(layer.extent, 11, layer.boundary_geometry)
+    tiler = SVGTiler(typing.cast(typing.Any, layer), tile_set)
+    expected = tile_set.world_to_tile_pixels.transform_geometry(layer.boundary_geometry)
+    # The centres, in tile pixels, of the pixels drawn on
+    (tile_width, tile_height) = tile_set.tile_size
+    drawn = []
+    for tile in tile_set:
+        if (image := tiler.get_tile(tile)) is not None:
+            (rows, columns) = np.nonzero(np.any(image[:, :, 0:3] < 250, axis=2))
+            drawn.append(np.column_stack(((tile.x - tile_set.start_coords[0])*tile_width + columns + 0.5,
+                                          (tile.y - tile_set.start_coords[1])*tile_height + rows + 0.5)))
+    pixels = np.concatenate(drawn) if drawn else np.empty((0, 2))
+    assert len(pixels) > 0.5*expected.area
+    assert np.all(shapely.contains_xy(expected.buffer(1.5), pixels[:, 0], pixels[:, 1]))
+
+#===============================================================================
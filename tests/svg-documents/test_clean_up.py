@@ -0,0 +1,70 @@
+#===============================================================================
+#
+#  Check that cleaning up after making a map, with parsed SVG and other
+#  per-build caches in use, logs and clears the caches, copies the log into
+#  the map's directory, and removes the maker's sentinel.
+#
+#  Run with ``pytest tests/svg-documents``.
+#
+#===============================================================================
+
+import logging
+import os
+
+#===============================================================================
+
+from cssselect2 import ElementWrapper
+
+#===============================================================================
+
+from mapmaker.maker import MapMaker, MAKER_LOG, MAKER_SENTINEL
+from mapmaker.output.markers import marker_cache
+from mapmaker.settings import settings
+from mapmaker.sources.svg.cleaner import element_classes
+from mapmaker.sources.svg.documents import svg_documents
+from mapmaker.sources.svg.styling import style_matchers
+
+#===============================================================================
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 10 10"><rect width="5" height="5"/></svg>'
+
+#===============================================================================
+
+class Manifest:
+    def clean_up(self):
+        pass
+
+#===============================================================================
+
+def test_clean_up(tmp_path):
+    # A maker part way through making a map
+    map_dir = str(tmp_path/'map')
+    os.makedirs(map_dir)
+    sentinel = os.path.join(map_dir, MAKER_SENTINEL)
+    with open(sentinel, 'a'):
+        pass
+    file_log = logging.FileHandler(str(tmp_path/'maker.log'))
+    maker = MapMaker.__new__(MapMaker)
+    maker._MapMaker__geojson_files = []                 # type: ignore
+    maker._MapMaker__manifest = Manifest()              # type: ignore
+    maker._MapMaker__file_log = file_log                # type: ignore
+    maker._MapMaker__map_dir = map_dir                  # type: ignore
+    maker._MapMaker__maker_sentinel = sentinel          # type: ignore
+    settings['KNOWLEDGE_STORE'] = None
+
+    document = svg_documents.parse(SVG)
+    style_matchers.get(None).element_style(ElementWrapper.from_xml_root(document.getroot()))
+    element_classes.add(SVG, {'rect': None})
+    marker_cache.get('unknown')
+    assert svg_documents.statistics['parsed'] and style_matchers.statistics['lookups']
+    assert element_classes.statistics['classified'] and marker_cache.statistics['lookups']
+
+    maker._MapMaker__clean_up()                         # type: ignore
+    assert svg_documents.statistics['parsed'] == 0
+    assert style_matchers.statistics['lookups'] == 0
+    assert element_classes.statistics['classified'] == 0
+    assert marker_cache.statistics['lookups'] == 0
+    assert os.path.exists(os.path.join(map_dir, MAKER_LOG))
+    assert not os.path.exists(sentinel)
+
+#===============================================================================
@@ -0,0 +1,42 @@
+#===============================================================================
+#
+#  Check that parsed SVG documents are shared until their last expected use,
+#  and are then no longer kept.
+#
+#  Run with ``pytest tests/svg-documents``.
+#
+#===============================================================================
+
+from mapmaker.sources.svg.documents import SVGDocumentCache
+
+#===============================================================================
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 10 10"><rect width="5" height="5"/></svg>'
+
+#===============================================================================
+
+def test_last_use():
+    documents = SVGDocumentCache()
+    first = documents.parse(SVG)
+    second = documents.parse(SVG)
+    assert first is not second
+    first.getroot().attrib['viewBox'] = '0 0 20 20'
+    last = documents.parse(SVG, last_use=True)
+    assert last.getroot().attrib['viewBox'] == '0 0 10 10'
+    assert documents.statistics['parsed'] == 1
+    assert documents.statistics['copied'] == 2
+    assert documents.statistics['evicted'] == 1
+    # The evicted document is parsed again if it is used again
+    assert documents.parse(SVG, last_use=True) is not last
+    assert documents.statistics['parsed'] == 2
+
+def test_discard():
+    documents = SVGDocumentCache()
+    documents.parse(SVG)
+    documents.discard(SVG)
+    documents.discard(SVG)
+    assert documents.statistics['evicted'] == 1
+    documents.parse(SVG)
+    assert documents.statistics['parsed'] == 2
+
+#===============================================================================
@@ -0,0 +1,262 @@
+#===============================================================================
+#
+#  Micro-benchmark of SVG path conversion.
+#
+#  Converts every path in the SVG files under ``tests/`` with the compiled,
+#  vectorised ``geometry_from_svg_path`` and with the token at a time parser
+#  it replaced, reporting timings, vertex counts and the largest difference
+#  between their geometries.
+#
+#===============================================================================
+
+import math
+from pathlib import Path
+import time
+from typing import Optional
+
+#===============================================================================
+
+from beziers.cubicbezier import CubicBezier
+from beziers.line import Line as BezierLine
+from beziers.path import BezierPath
+from beziers.point import Point as BezierPoint
+from beziers.quadraticbezier import QuadraticBezier
+from beziers.segment import Segment as BezierSegment
+
+import lxml.etree as etree
+import numpy as np
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+#===============================================================================
+
+from mapmaker.geometry import Transform, reflect_point
+from mapmaker.geometry.beziers import bezier_sample, flattening_tolerance
+from mapmaker.geometry.arc_to_bezier import bezier_segments_from_arc_endpoints, tuple2
+from mapmaker.sources.svg.utils import geometry_from_svg_path, parse_svg_path, SVG_TAG
+import mapmaker.sources.svg.utils as svg_utils
+
+#===============================================================================
+
+TESTS_DIRECTORY = Path(__file__).parent.parent
+
+# Scale to map units as for an SVG source about 4000 pixels across,
+# with a shear so that points are really transformed
+TRANSFORM = Transform([[1000.0,   200.0,  100.0],
+                       [   0.0, -1000.0,  -50.0],
+                       [   0.0,     0.0,    1.0]])
+
+#===============================================================================
+
+def reference_geometry_from_svg_path(path_tokens: list[str|float], transform: Transform,
+                                     must_close: Optional[bool]=None) -> tuple[Optional[BaseGeometry], list[BezierSegment]]:
+    """
+    The previous implementation, transforming and sampling each point and curve
+    in Python.
+    """
+    geometry_from_coordinates = getattr(svg_utils, '__geometry_from_coordinates')
+    geometries = []
+    coordinates = []
+    bezier_segments = []
+    closed = False
+    moved = False
+    first_point = None
+    current_point = []
+    pt = []
+    pos = 0
+    cmd = None
+    second_cubic_control = None
+    second_quad_control = None
+    while pos < len(path_tokens):
+        if isinstance(path_tokens[pos], str) and path_tokens[pos].isalpha():    # type: ignore
+            cmd = path_tokens[pos]
+            pos += 1
+        elif cmd == 'M':
+            cmd = 'L'
+        elif cmd == 'm':
+            cmd = 'l'
+        if cmd not in ['s', 'S']:
+            second_cubic_control = None
+        if cmd not in ['t', 'T']:
+            second_quad_control = None
+
+        if cmd in ['a', 'A']:
+            params = [float(x) for x in path_tokens[pos:pos+7]]
+            pos += 7
+            pt = params[5:7]
+            if cmd == 'a':
+                pt[0] += current_point[0]
+                pt[1] += current_point[1]
+            segs = bezier_segments_from_arc_endpoints(tuple2(*params[0:2]), math.radians(params[2]),
+                                                      params[3], params[4],
+                                                      tuple2(*current_point), tuple2(*pt), transform)
+            bezier_segments.extend(segs)
+            coordinates.extend(bezier_sample(BezierPath.fromSegments(segs)))
+            current_point = pt
+
+        elif cmd in ['c', 'C', 's', 'S', 'q', 'Q', 't', 'T']:
+            cubic = cmd in ['c', 'C', 's', 'S']
+            coords = [BezierPoint(*transform.transform_point(current_point))]
+            if cmd in ['c', 'C']:
+                n_params = 6
+            elif cmd in ['q', 'Q']:
+                n_params = 4
+            else:
+                n_params = 4 if cubic else 2
+                second_control = second_cubic_control if cubic else second_quad_control
+                if second_control is None:
+                    coords.append(BezierPoint(*transform.transform_point(current_point)))
+                else:
+                    coords.append(BezierPoint(*transform.transform_point(
+                        reflect_point(second_control, current_point))))
+            params = [float(x) for x in path_tokens[pos:pos+n_params]]
+            pos += n_params
+            for n in range(0, n_params, 2):
+                pt = params[n:n+2]
+                if cmd.islower():
+                    pt[0] += current_point[0]
+                    pt[1] += current_point[1]
+                if n == (n_params - 4):
+                    if cubic:
+                        second_cubic_control = pt
+                    else:
+                        second_quad_control = pt
+                coords.append(BezierPoint(*transform.transform_point(pt)))
+            bz = CubicBezier(*coords) if cubic else QuadraticBezier(*coords)
+            bezier_segments.append(bz)
+            coordinates.extend(bezier_sample(bz))
+            current_point = pt
+
+        elif cmd in ['l', 'L', 'h', 'H', 'v', 'V']:
+            if cmd in ['l', 'L']:
+                pt = [float(x) for x in path_tokens[pos:pos+2]]
+                pos += 2
+                if cmd == 'l':
+                    pt[0] += current_point[0]
+                    pt[1] += current_point[1]
+            else:
+                param = float(path_tokens[pos])
+                pos += 1
+                if cmd == 'h':
+                    param += current_point[0]
+                elif cmd == 'v':
+                    param += current_point[1]
+                pt = [param, current_point[1]] if cmd in ['h', 'H'] else [current_point[0], param]
+            if moved:
+                coordinates.append(transform.transform_point(current_point))
+                moved = False
+            coordinates.append(transform.transform_point(pt))
+            bezier_segments.append(BezierLine(BezierPoint(*coordinates[-2]), BezierPoint(*coordinates[-1])))
+            current_point = pt
+
+        elif cmd in ['m', 'M']:
+            if len(coordinates):
+                if (geometry := geometry_from_coordinates(np.array(coordinates), closed, must_close)) is not None:
+                    geometries.append(geometry)
+                coordinates = []
+                closed = False
+            pt = [float(x) for x in path_tokens[pos:pos+2]]
+            pos += 2
+            if first_point is None:
+                first_point = pt
+            elif cmd == 'm':
+                pt[0] += current_point[0]
+                pt[1] += current_point[1]
+            current_point = pt
+            moved = True
+
+        elif cmd in ['z', 'Z']:
+            if first_point is not None and current_point != first_point:
+                coordinates.append(transform.transform_point(first_point))
+            closed = True
+            first_point = None
+
+    if (geometry := geometry_from_coordinates(np.array(coordinates).reshape((-1, 2)), closed, must_close)) is not None:
+        geometries.append(geometry)
+    geometry = (None if len(geometries) == 0
+           else geometries[0] if len(geometries) == 1
+           else shapely.unary_union(geometries))
+    return (geometry, bezier_segments)
+
+#===============================================================================
+
+def svg_path_tokens() -> list[list[str|float]]:
+#===============================================
+    paths = []
+    for svg_file in sorted(TESTS_DIRECTORY.rglob('*.svg')):
+        for element in etree.parse(svg_file).iter(SVG_TAG('path')):
+            if (d := element.attrib.get('d', '')) != '':
+                paths.append(list(parse_svg_path(d)))
+    return paths
+
+def convert_paths(convert, paths: list[list[str|float]]) -> list:
+#=================================================================
+    results = []
+    for path_tokens in paths:
+        try:
+            results.append(convert(path_tokens, TRANSFORM))
+        except Exception:
+            results.append(None)
+    return results
+
+def time_conversion(convert, paths: list[list[str|float]], repeats: int) -> tuple[float, list]:
+#==============================================================================================
+    best = math.inf
+    results = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = convert_paths(convert, paths)
+        best = min(best, time.perf_counter() - start)
+    return (best, results)
+
+#===============================================================================
+
+def main():
+#==========
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark SVG path conversion over the SVG files in `tests/`.')
+    parser.add_argument('--repeats', type=int, default=5, help='Number of timed runs; the best is reported')
+    args = parser.parse_args()
+
+    paths = svg_path_tokens()
+    print(f'{len(paths)} paths with {sum(len(p) for p in paths)} tokens')
+
+    (reference_time, reference) = time_conversion(reference_geometry_from_svg_path, paths, args.repeats)
+    (compiled_time, compiled) = time_conversion(geometry_from_svg_path, paths, args.repeats)
+    print(f'Reference: {reference_time:.3f} s ({len(paths)/reference_time:.0f} paths/s)')
+    print(f'Compiled:  {compiled_time:.3f} s ({len(paths)/compiled_time:.0f} paths/s)')
+    print(f'Speed up:  {reference_time/compiled_time:.1f}x')
+
+    tolerance = flattening_tolerance()
+    max_distance = 0.0
+    beyond_tolerance = 0
+    mismatched = 0
+    reference_vertices = 0
+    compiled_vertices = 0
+    for (expected, actual) in zip(reference, compiled):
+        if expected is None or actual is None:
+            if (expected is None) != (actual is None):
+                mismatched += 1
+            continue
+        if (expected[0] is None) != (actual[0] is None):
+            mismatched += 1
+        elif expected[0] is not None:
+            distance = expected[0].hausdorff_distance(actual[0])
+            max_distance = max(max_distance, distance)
+            if distance > tolerance:
+                beyond_tolerance += 1
+            reference_vertices += shapely.get_num_coordinates(expected[0])
+            compiled_vertices += shapely.get_num_coordinates(actual[0])
+        if len(expected[1]) != len(actual[1]):
+            mismatched += 1
+    print(f'Vertices:  {reference_vertices} reference, {compiled_vertices} compiled')
+    print(f'Mismatched paths: {mismatched}, largest geometry difference: {max_distance:.3g}')
+    print(f'Geometries differing by more than the curve tolerance of {tolerance:.3g}: {beyond_tolerance}')
+
+#===============================================================================
+
+if __name__ == '__main__':
+    main()
+
+#===============================================================================
@@ -0,0 +1,142 @@
+#===============================================================================
+#
+#  Throughput of making raster tiles.
+#
+#  Makes the tiles, at a zoom level, of each SVG in ``tests/svg-raster`` with a
+#  pool of tiling workers that encode the tiles they make, and as was done
+#  before there was a pool, with a new process started for each batch of tiles
+#  that sends tile images back through a queue to be encoded by the parent
+#  process. Reports tiles made per second and the CPU time used by the parent.
+#
+#===============================================================================
+
+import itertools
+import os
+import queue
+import tempfile
+import time
+
+#===============================================================================
+
+import cv2
+import multiprocess as mp
+import multiprocess.connection as mp_connection
+
+#===============================================================================
+
+from mapmaker.output.mbtiles import MBTiles
+from mapmaker.output.tile_encoding import TileEncoding
+from mapmaker.output.tilemaker import _init_tile_worker, _make_tiles, MAX_TILE_PROCESSES, TILE_CHUNK_SIZE, TileSet
+from mapmaker.sources import add_alpha, not_empty
+from mapmaker.sources.svg.rasteriser import SVGTiler
+
+from tiling import svg_files, svg_raster_layer
+
+#===============================================================================
+
+# As used before tiling workers were pooled
+REFERENCE_BATCH_SIZE = 1024
+IDLE_TIMEOUT = 0.00001
+
+#===============================================================================
+
+def _reference_extract_tiles(tiles: list, tile_extractor: SVGTiler, image_queue):
+#================================================================================
+    for tile in tiles:
+        tile_image = tile_extractor.get_tile(tile)
+        if tile_image is not None:
+            alpha_image = add_alpha(tile_image)
+            if not_empty(alpha_image):
+                image_queue.put((tile.x, tile.y, alpha_image))
+
+def reference_make_tiles(tile_extractor: SVGTiler, tiles: list, mbtiles: MBTiles, zoom: int):
+#============================================================================================
+    tile_processes = {}
+    running = True
+    ending = False
+    image_queue = mp.Queue()                                                # pyright: ignore[reportAttributeAccessIssue]
+    tile_pos = 0
+    while running:
+        while not ending and len(tile_processes) < MAX_TILE_PROCESSES:
+            if tile_pos < len(tiles):
+                batch = tiles[tile_pos:tile_pos + REFERENCE_BATCH_SIZE]
+                tile_process = mp.Process(target=_reference_extract_tiles,  # pyright: ignore[reportAttributeAccessIssue]
+                                          args=(batch, tile_extractor, image_queue))
+                tile_process.start()
+                tile_processes[tile_process.sentinel] = tile_process
+                tile_pos += len(batch)
+            else:
+                ending = True
+        try:
+            (x, y, image) = image_queue.get(block=False)
+            mbtiles.save_tile(zoom, x, y, cv2.imencode('.png', image)[1].tobytes())
+        except queue.Empty:
+            pass
+        if len(tile_processes) > 0:
+            for process in mp_connection.wait(tile_processes.keys(), IDLE_TIMEOUT):
+                tile_processes[process].join()
+                tile_processes.pop(process)
+        if ending:
+            running = len(tile_processes) > 0 or not image_queue.empty()
+        time.sleep(IDLE_TIMEOUT)
+    image_queue.close()
+    image_queue.join_thread()
+
+def pool_make_tiles(tile_extractor: SVGTiler, tiles: list, mbtiles: MBTiles, zoom: int):
+#=======================================================================================
+    chunk_size = max(1, min(TILE_CHUNK_SIZE, len(tiles)//(4*MAX_TILE_PROCESSES)))
+    with mp.Pool(MAX_TILE_PROCESSES, initializer=_init_tile_worker,         # pyright: ignore[reportAttributeAccessIssue]
+                                     initargs=(tile_extractor, TileEncoding())) as pool:
+        for (_, _, made_tiles) in pool.imap_unordered(_make_tiles, itertools.batched(tiles, chunk_size)):
+            for (x, y, tile_data) in made_tiles:
+                if tile_data is not None:
+                    mbtiles.save_tile(zoom, x, y, tile_data)
+
+#===============================================================================
+
+def measure(make_tiles, tile_extractor: SVGTiler, tiles: list, zoom: int, directory: str) -> tuple[float, float, int]:
+#====================================================================================================================
+    database_path = os.path.join(directory, 'benchmark.mbtiles')
+    mbtiles = MBTiles(database_path, True, True)
+    start_time = time.perf_counter()
+    start_cpu = time.process_time()
+    make_tiles(tile_extractor, tiles, mbtiles, zoom)
+    mbtiles.flush()
+    cpu_seconds = time.process_time() - start_cpu
+    seconds = time.perf_counter() - start_time
+    saved = mbtiles.execute(f'select count(*) from tiles where zoom_level={zoom};').fetchone()[0]
+    mbtiles.close()
+    return (len(tiles)/seconds, cpu_seconds, saved)
+
+#===============================================================================
+
+def main():
+#==========
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark making raster tiles of the SVG files in `tests/svg-raster`.')
+    parser.add_argument('--zoom', type=int, default=8, help='Zoom level of the tiles to make')
+    args = parser.parse_args()
+
+    print(f'{MAX_TILE_PROCESSES} tiling processes')
+    print(f'{"":24} {"":>6} {"process per batch":>24} {"worker pool":>24}')
+    print(f'{"":24} {"tiles":>6} {"tiles/s":>10} {"parent CPU s":>13} {"tiles/s":>10} {"parent CPU s":>13}')
+    with tempfile.TemporaryDirectory() as directory:
+        for svg_file in svg_files():
+            with open(svg_file, 'rb') as fp:
+                layer = svg_raster_layer(fp.read())
+            tile_set = TileSet(layer.extent, args.zoom)
+            tile_extractor = SVGTiler(layer, tile_set)          # type: ignore
+            tiles = list(tile_set)
+            results = [measure(make_tiles, tile_extractor, tiles, args.zoom, directory)
+                        for make_tiles in [reference_make_tiles, pool_make_tiles]]
+            assert results[0][2] == results[1][2]
+            print(f'{os.path.basename(svg_file):24} {len(tiles):6} '
+                + ' '.join(f'{rate:10.1f} {cpu_seconds:13.2f}' for (rate, cpu_seconds, _) in results))
+
+#===============================================================================
+
+if __name__ == '__main__':
+    main()
+
+#===============================================================================
@@ -0,0 +1,116 @@
+#===============================================================================
+#
+#  Time taken to draw the tiles of a large SVG layer.
+#
+#  Makes a synthetic SVG with many short paths, in groups, and draws its tiles
+#  at a zoom level by walking the drawing tree for each tile, as was done before
+#  a layer's drawing was recorded, with large groups only visiting the objects
+#  their spatial index finds in the tile, and by replaying the recorded picture
+#  of the drawing, where skia's R-tree of drawing operations culls those outside
+#  of a tile.
+#
+#===============================================================================
+
+import time
+
+#===============================================================================
+
+import numpy as np
+import shapely
+import skia
+
+#===============================================================================
+
+from mapmaker.output.tilemaker import TileSet
+from mapmaker.sources.svg.rasteriser import SVGRasteriser
+
+from tiling import svg_raster_layer
+
+#===============================================================================
+
+SVG_SIZE = 10000
+
+def synthetic_svg(paths: int, group_size: int) -> bytes:
+#=======================================================
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(0, SVG_SIZE, (paths, 2))
+    steps = rng.uniform(-20, 20, (paths, 3, 2))
+    colours = rng.integers(0, 0x1000000, paths)
+    elements = []
+    for group in range(0, paths, group_size):
+        elements.append('<g>')
+        for n in range(group, min(group + group_size, paths)):
+            points = np.cumsum(np.vstack((starts[n:n+1], steps[n])), axis=0)
+            elements.append(f'<path d="M{" L".join(f"{x:.1f} {y:.1f}" for (x, y) in points)}" '
+                            f'fill="none" stroke="#{colours[n]:06x}" stroke-width="2"/>')
+        elements.append('</g>')
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {SVG_SIZE} {SVG_SIZE}">'
+          + ''.join(elements) + '</svg>').encode()
+
+#===============================================================================
+
+def draw_tile(rasteriser: SVGRasteriser, picture: skia.Picture, tile_size: tuple[int, int],
+              origin: tuple[float, float], replay: bool) -> np.ndarray:
+#===============================================================================
+    surface = skia.Surface(*tile_size)
+    canvas = surface.getCanvas()
+    canvas.clear(skia.Color4f(0xFFFFFFFF))
+    canvas.translate(-origin[0], -origin[1])
+    if replay:
+        canvas.drawPicture(picture)
+    else:
+        rasteriser.draw_element(canvas, shapely.box(origin[0], origin[1],
+                                                    origin[0] + tile_size[0], origin[1] + tile_size[1]))
+    return surface.makeImageSnapshot().toarray(colorType=skia.kBGRA_8888_ColorType)
+
+#===============================================================================
+
+def main():
+#==========
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark drawing the tiles of a synthetic SVG with many paths.')
+    parser.add_argument('--paths', type=int, default=100000, help='Number of paths in the SVG')
+    parser.add_argument('--group-size', dest='group_size', type=int, default=1000, help='Number of paths in each group')
+    parser.add_argument('--zoom', type=int, default=8, help='Zoom level of the tiles to draw')
+    args = parser.parse_args()
+
+    svg_data = synthetic_svg(args.paths, args.group_size)
+    tile_set = TileSet(svg_raster_layer(svg_data).extent, args.zoom)
+    pixel_rect = tile_set.pixel_rect
+    (tile_width, tile_height) = tile_set.tile_size
+
+    start_time = time.perf_counter()
+    rasteriser = SVGRasteriser(svg_data, (pixel_rect.width, pixel_rect.height))
+    rasteriser.render()
+    render_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    picture = rasteriser.get_picture()
+    record_seconds = time.perf_counter() - start_time
+    assert picture is not None
+    print(f'{args.paths} paths, {len(tile_set)} tiles at zoom {args.zoom}: '
+          f'drawing tree made in {render_seconds:.2f} s, picture recorded in {record_seconds:.2f} s')
+
+    # Tile origins in rendered SVG pixels
+    (x0, y0) = tile_set.start_coords
+    origins = [((tile.x - x0)*tile_width - pixel_rect[0], (tile.y - y0)*tile_height - pixel_rect[1])
+                for tile in tile_set]
+    seconds = {False: 0.0, True: 0.0}
+    difference = 0
+    for origin in origins:
+        tiles = {}
+        for replay in [False, True]:
+            start_time = time.perf_counter()
+            tiles[replay] = draw_tile(rasteriser, picture, (tile_width, tile_height), origin, replay)
+            seconds[replay] += time.perf_counter() - start_time
+        difference = max(difference, int(np.abs(tiles[False].astype(int) - tiles[True]).max()))
+    for (name, replay) in [('Walk drawing tree', False), ('Replay picture', True)]:
+        print(f'{name:18} {1000*seconds[replay]/len(origins):8.1f} ms/tile')
+    print(f'Maximum difference between tiles: {difference}')
+
+#===============================================================================
+
+if __name__ == '__main__':
+    main()
+
+#===============================================================================
@@ -0,0 +1,73 @@
+#===============================================================================
+#
+#  Check that drawing part of an SVG, with large groups only visiting the
+#  objects that their spatial index finds there, gives the same image as
+#  drawing it by visiting every object.
+#
+#  Run with ``pytest tests/svg-raster``.
+#
+#===============================================================================
+
+import numpy as np
+import shapely
+import skia
+
+#===============================================================================
+
+import mapmaker.sources.svg.rasteriser as rasteriser_module
+from mapmaker.sources.svg.rasteriser import CanvasDrawingObject, SVGRasteriser
+
+#===============================================================================
+
+SIZE = 512
+
+def grid_svg(spacing: int=16) -> bytes:
+    # A group of squares with differing colours, and one path with a stroke
+    # that is wider than its spacing
+    squares = [f'<rect x="{x}" y="{y}" width="{spacing//2}" height="{spacing//2}" '
+               f'fill="#{(7*x) % 256:02x}{(11*y) % 256:02x}80"/>'
+                for x in range(0, SIZE, spacing) for y in range(0, SIZE, spacing)]
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{SIZE}" height="{SIZE}"><g>'
+          + ''.join(squares)
+          + '<path d="M 100 100 L 400 120" stroke="#000000" stroke-width="40" fill="none"/>'
+          + '</g></svg>').encode()
+
+def draw_regions(regions: list[tuple[int, int, int, int]], monkeypatch) -> list[tuple[int, np.ndarray]]:
+    # The number of objects visited when drawing each region, and its image
+    rasteriser = SVGRasteriser(grid_svg())
+    rasteriser.render()
+    visited = []
+    intersects = CanvasDrawingObject.intersects
+    monkeypatch.setattr(CanvasDrawingObject, 'intersects',
+                        lambda self, bbox: visited.append(self) or intersects(self, bbox))
+    results = []
+    for region in regions:
+        (x0, y0, x1, y1) = region
+        surface = skia.Surface(x1 - x0, y1 - y0)
+        canvas = surface.getCanvas()
+        canvas.clear(skia.Color4f(0xFFFFFFFF))
+        canvas.translate(-x0, -y0)
+        visited.clear()
+        rasteriser.draw_element(canvas, shapely.box(*region))
+        results.append((len(visited), surface.makeImageSnapshot().toarray(colorType=skia.kBGRA_8888_ColorType)))
+    monkeypatch.setattr(CanvasDrawingObject, 'intersects', intersects)
+    return results
+
+#===============================================================================
+
+def test_region(monkeypatch):
+    objects = (SIZE//16)**2 + 1
+    regions = [(0, 0, 128, 128), (96, 96, 200, 200), (300, 110, 420, 130), (0, 0, SIZE, SIZE)]
+    indexed = draw_regions(regions, monkeypatch)
+    monkeypatch.setattr(rasteriser_module, 'SPATIAL_INDEX_MIN_OBJECTS', objects + 1)
+    walked = draw_regions(regions, monkeypatch)
+    for ((indexed_visits, indexed_image), (walked_visits, walked_image)) in zip(indexed, walked):
+        assert np.array_equal(indexed_image, walked_image)
+        # Every object, along with the group and the SVG, is visited without an index
+        assert walked_visits == objects + 2
+    # Only objects in part of the drawing are visited, and the index isn't used
+    # for the whole drawing
+    assert all(visits < objects//4 for (visits, _) in indexed[:-1])
+    assert indexed[-1][0] == objects + 2
+
+#===============================================================================
@@ -0,0 +1,113 @@
+#===============================================================================
+#
+#  Check that tiling a raster layer that is interrupted part way through, and
+#  then resumed, results in the same tiles as tiling without interruption.
+#
+#  Run with ``pytest tests/svg-raster``.
+#
+#===============================================================================
+
+import os
+import signal
+import sqlite3
+import time
+
+#===============================================================================
+
+from mapmaker.maker import _interrupted_tiling
+from mapmaker.output.mbtiles import has_progress
+from mapmaker.output.tile_encoding import TileEncoding
+from mapmaker.output.tilemaker import _init_tile_worker, _make_tiles, RasterTileMaker, TileSet
+from mapmaker.sources.svg.rasteriser import SVGTiler
+
+from tiling import svg_raster_layer
+
+#===============================================================================
+
+MAX_ZOOM = 9
+
+# Progress is saved in batches of this many tiles
+MIN_PROGRESS = 512
+
+#===============================================================================
+
+def dense_svg(size: int=1000, spacing: int=20) -> bytes:
+    # Circles of differing colours, so that no tile is blank or a single colour
+    circles = []
+    for (n, x) in enumerate(range(spacing//2, size, spacing)):
+        for (m, y) in enumerate(range(spacing//2, size, spacing)):
+            circles.append(f'<circle cx="{x}" cy="{y}" r="{spacing//3}" fill="#{(37*n) % 256:02x}{(53*m) % 256:02x}80"/>')
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}">'
+          + ''.join(circles) + '</svg>').encode()
+
+def made_count(database_path: str) -> int:
+    try:
+        connection = sqlite3.connect(database_path)
+        try:
+            return connection.execute('select count(*) from progress where zoom_level=?;',
+                                      (MAX_ZOOM, )).fetchone()[0]
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return 0
+
+def tiles_and_metadata(database_path: str) -> tuple[list, list]:
+    connection = sqlite3.connect(database_path)
+    try:
+        tiles = connection.execute("""select zoom_level, tile_column, tile_row, tile_data from tiles
+                                        order by zoom_level, tile_column, tile_row;""").fetchall()
+        metadata = connection.execute('select name, value from metadata order by name;').fetchall()
+        return (tiles, metadata)
+    finally:
+        connection.close()
+
+def make_tiles(layer, output_dir: str) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    process = RasterTileMaker(layer, output_dir, MAX_ZOOM).make_tiles()     # type: ignore
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    return os.path.join(output_dir, f'{layer.id}.mbtiles')
+
+#===============================================================================
+
+def test_blank_tiles_made():
+    # Blank tiles are returned without data, so that they are recorded as made
+    layer = svg_raster_layer(b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 1000 1000">'
+                             b'<circle cx="10" cy="10" r="5" fill="red"/></svg>')
+    tile_set = TileSet(layer.extent, 6)
+    _init_tile_worker(SVGTiler(layer, tile_set), TileEncoding())       # type: ignore
+    tiles = tuple(tile_set)
+    (count, shard_path, made_tiles) = _make_tiles(tiles)
+    assert count == len(tiles) and shard_path is None
+    assert sorted((x, y) for (x, y, _) in made_tiles) == sorted((tile.x, tile.y) for tile in tiles)
+    assert [(x, y) for (x, y, tile_data) in made_tiles if tile_data is not None] == [(tiles[0].x, tiles[0].y)]
+
+def test_resume(tmp_path):
+    layer = svg_raster_layer(dense_svg())
+    complete_path = make_tiles(layer, str(tmp_path/'complete'))
+
+    # Interrupt tiling once some progress has been saved, as Ctrl-C would
+    resumed_dir = str(tmp_path/'resumed')
+    os.makedirs(resumed_dir)
+    resumed_path = os.path.join(resumed_dir, f'{layer.id}.mbtiles')
+    process = RasterTileMaker(layer, resumed_dir, MAX_ZOOM).make_tiles()   # type: ignore
+    process.start()
+    while process.is_alive() and made_count(resumed_path) < MIN_PROGRESS:
+        time.sleep(0.05)
+    assert process.is_alive(), 'Tiling finished before it could be interrupted'
+    os.kill(process.pid, signal.SIGINT)
+    process.join()
+    assert has_progress(resumed_path)
+    # Only interrupted tiling lets a map's making be resumed
+    assert _interrupted_tiling(resumed_dir)
+    assert not _interrupted_tiling(str(tmp_path/'complete'))
+    made = made_count(resumed_path)
+    assert MIN_PROGRESS <= made < 1024
+
+    assert make_tiles(layer, resumed_dir) == resumed_path
+    assert not has_progress(resumed_path)
+    assert not _interrupted_tiling(resumed_dir)
+    assert tiles_and_metadata(resumed_path) == tiles_and_metadata(complete_path)
+
+#===============================================================================
@@ -0,0 +1,67 @@
+#===============================================================================
+#
+#  Check that tiling a raster layer with each worker saving its tiles in a
+#  shard database results in the same tiles as tiling without shards, and
+#  that no shards are left.
+#
+#  Run with ``pytest tests/svg-raster``.
+#
+#===============================================================================
+
+import glob
+import os
+import sqlite3
+
+#===============================================================================
+
+from mapmaker.output.tilemaker import RasterTileMaker
+from mapmaker.settings import settings
+
+from tiling import svg_raster_layer
+
+#===============================================================================
+
+MAX_ZOOM = 8
+
+#===============================================================================
+
+def circles_svg(size: int=1000, spacing: int=25) -> bytes:
+    circles = []
+    for (n, x) in enumerate(range(spacing//2, size, spacing)):
+        for (m, y) in enumerate(range(spacing//2, size, spacing)):
+            circles.append(f'<circle cx="{x}" cy="{y}" r="{spacing//3}" fill="#{(37*n) % 256:02x}{(53*m) % 256:02x}80"/>')
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}">'
+          + ''.join(circles) + '</svg>').encode()
+
+def saved_tiles(database_path: str) -> list:
+    connection = sqlite3.connect(database_path)
+    try:
+        return connection.execute("""select zoom_level, tile_column, tile_row, tile_data from tiles
+                                       order by zoom_level, tile_column, tile_row;""").fetchall()
+    finally:
+        connection.close()
+
+def make_tiles(layer, output_dir: str, shards: bool) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    settings['rasterShards'] = shards
+    try:
+        process = RasterTileMaker(layer, output_dir, MAX_ZOOM).make_tiles()     # type: ignore
+        process.start()
+        process.join()
+    finally:
+        settings['rasterShards'] = False
+    assert process.exitcode == 0
+    return os.path.join(output_dir, f'{layer.id}.mbtiles')
+
+#===============================================================================
+
+def test_shards(tmp_path):
+    layer = svg_raster_layer(circles_svg())
+    unsharded_path = make_tiles(layer, str(tmp_path/'unsharded'), False)
+    sharded_path = make_tiles(layer, str(tmp_path/'sharded'), True)
+    # Shards are closed by their workers, merged, and then removed
+    assert glob.glob(f'{glob.escape(sharded_path)}.*') == []
+    assert len(saved_tiles(sharded_path)) > 0
+    assert saved_tiles(sharded_path) == saved_tiles(unsharded_path)
+
+#===============================================================================
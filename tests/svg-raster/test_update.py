@@ -0,0 +1,117 @@
+#===============================================================================
+#
+#  Check that, when an SVG layer has cached tiles from an earlier build, only
+#  the tiles touched by a changed element, and their overview tiles, are made
+#  again, and that the updated tiles are those of a complete build.
+#
+#  Run with ``pytest tests/svg-raster``.
+#
+#===============================================================================
+
+import glob
+import itertools
+import math
+import os
+import sqlite3
+
+#===============================================================================
+
+import mercantile
+
+#===============================================================================
+
+from mapmaker.output.tilemaker import RasterTileMaker, TileSet
+from mapmaker.settings import settings
+from mapmaker.sources.svg.rasteriser import SVGTiler
+
+from tiling import SVG_RASTER_DIR, svg_raster_layer
+
+#===============================================================================
+
+MAX_ZOOM = 8
+
+SVG_FILE = os.path.join(SVG_RASTER_DIR, 'RCL_Circuit.svg')
+
+# The stroke of just one element is changed
+ORIGINAL_ELEMENT = b'stroke="#556677" stroke-width="2"\n            d="M560 216.1406L560 143.8594"'
+CHANGED_ELEMENT = b'stroke="#AA2233" stroke-width="2"\n            d="M560 216.1406L560 143.8594"'
+
+#===============================================================================
+
+def make_tiles(layer, output_dir: str) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    process = RasterTileMaker(layer, output_dir, MAX_ZOOM).make_tiles()     # type: ignore
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    return os.path.join(output_dir, f'{layer.id}.mbtiles')
+
+def saved_tiles(database_path: str) -> dict[str, bytes]:
+    connection = sqlite3.connect(database_path)
+    try:
+        return {mercantile.quadkey(x, (1 << zoom) - 1 - row, zoom): tile_data
+                    for (zoom, x, row, tile_data) in connection.execute(
+                        'select zoom_level, tile_column, tile_row, tile_data from tiles;')}
+    finally:
+        connection.close()
+
+def changed_quadkeys(layer, changed_layer) -> set[str]:
+    # The maximum zoom tiles touched, allowing a pixel for anti-aliasing, by
+    # the changed element, along with their overview tiles
+    tile_set = TileSet(layer.extent, MAX_ZOOM)
+    changed_bounds = [bounds for (record, changed_record) in zip(SVGTiler(layer, tile_set).element_records,   # type: ignore
+                                                                 SVGTiler(changed_layer, tile_set).element_records) # type: ignore
+                        if record != changed_record
+                            for bounds in [record[1], changed_record[1]]]
+    assert len(changed_bounds) == 2
+    (tile_width, tile_height) = tile_set.tile_size
+    (x_origin, y_origin) = tile_set.start_coords
+    tile_coords = set((tile.x, tile.y) for tile in tile_set)
+    quadkeys = set()
+    for (x0, y0, x1, y1) in changed_bounds:
+        for (x, y) in tile_coords.intersection(itertools.product(
+                range(x_origin + math.floor((x0 - 1)/tile_width), x_origin + math.floor((x1 + 1)/tile_width) + 1),
+                range(y_origin + math.floor((y0 - 1)/tile_height), y_origin + math.floor((y1 + 1)/tile_height) + 1))):
+            for zoom in range(layer.min_zoom, MAX_ZOOM + 1):
+                depth = MAX_ZOOM - zoom
+                quadkeys.add(mercantile.quadkey(x >> depth, y >> depth, zoom))
+    return quadkeys
+
+#===============================================================================
+
+def test_update(tmp_path):
+    with open(SVG_FILE, 'rb') as fp:
+        svg_data = fp.read()
+    assert svg_data.count(ORIGINAL_ELEMENT) == 1
+    layer = svg_raster_layer(svg_data)
+    changed_layer = svg_raster_layer(svg_data.replace(ORIGINAL_ELEMENT, CHANGED_ELEMENT))
+
+    # A complete build of the changed SVG, without a cache
+    complete_tiles = saved_tiles(make_tiles(changed_layer, str(tmp_path/'complete')))
+
+    settings['rasterCache'] = str(tmp_path/'cache')
+    try:
+        make_tiles(layer, str(tmp_path/'original'))
+        # Record the tiles that the update writes
+        (cached_path, ) = glob.glob(os.path.join(settings['rasterCache'], '*.mbtiles'))
+        connection = sqlite3.connect(cached_path)
+        connection.executescript("""
+            create table rewritten (zoom_level integer, tile_column integer, tile_row integer);
+            create trigger record_rewritten after insert on map begin
+                insert into rewritten values (new.zoom_level, new.tile_column, new.tile_row);
+            end;""")
+        connection.close()
+        updated_path = make_tiles(changed_layer, str(tmp_path/'updated'))
+    finally:
+        settings.pop('rasterCache')
+
+    connection = sqlite3.connect(updated_path)
+    rewritten = [mercantile.quadkey(x, (1 << zoom) - 1 - row, zoom)
+                    for (zoom, x, row) in connection.execute('select * from rewritten;')]
+    connection.close()
+    assert len(rewritten) == len(set(rewritten))
+    # Blank tiles aren't saved
+    assert set(rewritten) == changed_quadkeys(layer, changed_layer).intersection(complete_tiles)
+    assert saved_tiles(updated_path) == complete_tiles
+
+#===============================================================================
@@ -0,0 +1,65 @@
+#===============================================================================
+#
+#  Raster layers of the SVG files in ``tests/svg-raster``, for testing and
+#  benchmarking the making of raster tiles.
+#
+#===============================================================================
+
+import os
+from types import SimpleNamespace
+from typing import Optional
+
+#===============================================================================
+
+import lxml.etree as etree
+
+#===============================================================================
+
+from mapmaker.geometry import bounds_to_extent
+from mapmaker.output.tile_encoding import TileEncoding
+from mapmaker.settings import MAP_KIND
+from mapmaker.sources.svg import world_meters_per_pixel
+from mapmaker.sources.svg.utils import length_as_pixels
+
+#===============================================================================
+
+SVG_RASTER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+#===============================================================================
+
+def svg_files() -> list[str]:
+#============================
+    return sorted(os.path.join(SVG_RASTER_DIR, name) for name in os.listdir(SVG_RASTER_DIR)
+                    if name.endswith('.svg'))
+
+def svg_raster_layer(svg_data: bytes, layer_id: str='svg-raster', min_zoom: int=2,
+                     tile_encoding: Optional[TileEncoding]=None) -> SimpleNamespace:
+#==================================================================================
+    """
+    A raster layer of an SVG base map, placed as an ``SVGSource`` places it, with
+    just the attributes used when making the layer's tiles.
+    """
+    svg = etree.fromstring(svg_data)
+    if 'viewBox' in svg.attrib:
+        (width, height) = tuple(float(x) for x in svg.attrib['viewBox'].split()[2:])
+    else:
+        width = length_as_pixels(svg.attrib.get('width'))
+        height = length_as_pixels(svg.attrib.get('height'))
+    assert width is not None and height is not None
+    metres_per_pixel = world_meters_per_pixel(width, height)
+    (half_width, half_height) = (metres_per_pixel*width/2, metres_per_pixel*height/2)
+    return SimpleNamespace(
+        id=layer_id,
+        boundary_geometry=None,
+        extent=bounds_to_extent((-half_width, -half_height, half_width, half_height)),
+        flatmap=SimpleNamespace(map_kind=MAP_KIND.ANATOMICAL),
+        local_world_to_base=None,
+        map_source=SimpleNamespace(kind='base', base_feature=None, metres_per_pixel=metres_per_pixel),
+        min_zoom=min_zoom,
+        source_data=svg_data,
+        source_kind='svg',
+        source_path=None,
+        tile_encoding=tile_encoding if tile_encoding is not None else TileEncoding()
+    )
+
+#===============================================================================
@@ -0,0 +1,122 @@
+#===============================================================================
+#
+#  Peak memory used when reading a very large SVG source.
+#
+#  Makes a synthetic SVG of a given size, with layers of paths that use
+#  shared definitions, then, in separate processes, visits all of its
+#  elements after parsing the whole document, and layer by layer when
+#  streaming, reporting each process's time and peak resident set size.
+#
+#===============================================================================
+
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+#===============================================================================
+
+import lxml.etree as etree
+
+#===============================================================================
+
+from mapmaker.sources.svg.streaming import stream_svg_layers, svg_skeleton
+from mapmaker.sources.svg.utils import SVG_TAG, XLINK_HREF
+from mapmaker.utils import FilePath
+
+#===============================================================================
+
+PATHS_PER_LAYER = 20000
+
+def make_svg(svg_file: str, size_mb: int):
+#=========================================
+    random.seed(0)
+    target_size = size_mb*1024*1024
+    with open(svg_file, 'w') as fp:
+        fp.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        fp.write('<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" viewBox="0 0 100000 100000">\n')
+        fp.write('<style>.organ { fill: #F00; stroke: none }</style>\n')
+        fp.write('<defs><path id="marker" d="M0 0 L10 0 L10 10 Z"/></defs>\n')
+        layer = 0
+        while fp.tell() < target_size:
+            fp.write(f'<g id="layer-{layer}">\n')
+            for n in range(PATHS_PER_LAYER):
+                if n % 100 == 0:
+                    fp.write(f'<use xlink:href="#marker" x="{random.uniform(0, 100000):.1f}" y="{random.uniform(0, 100000):.1f}"/>\n')
+                else:
+                    (x, y) = (random.uniform(0, 100000), random.uniform(0, 100000))
+                    fp.write(f'<path id="L{layer}_{n}" class="organ" d="M{x:.2f} {y:.2f} '
+                           + ' '.join(f'C{x+10:.2f} {y+20:.2f} {x+30:.2f} {y-5:.2f} {x+40:.2f} {y+n%7:.2f}'
+                                        for _ in range(8)) + ' Z"><title>.id(P{layer}_{n})</title></path>\n')
+            fp.write('</g>\n')
+            layer += 1
+        fp.write('</svg>\n')
+
+#===============================================================================
+
+def count_elements(layer: etree.Element, definitions: set[str]) -> tuple[int, int]:
+#==================================================================================
+    elements = 0
+    uses = 0
+    for element in layer.iter(SVG_TAG('path'), SVG_TAG('use')):
+        elements += 1
+        if element.tag == SVG_TAG('use') and element.attrib.get(XLINK_HREF, '')[1:] in definitions:
+            uses += 1
+    return (elements, uses)
+
+def read_svg(svg_file: str, mode: str):
+#======================================
+    start_time = time.perf_counter()
+    elements = 0
+    uses = 0
+    if mode == 'parse':
+        root = etree.parse(svg_file, parser=etree.XMLParser(huge_tree=True)).getroot()
+        definitions = set(e.attrib['id'] for e in root.iterfind(f'.//{SVG_TAG('defs')}/*[@id]'))
+        for layer in root:
+            (n, u) = count_elements(layer, definitions)
+            elements += n
+            uses += u
+    else:
+        path = FilePath(os.path.abspath(svg_file))
+        skeleton = svg_skeleton(path)
+        definitions = set(e.attrib['id'] for e in skeleton.iterfind(f'{SVG_TAG('defs')}/*[@id]'))
+        for layer in stream_svg_layers(path):
+            (n, u) = count_elements(layer, definitions)
+            elements += n
+            uses += u
+    seconds = time.perf_counter() - start_time
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+    print(f'{mode.capitalize():7} {seconds:7.1f} s, peak RSS {peak_rss:8.0f} MB, {elements} elements, {uses} uses resolved')
+
+#===============================================================================
+
+def main():
+#==========
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure peak memory when parsing and streaming a large SVG file.')
+    parser.add_argument('--size', type=int, default=500, help='Size of the synthetic SVG, in MB')
+    parser.add_argument('--mode', choices=['parse', 'stream'], help=argparse.SUPPRESS)
+    parser.add_argument('svg_file', nargs='?', help='An existing SVG file to use')
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        read_svg(args.svg_file, args.mode)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        if (svg_file := args.svg_file) is None:
+            svg_file = os.path.join(directory, 'large.svg')
+            make_svg(svg_file, args.size)
+        print(f'{svg_file}: {os.path.getsize(svg_file)/(1024*1024):.0f} MB')
+        for mode in ['parse', 'stream']:
+            subprocess.run([sys.executable, __file__, '--mode', mode, svg_file], check=True)
+
+#===============================================================================
+
+if __name__ == '__main__':
+    main()
+
+#===============================================================================
@@ -0,0 +1,112 @@
+#===============================================================================
+#
+#  Time taken to encode raster tiles, and the size of the tiles' mbtiles
+#  database, with each tile encoding.
+#
+#  Tiles are cut from the microscope image of ``tests/vagus`` and made from an
+#  SVG background (by default that of ``tests/keast``), whose flat colours
+#  favour different encodings than the image's.
+#
+#===============================================================================
+
+import os
+import sys
+import tempfile
+import time
+
+#===============================================================================
+
+import cv2
+import numpy as np
+
+#===============================================================================
+
+from mapmaker.output.mbtiles import MBTiles
+from mapmaker.output.tile_encoding import TILE_ENCODINGS, TileEncoding
+from mapmaker.output.tilemaker import TileSet
+from mapmaker.sources import add_alpha, not_empty
+from mapmaker.sources.svg.rasteriser import SVGTiler
+
+TESTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(TESTS_DIR, 'svg-raster'))
+
+from tiling import svg_raster_layer
+
+#===============================================================================
+
+VAGUS_IMAGE = os.path.join(TESTS_DIR, 'vagus', 'sub-10sam-1P10-1Slide2p3MT10x.jp2')
+SVG_BACKGROUND = os.path.join(TESTS_DIR, 'keast', 'rat-bladder.svg')
+
+TILE_SIZE = 256
+
+#===============================================================================
+
+def image_tiles(image_file: str) -> list[np.ndarray]:
+#=====================================================
+    image = cv2.imread(image_file, cv2.IMREAD_UNCHANGED)
+    if image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    tiles = []
+    for y in range(0, image.shape[0] - TILE_SIZE + 1, TILE_SIZE):
+        for x in range(0, image.shape[1] - TILE_SIZE + 1, TILE_SIZE):
+            tile = add_alpha(image[y:y+TILE_SIZE, x:x+TILE_SIZE])
+            if not_empty(tile):
+                tiles.append(tile)
+    return tiles
+
+def svg_tiles(svg_file: str, zoom: int) -> list[np.ndarray]:
+#===========================================================
+    with open(svg_file, 'rb') as fp:
+        layer = svg_raster_layer(fp.read())
+    tile_set = TileSet(layer.extent, zoom)
+    tile_extractor = SVGTiler(layer, tile_set)          # type: ignore
+    tiles = []
+    for tile in tile_set:
+        if (tile_image := tile_extractor.get_tile(tile)) is not None:
+            alpha_image = add_alpha(tile_image)
+            if not_empty(alpha_image):
+                tiles.append(alpha_image)
+    return tiles
+
+#===============================================================================
+
+def measure(tiles: list[np.ndarray], tile_encoding: TileEncoding, directory: str) -> tuple[float, float]:
+#=======================================================================================================
+    start_time = time.perf_counter()
+    encoded = [tile_encoding.encode(tile) for tile in tiles]
+    seconds = time.perf_counter() - start_time
+    database_path = os.path.join(directory, f'{tile_encoding.encoding}.mbtiles')
+    mbtiles = MBTiles(database_path, True, True, silent=True)
+    for (n, tile_data) in enumerate(encoded):
+        mbtiles.save_tile(0, n % 1024, n//1024, tile_data)
+    mbtiles.close()
+    return (1000*seconds/len(tiles), os.path.getsize(database_path)/(1024*1024))
+
+#===============================================================================
+
+def main():
+#==========
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark encoding raster tiles with each tile encoding.')
+    parser.add_argument('--svg', default=SVG_BACKGROUND, help='SVG background to make tiles of')
+    parser.add_argument('--zoom', type=int, default=9, help="Zoom level of the SVG background's tiles")
+    parser.add_argument('--quality', type=int, default=TileEncoding().quality, help='Quality of lossy encodings')
+    args = parser.parse_args()
+
+    sources = [('vagus image', image_tiles(VAGUS_IMAGE)),
+               (os.path.basename(args.svg), svg_tiles(args.svg, args.zoom))]
+    with tempfile.TemporaryDirectory() as directory:
+        for (name, tiles) in sources:
+            print(f'{name}: {len(tiles)} tiles')
+            print(f'    {"encoding":14} {"ms/tile":>8} {"MB":>8}')
+            for encoding in TILE_ENCODINGS:
+                (milliseconds, size) = measure(tiles, TileEncoding(encoding, args.quality), directory)
+                print(f'    {encoding:14} {milliseconds:8.2f} {size:8.2f}')
+
+#===============================================================================
+
+if __name__ == '__main__':
+    main()
+
+#===============================================================================
@@ -0,0 +1,54 @@
+#===============================================================================
+#
+#  Check that raster tiles decode to the images they were encoded from, and
+#  that encodings described by a source default to the map's encoding.
+#
+#  Run with ``pytest tests/tile-encoding``.
+#
+#===============================================================================
+
+import cv2
+import numpy as np
+
+#===============================================================================
+
+from mapmaker.output.tile_encoding import TileEncoding
+
+#===============================================================================
+
+def decode(tile_data: bytes) -> np.ndarray:
+    return cv2.imdecode(np.frombuffer(tile_data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+
+#===============================================================================
+
+def test_png8_alpha():
+    # An opaque band above a band fading to transparent, with few enough
+    # colours to be encoded without loss
+    image = np.zeros((256, 256, 4), dtype=np.uint8)
+    image[:128, :] = [10, 200, 30, 255]
+    image[128:, :, :3] = [200, 20, 30]
+    image[128:, :128, 3] = 2*np.arange(128, dtype=np.uint8)
+    tile = decode(TileEncoding('png8').encode(image))
+    visible = image[:, :, 3] != 0
+    assert np.array_equal(tile[visible], image[visible])
+    assert np.all(tile[~visible, 3] == 0)
+
+def test_png8_quantised():
+    image = np.random.default_rng(0).integers(0, 256, (256, 256, 4), dtype=np.uint8)
+    image[:16, :, 3] = 255
+    tile = decode(TileEncoding('png8').encode(image))
+    visible = image[:, :, 3] != 0
+    # Random RGBA needs to be reduced to one bit a channel
+    assert np.abs(tile[visible].astype(int) - image[visible]).max() <= 64
+    assert np.all(tile[:16, :, 3] == 255)
+    assert np.all(tile[~visible, 3] == 0)
+
+def test_description_defaults():
+    default = TileEncoding('webp', 60)
+    assert TileEncoding.from_description(None, default) == default
+    assert TileEncoding.from_description('jpeg', default) == TileEncoding('jpeg', 60)
+    assert TileEncoding.from_description({'quality': 90}, default) == TileEncoding('webp', 90)
+    assert TileEncoding.from_description({'format': 'png8'}, default) == TileEncoding('png8', 60)
+    assert TileEncoding.from_description({}) == TileEncoding()
+
+#===============================================================================
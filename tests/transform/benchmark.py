@@ -0,0 +1,115 @@
+#===============================================================================
+#
+#  Throughput of transforming points and geometries.
+#
+#  Times ``Transform`` with an affine matrix, which takes the fast path, and
+#  with a perspective matrix, as used to place detail layers, against numpy
+#  matrix products for points and compositions, and ``shapely.affinity`` for
+#  geometries, as used before there was an affine path.
+#
+#===============================================================================
+
+import math
+import time
+from typing import Callable
+
+#===============================================================================
+
+import numpy as np
+import shapely
+import shapely.affinity
+from shapely.geometry.base import BaseGeometry
+
+#===============================================================================
+
+from mapmaker.geometry import Transform
+
+#===============================================================================
+
+AFFINE = [[1000.0,   200.0,  100.0],
+          [   0.0, -1000.0,  -50.0],
+          [   0.0,     0.0,    1.0]]
+
+PERSPECTIVE = [[1000.0,   200.0,  100.0],
+               [   0.0, -1000.0,  -50.0],
+               [  1e-6,    2e-6,    1.0]]
+
+#===============================================================================
+
+def reference_compose(matrix: np.ndarray, other: np.ndarray) -> np.ndarray:
+    product = matrix@np.array(other)
+    np.concatenate((product[0, 0:2], product[1, 0:2], product[0:2, 2]), axis=None).tolist()
+    return product
+
+def reference_transform_point(matrix: np.ndarray, point) -> tuple[float, float]:
+    return tuple(matrix@[point[0], point[1], 1.0])[:2]
+
+def reference_transform_geometry(matrix: np.ndarray, geometry: BaseGeometry) -> BaseGeometry:
+    return shapely.affinity.affine_transform(geometry, np.concatenate((matrix[0, 0:2],
+                                                                       matrix[1, 0:2],
+                                                                       matrix[0:2, 2]), axis=None).tolist())
+
+#===============================================================================
+
+def make_polygons(count: int, vertices: int) -> list[BaseGeometry]:
+#==================================================================
+    rng = np.random.default_rng(0)
+    polygons = []
+    for centre in rng.uniform(0, 1000, (count, 2)):
+        angles = np.sort(rng.uniform(0, 2*math.pi, vertices))
+        radii = rng.uniform(5, 10, vertices)
+        polygons.append(shapely.Polygon(np.column_stack((centre[0] + radii*np.cos(angles),
+                                                         centre[1] + radii*np.sin(angles)))))
+    return polygons
+
+def rate(operation: Callable, items: list, repeats: int) -> float:
+#=================================================================
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for item in items:
+            operation(item)
+        best = min(best, time.perf_counter() - start)
+    return len(items)/best
+
+#===============================================================================
+
+def main():
+#==========
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark point and geometry transforms.')
+    parser.add_argument('--points', type=int, default=100000, help='Number of points to transform')
+    parser.add_argument('--polygons', type=int, default=5000, help='Number of polygons to transform')
+    parser.add_argument('--vertices', type=int, default=100, help='Vertices per polygon')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of timed runs; the best is reported')
+    args = parser.parse_args()
+
+    points = np.random.default_rng(0).uniform(0, 1000, (args.points, 2)).tolist()
+    polygons = make_polygons(args.polygons, args.vertices)
+    affine = Transform(AFFINE)
+    perspective = Transform(PERSPECTIVE)
+    matrix = np.array(AFFINE)
+
+    print(f'{"":24} {"points/s":>12} {"compositions/s":>15} {"geometries/s":>13}')
+    print(f'{"numpy, shapely.affinity":24} '
+          f'{rate(lambda p: reference_transform_point(matrix, p), points, args.repeats):12.0f} '
+          f'{rate(lambda p: reference_compose(matrix, matrix), points, args.repeats):15.0f} '
+          f'{rate(lambda g: reference_transform_geometry(matrix, g), polygons, args.repeats):13.0f}')
+    for (name, transform) in [('Affine', affine), ('Perspective', perspective)]:
+        print(f'{name:24} '
+              f'{rate(transform.transform_point, points, args.repeats):12.0f} '
+              f'{rate(lambda p: transform@transform, points, args.repeats):15.0f} '
+              f'{rate(transform.transform_geometry, polygons, args.repeats):13.0f}')
+
+    max_difference = max(shapely.hausdorff_distance(affine.transform_geometry(polygon),
+                                                    reference_transform_geometry(matrix, polygon))
+                            for polygon in polygons)
+    print(f'Largest difference between affine and reference geometries: {max_difference:.3g}')
+
+#===============================================================================
+
+if __name__ == '__main__':
+    main()
+
+#===============================================================================
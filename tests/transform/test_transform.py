@@ -0,0 +1,61 @@
+#===============================================================================
+#
+#  Check that transforming points and geometries gives the results of
+#  ``shapely.affinity`` and numpy matrix products, as used before there was
+#  an affine fast path.
+#
+#  Run with ``pytest tests/transform``.
+#
+#===============================================================================
+
+import numpy as np
+import shapely
+import shapely.affinity
+
+#===============================================================================
+
+from mapmaker.geometry import Transform
+
+#===============================================================================
+
+AFFINE = [[2.0, 1.0, 5.0],
+          [0.0, 3.0, 7.0],
+          [0.0, 0.0, 1.0]]
+
+PERSPECTIVE = [[2.0,  1.0, 5.0],
+               [0.0,  3.0, 7.0],
+               [0.01, 0.02, 1.0]]
+
+#===============================================================================
+
+def shapely_coefficients(matrix: np.ndarray) -> list[float]:
+    return [matrix[0, 0], matrix[0, 1], matrix[1, 0], matrix[1, 1], matrix[0, 2], matrix[1, 2]]
+
+#===============================================================================
+
+def test_z_kept():
+    transform = Transform(AFFINE)
+    coefficients = shapely_coefficients(np.array(AFFINE))
+    for geometry in [shapely.Point(1, 2, 3),
+                     shapely.LineString([(0, 0, 1), (1, 1, 2)]),
+                     shapely.Polygon([(1, 2, 4), (3, 4, 5), (5, 0, 6)]),
+                     shapely.Polygon([(1, 2), (3, 4), (5, 0)])]:
+        transformed = transform.transform_geometry(geometry)
+        assert transformed.has_z == geometry.has_z
+        assert shapely.equals_exact(transformed, shapely.affinity.affine_transform(geometry, coefficients), 1e-9)
+        if geometry.has_z:
+            assert np.array_equal(shapely.get_coordinates(transformed, include_z=True)[:, 2],
+                                  shapely.get_coordinates(geometry, include_z=True)[:, 2])
+
+def test_perspective():
+    # Perspective terms are ignored when transforming points and geometries
+    transform = Transform(PERSPECTIVE)
+    matrix = np.array(PERSPECTIVE)
+    assert not transform.is_affine
+    polygon = shapely.Polygon([(1, 2), (30, 4), (5, 60)])
+    assert shapely.equals_exact(transform.transform_geometry(polygon),
+                                shapely.affinity.affine_transform(polygon, shapely_coefficients(matrix)), 1e-9)
+    for point in shapely.get_coordinates(polygon):
+        assert np.allclose(transform.transform_point(point), (matrix@[point[0], point[1], 1.0])[:2])
+
+#===============================================================================